@@ -0,0 +1,170 @@
+"""
+Pooled, batched attendance writer.
+
+Recognized (student, time, confidence) events are buffered and flushed as one
+multi-row INSERT ... ON DUPLICATE KEY UPDATE every `batch_size` events or
+`flush_interval_ms` milliseconds, over connections from a small pool instead
+of a fresh mysql.connector connection per student.
+"""
+import threading
+import time
+from datetime import datetime
+from mysql.connector import pooling
+from session_resolver import SessionResolver
+
+
+INSERT_ATTENDANCE_QUERY = """
+    INSERT INTO attendance_records (student_id, session_instance_id, status, check_in_time, recognition_confidence)
+    VALUES {rows}
+    ON DUPLICATE KEY UPDATE status = 'present',
+                            check_in_time = VALUES(check_in_time),
+                            recognition_confidence = VALUES(recognition_confidence)
+"""
+
+
+class AttendanceEvent:
+    """One recognized student"""
+
+    def __init__(self, student_id, confidence=None, seen_at=None):
+        self.student_id = int(student_id)
+        self.confidence = float(confidence) if confidence is not None else None
+        self.seen_at = seen_at or datetime.now()
+        # Set by the writer when the student has no active session to attach the record to
+        self.unresolved = False
+
+
+class AttendanceWriter:
+    """Buffers attendance events and writes them in batches over pooled connections.
+
+    on_written(events) and on_failed(events) are called from the writer thread
+    after each flush; events whose student has no active session are reported
+    through on_failed as well, with event.unresolved set.
+    """
+
+    def __init__(self, db_config, session_instance_id=None, batch_size=20, flush_interval_ms=500,
+                 pool_size=2, on_written=None, on_failed=None):
+        self.db_config = db_config
+        self.session_instance_id = session_instance_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.pool_size = pool_size
+        self.on_written = on_written
+        self.on_failed = on_failed
+        self.pool = None
+        self.pool_lock = threading.Lock()
+        # Only needed when no fixed session was given
+        self.session_resolver = None if session_instance_id else SessionResolver(self.get_connection)
+        self.buffer = []
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def get_connection(self):
+        """Borrow a connection from the pool, creating the pool on first use"""
+        with self.pool_lock:
+            if self.pool is None:
+                self.pool = pooling.MySQLConnectionPool(
+                    pool_name=f'attendance_{id(self)}', pool_size=self.pool_size, **self.db_config)
+        return self.pool.get_connection()
+
+    def resolve_sessions(self, student_ids):
+        """Map student_id -> session_instance_id for a whole batch from the in-memory resolver"""
+        if self.session_instance_id:
+            return {sid: self.session_instance_id for sid in student_ids}
+        return self.session_resolver.resolve_many(student_ids)
+
+    def write(self, events):
+        """Synchronously write events in one transaction; returns (written, unresolved)"""
+        if not events:
+            return [], []
+
+        # Keep one event per student: first sighting time, best confidence
+        by_student = {}
+        for event in events:
+            kept = by_student.get(event.student_id)
+            if kept is None:
+                by_student[event.student_id] = event
+            elif event.confidence is not None and (kept.confidence is None or event.confidence > kept.confidence):
+                kept.confidence = event.confidence
+
+        sessions = self.resolve_sessions(list(by_student))
+        written = [e for e in by_student.values() if e.student_id in sessions]
+        unresolved = [e for e in by_student.values() if e.student_id not in sessions]
+        if not written:
+            return written, unresolved
+
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            rows = ', '.join(["(%s, %s, 'present', %s, %s)"] * len(written))
+            params = []
+            for e in written:
+                params.extend([e.student_id, sessions[e.student_id], e.seen_at, e.confidence])
+            cursor.execute(INSERT_ATTENDANCE_QUERY.format(rows=rows), params)
+            conn.commit()
+            cursor.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            # Returns the connection to the pool
+            conn.close()
+        return written, unresolved
+
+    def submit(self, student_id, confidence=None, seen_at=None):
+        """Queue a recognized student for the next batch"""
+        with self.cond:
+            self.buffer.append(AttendanceEvent(student_id, confidence, seen_at))
+            if len(self.buffer) >= self.batch_size:
+                self.cond.notify()
+
+    def flush(self):
+        """Write everything buffered so far"""
+        with self.cond:
+            events, self.buffer = self.buffer, []
+        if not events:
+            return
+        try:
+            written, unresolved = self.write(events)
+        except Exception as e:
+            print(f"Database error: {e}")
+            if self.on_failed:
+                self.on_failed(events)
+            return
+        for event in unresolved:
+            event.unresolved = True
+        if written and self.on_written:
+            self.on_written(written)
+        if unresolved and self.on_failed:
+            self.on_failed(unresolved)
+
+    def start(self):
+        # Load today's student -> session map up front so the first batch needs no lookup query
+        if self.session_resolver is not None:
+            try:
+                self.session_resolver.refresh()
+            except Exception as e:
+                print(f"Could not preload sessions: {e}")
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='AttendanceWriter', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            with self.cond:
+                deadline = time.time() + self.flush_interval
+                while self.running and len(self.buffer) < self.batch_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+            self.flush()
+
+    def stop(self):
+        """Stop the writer thread and flush whatever is still buffered"""
+        self.running = False
+        with self.cond:
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
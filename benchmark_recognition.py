@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Face recognition benchmark harness (headless, no camera needed).
+
+Generates synthetic galleries (default 10 / 100 / 1k / 10k identities; LBPH
+only runs at 10) and probe faces, then measures for each backend:
+  - gallery load time (cold, in a fresh subprocess)
+  - per-probe latency percentiles and throughput
+  - peak RSS of the process
+  - top-1 accuracy
+
+Backends:
+  template  - recognize_face.py gallery cache + FaceMatcher (100x100 correlation)
+  cascade   - the same gallery through CascadeMatcher (16x16 ranking, top-k rerank)
+  lbph      - lbph_model.yml trained by train_lbph.py settings
+  centroid  - memory-mapped centroid store + CentroidMatcher
+  dlib      - recognize_face_dlib.py style: float32 BLOB rows + face_distance
+  dlib_ivf  - the same encodings searched through embedding_index.IVFIndex
+
+Synthetic probes are already-cropped faces, so their latency covers matching only.
+Pass --probe_dir DIR to replay recorded frames instead; their latency includes face
+detection, and no accuracy is reported since they are not in the synthetic gallery.
+
+Results are written as JSON (one file per run) so they can be compared across
+commits with --compare.
+
+Usage:
+    python benchmark_recognition.py
+    python benchmark_recognition.py --sizes 100 1000 --backends template centroid
+    python benchmark_recognition.py --compare benchmark_results/<previous>.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmark_results')
+BACKENDS = ['template', 'cascade', 'lbph', 'centroid', 'dlib', 'dlib_ivf']
+# LBPH with radius=2, neighbors=16 stores 8x8 cells of 2^16-bin histograms (~16 MB) per
+# sample, and OpenCV cannot read back a model file much beyond a few hundred MB
+LBPH_MAX_GALLERY = 10
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def synthetic_face(rng, size=200):
+    """A smooth, face-like grayscale pattern that is distinct per identity"""
+    field = cv2.resize(rng.random((6, 6)).astype(np.float32), (size, size), interpolation=cv2.INTER_CUBIC)
+    img = 70 + 60 * field
+    c = size // 2
+    cv2.ellipse(img, (c, c), (int(size * 0.32), int(size * 0.42)), 0, 0, 360, float(rng.uniform(140, 200)), -1)
+    eye_y = int(size * rng.uniform(0.36, 0.44))
+    eye_dx = int(size * rng.uniform(0.12, 0.18))
+    eye_r = int(size * rng.uniform(0.04, 0.07))
+    for x in (c - eye_dx, c + eye_dx):
+        cv2.circle(img, (x, eye_y), eye_r, float(rng.uniform(20, 70)), -1)
+    cv2.line(img, (c, eye_y + eye_r), (c + int(rng.integers(-5, 6)), int(size * 0.62)), float(rng.uniform(60, 110)), 3)
+    mouth_y = int(size * rng.uniform(0.70, 0.78))
+    mouth_w = int(size * rng.uniform(0.10, 0.18))
+    cv2.ellipse(img, (c, mouth_y), (mouth_w, int(size * 0.03)), 0, 0, 360, float(rng.uniform(40, 90)), -1)
+    # Identity-specific fine texture
+    texture = cv2.GaussianBlur(rng.normal(0, 18, (size, size)).astype(np.float32), (0, 0), 3)
+    return np.clip(img + texture, 0, 255).astype(np.uint8)
+
+
+def synthetic_probe(face, rng):
+    """Another 'capture' of the same identity: small shift, lighting change and sensor noise"""
+    size = face.shape[0]
+    dx, dy = rng.uniform(-0.02, 0.02, 2) * size
+    m = np.float32([[1, 0, dx], [0, 1, dy]])
+    img = cv2.warpAffine(face, m, (size, size), borderMode=cv2.BORDER_REFLECT)
+    img = img.astype(np.float32) * rng.uniform(0.8, 1.2) + rng.uniform(-20, 20)
+    img += rng.normal(0, 6, img.shape)
+    # Camera optics/compression smooth pixel-level noise
+    img = cv2.GaussianBlur(img, (0, 0), 1.0)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def synthetic_encoding(rng):
+    """A 128-d vector with the scale of dlib face encodings"""
+    return rng.normal(0, 0.09, 128)
+
+
+def load_recorded_probes(probe_dir):
+    """Recorded frames as (gray image, None); they have no identity in the synthetic gallery"""
+    probes = []
+    for fname in sorted(os.listdir(probe_dir)):
+        if not fname.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp')):
+            continue
+        bgr = cv2.imread(os.path.join(probe_dir, fname))
+        if bgr is None:
+            continue
+        probes.append((cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY), None))
+    return probes
+
+
+# ---------------------------------------------------------------------------
+# Measurement helpers
+# ---------------------------------------------------------------------------
+
+def peak_rss_mb():
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        return rss / (1024.0 * 1024.0) if sys.platform == 'darwin' else rss / 1024.0
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024.0 * 1024.0)
+        except Exception:
+            return None
+
+
+def time_probes(probes, identify):
+    """Run identify(probe) -> student_id for each (probe, expected_id); return latency stats"""
+    latencies = []
+    correct = 0
+    labelled = 0
+    start = time.perf_counter()
+    for probe, expected in probes:
+        t0 = time.perf_counter()
+        predicted = identify(probe)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+        if expected is not None:
+            labelled += 1
+            correct += int(predicted == expected)
+    total = time.perf_counter() - start
+    lat = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        'probes': len(probes),
+        'latency_ms': {
+            'p50': float(np.percentile(lat, 50)),
+            'p90': float(np.percentile(lat, 90)),
+            'p99': float(np.percentile(lat, 99)),
+            'mean': float(lat.mean()),
+        },
+        'throughput_per_s': len(probes) / total if total > 0 else None,
+        'accuracy': correct / labelled if labelled else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Backends (each runs inside a fresh worker process)
+# ---------------------------------------------------------------------------
+
+def bench_template(faces, ids, probes, workdir, recorded, matcher_class=None):
+    import face_gallery
+    from face_detector import detect_largest_face
+    from face_matcher import FaceMatcher
+    matcher_class = matcher_class or FaceMatcher
+
+    # Persist the gallery in the same cache format recognize_face.py reads
+    cache_path = os.path.join(workdir, 'gallery.npz')
+    entries = {}
+    filenames = []
+    for sid, face in zip(ids, faces):
+        name = f'{sid}.png'
+        filenames.append(name)
+        entries[name] = {'mtime_ns': 0, 'size': 0, 'has_face': True, 'face': cv2.resize(face, face_gallery.FACE_SIZE)}
+    face_gallery.write_cache(cache_path, filenames, entries)
+    del entries
+
+    t0 = time.perf_counter()
+    cached = face_gallery.read_cache(cache_path)
+    names = [os.path.splitext(n)[0] for n in cached]
+    matcher = matcher_class(np.stack([cached[n]['face'] for n in cached]), [int(n) for n in names], names)
+    load_s = time.perf_counter() - t0
+
+    def identify(probe):
+        if recorded:
+            probe = detect_largest_face(probe)
+            if probe is None:
+                return None
+        idx, _ = matcher.best_match(cv2.resize(probe, face_gallery.FACE_SIZE), threshold=0.0)
+        return matcher.student_ids[idx] if idx is not None else None
+
+    return load_s, identify
+
+
+def bench_cascade(faces, ids, probes, workdir, recorded):
+    from cascade_matcher import CascadeMatcher
+    return bench_template(faces, ids, probes, workdir, recorded, CascadeMatcher)
+
+
+def bench_lbph(faces, ids, probes, workdir, recorded):
+    from face_detector import detect_largest_face
+    if len(faces) > LBPH_MAX_GALLERY:
+        raise SkipBackend(f'LBPH model needs ~16 MB per training sample (3 per photo); gallery capped at {LBPH_MAX_GALLERY}')
+
+    model_path = os.path.join(workdir, 'lbph_model.yml')
+    recognizer = cv2.face.LBPHFaceRecognizer_create(radius=2, neighbors=16, grid_x=8, grid_y=8)
+    # Same equalization and augmentation as train_lbph.face_samples
+    samples, labels = [], []
+    for sid, face in zip(ids, faces):
+        face = cv2.equalizeHist(face)
+        samples += [face, cv2.GaussianBlur(face, (3, 3), 0), cv2.flip(face, 1)]
+        labels += [sid] * 3
+    recognizer.train(samples, np.array(labels))
+    recognizer.write(model_path)
+    del recognizer
+
+    t0 = time.perf_counter()
+    recognizer = cv2.face.LBPHFaceRecognizer_create(radius=2, neighbors=16, grid_x=8, grid_y=8)
+    try:
+        recognizer.read(model_path)
+    except cv2.error as e:
+        raise SkipBackend(f'could not read back {os.path.getsize(model_path) >> 20} MB model: {e}')
+    load_s = time.perf_counter() - t0
+
+    def identify(probe):
+        if recorded:
+            probe = detect_largest_face(cv2.equalizeHist(probe), 'training')
+            if probe is None:
+                return None
+        else:
+            probe = cv2.equalizeHist(probe)
+        label, _ = recognizer.predict(cv2.resize(probe, (200, 200)))
+        return int(label)
+
+    return load_s, identify
+
+
+def bench_centroid(faces, ids, probes, workdir, recorded):
+    from centroid_store import CentroidMatcher, load_centroids, prepare_probe, save_centroids
+    from face_detector import detect_largest_face
+
+    npy_path = os.path.join(workdir, 'centroids.npy')
+    index_path = os.path.join(workdir, 'centroids_index.json')
+    save_centroids(ids, ids, np.stack([f.astype(np.float32) / 255.0 for f in faces]), [1] * len(ids),
+                   npy_path, index_path)
+
+    t0 = time.perf_counter()
+    matcher = CentroidMatcher(load_centroids(npy_path, index_path, legacy_path=None))
+    load_s = time.perf_counter() - t0
+
+    def identify(probe):
+        if recorded:
+            probe = detect_largest_face(cv2.equalizeHist(probe), 'training')
+            if probe is None:
+                return None
+        return matcher.nearest([prepare_probe(probe)])[0][0][0]
+
+    return load_s, identify
+
+
+def bench_dlib(encodings, ids, probes, workdir, recorded):
+    if recorded:
+        raise SkipBackend('recorded probes need the face_recognition encoder')
+    try:
+        from face_recognition import face_distance
+    except ImportError:
+        # Same formula as face_recognition.face_distance
+        def face_distance(known, probe):
+            return np.linalg.norm(np.asarray(known) - probe, axis=1)
+
+    # Rows as stored in student_face_encodings (float32 BLOBs)
+    from encoding_store import encodings_from_rows, pack_encoding
+    rows = [(sid, pack_encoding(enc), None) for sid, enc in zip(ids, encodings)]
+
+    t0 = time.perf_counter()
+    known, student_ids = encodings_from_rows(rows)
+    load_s = time.perf_counter() - t0
+
+    def identify(probe):
+        distances = face_distance(known, probe)
+        return student_ids[int(np.argmin(distances))]
+
+    return load_s, identify
+
+
+def bench_dlib_ivf(encodings, ids, probes, workdir, recorded):
+    from embedding_index import IVFIndex, read_index
+    if recorded:
+        raise SkipBackend('recorded probes need the face_recognition encoder')
+
+    index_path = os.path.join(workdir, 'index.npz')
+    index = IVFIndex()
+    index.add(np.asarray(encodings, dtype=np.float32), ids)
+    index.save(index_path)
+    del index
+
+    t0 = time.perf_counter()
+    index = read_index(index_path)
+    load_s = time.perf_counter() - t0
+
+    def identify(probe):
+        return index.search(probe)[0][0][0]
+
+    return load_s, identify
+
+
+class SkipBackend(Exception):
+    pass
+
+
+BENCH_FUNCS = {'template': bench_template, 'cascade': bench_cascade, 'lbph': bench_lbph, 'centroid': bench_centroid, 'dlib': bench_dlib, 'dlib_ivf': bench_dlib_ivf}
+
+
+def run_worker(backend, size, n_probes, seed, probe_dir):
+    """Benchmark one backend at one gallery size; called in a fresh process"""
+    rng = np.random.default_rng(seed)
+    ids = list(range(1, size + 1))
+    recorded = probe_dir is not None
+    result = {'backend': backend, 'gallery_size': size}
+
+    if backend in ('dlib', 'dlib_ivf'):
+        gallery = [synthetic_encoding(rng) for _ in ids]
+        probe_idx = rng.integers(0, size, n_probes)
+        probes = [(gallery[i] + rng.normal(0, 0.02, 128), ids[i]) for i in probe_idx]
+    else:
+        gallery = [synthetic_face(rng) for _ in ids]
+        if recorded:
+            probes = load_recorded_probes(probe_dir)
+        else:
+            probe_idx = rng.integers(0, size, n_probes)
+            probes = [(synthetic_probe(gallery[i], rng), ids[i]) for i in probe_idx]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            load_s, identify = BENCH_FUNCS[backend](gallery, ids, probes, workdir, recorded)
+        except SkipBackend as e:
+            result['skipped'] = str(e)
+            return result
+        # One warm-up probe so lazy initialization is not counted as probe latency
+        if probes:
+            identify(probes[0][0])
+        result['gallery_load_s'] = load_s
+        result.update(time_probes(probes, identify))
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(current, baseline_path, tolerance):
+    """Print latency/accuracy regressions against a previous results file"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(r['backend'], r['gallery_size']): r for r in baseline['results'] if 'skipped' not in r}
+    regressions = 0
+    print(f"\nComparison with {baseline_path} (commit {baseline.get('commit')}):")
+    for r in current['results']:
+        old = previous.get((r['backend'], r['gallery_size']))
+        if old is None or 'skipped' in r:
+            continue
+        new_p50, old_p50 = r['latency_ms']['p50'], old['latency_ms']['p50']
+        change = (new_p50 - old_p50) / old_p50 if old_p50 else 0.0
+        flag = ''
+        if change > tolerance:
+            flag = '  <-- REGRESSION'
+            regressions += 1
+        if r.get('accuracy') is not None and old.get('accuracy') is not None and r['accuracy'] < old['accuracy'] - 0.01:
+            flag += '  <-- ACCURACY DROP'
+            regressions += 1
+        print(f"  {r['backend']:<9} N={r['gallery_size']:<6} p50 {old_p50:8.3f} -> {new_p50:8.3f} ms ({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark face recognition backends on synthetic galleries')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[LBPH_MAX_GALLERY, 100, 1000, 10000])
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS)
+    parser.add_argument('--probes', type=int, default=200, help='Synthetic probes per run')
+    parser.add_argument('--probe_dir', default=None, help='Replay recorded frames from this directory')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', default=None, help='Results JSON path (default: benchmark_results/<commit>_<time>.json)')
+    parser.add_argument('--compare', default=None, help='Previous results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p50 slowdown before flagging')
+    parser.add_argument('--worker', nargs=2, metavar=('BACKEND', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        backend, size = args.worker[0], int(args.worker[1])
+        print(json.dumps(run_worker(backend, size, args.probes, args.seed, args.probe_dir)))
+        return
+
+    commit = git_commit()
+    run = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'probes': args.probes,
+        'seed': args.seed,
+        'results': [],
+    }
+
+    print(f"{'backend':<9} {'N':>6} {'load s':>8} {'p50 ms':>8} {'p99 ms':>8} {'probe/s':>9} {'RSS MB':>8} {'acc':>6}")
+    for size in args.sizes:
+        for backend in args.backends:
+            # Fresh process per run: cold gallery load and an isolated peak RSS
+            cmd = [sys.executable, os.path.abspath(__file__), '--worker', backend, str(size),
+                   '--probes', str(args.probes), '--seed', str(args.seed)]
+            if args.probe_dir:
+                cmd += ['--probe_dir', args.probe_dir]
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            try:
+                result = json.loads(proc.stdout.strip().splitlines()[-1])
+            except (IndexError, ValueError):
+                result = {'backend': backend, 'gallery_size': size, 'skipped': f'worker failed: {proc.stderr.strip()[-300:]}'}
+            run['results'].append(result)
+
+            if 'skipped' in result:
+                print(f"{backend:<9} {size:>6}  skipped: {result['skipped']}")
+                continue
+            acc = f"{result['accuracy']:.3f}" if result.get('accuracy') is not None else '-'
+            rss = f"{result['peak_rss_mb']:.0f}" if result.get('peak_rss_mb') is not None else '-'
+            print(f"{backend:<9} {size:>6} {result['gallery_load_s']:>8.3f} {result['latency_ms']['p50']:>8.3f} "
+                  f"{result['latency_ms']['p99']:>8.3f} {result['throughput_per_s']:>9.1f} {rss:>8} {acc:>6}")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{commit or 'nocommit'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(run, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        regressions = compare(run, args.compare, args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
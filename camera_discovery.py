@@ -0,0 +1,125 @@
+"""
+Parallel camera discovery with an on-disk cache of known-good cameras.
+
+Each camera index is probed in its own thread; the first backend that opens
+it and delivers frames wins, the remaining backends are not tried. Probes
+still running when the timeout expires are abandoned (daemon threads), so a
+driver that hangs on open cannot stall start-up.
+
+The result (index, backend, resolution, fps) is written to camera_cache.json,
+which lets later launches open the known-good camera immediately and rescan
+in the background.
+"""
+import json
+import os
+import threading
+import time
+import cv2
+
+
+ROOT = os.path.dirname(__file__)
+CAMERA_CACHE_PATH = os.path.join(ROOT, 'camera_cache.json')
+MAX_CAMERA_INDEX = 20
+# Fields of a camera description, read by camera_label and camera initialization
+CAMERA_FIELDS = ('index', 'backend', 'width', 'height', 'fps')
+PROBE_BACKENDS = [cv2.CAP_ANY, cv2.CAP_DSHOW, cv2.CAP_V4L2, cv2.CAP_GSTREAMER]
+BACKEND_NAMES = {cv2.CAP_ANY: "Auto", cv2.CAP_DSHOW: "DirectShow", cv2.CAP_V4L2: "V4L2", cv2.CAP_GSTREAMER: "GStreamer"}
+
+
+def camera_label(camera):
+    """Display name such as "Camera 1 (640x480@30fps) [V4L2]" """
+    label = f"Camera {camera['index']} ({camera['width']}x{camera['height']}@{camera['fps']}fps)"
+    if camera['backend'] in (cv2.CAP_DSHOW, cv2.CAP_V4L2):
+        label += f" [{BACKEND_NAMES[camera['backend']]}]"
+    return label
+
+
+def probe_camera(index, backends=PROBE_BACKENDS, frames=3, min_frames=2):
+    """Return the camera description for the first backend that delivers frames, or None"""
+    for backend in backends:
+        cap = None
+        try:
+            cap = cv2.VideoCapture(index, backend)
+            if not cap.isOpened():
+                continue
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            cap.set(cv2.CAP_PROP_FPS, 30)
+
+            frames_read = 0
+            for _ in range(frames):
+                ret, frame = cap.read()
+                if ret and frame is not None and frame.size > 0:
+                    frames_read += 1
+                    if frames_read >= min_frames:
+                        break
+            if frames_read >= min_frames:
+                return {
+                    'index': index,
+                    'backend': int(backend),
+                    'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                    'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                    'fps': int(cap.get(cv2.CAP_PROP_FPS)),
+                }
+        except Exception:
+            continue
+        finally:
+            if cap is not None:
+                cap.release()
+    return None
+
+
+def discover_cameras(indices=range(MAX_CAMERA_INDEX), timeout=8.0, backends=PROBE_BACKENDS):
+    """Probe camera indices concurrently; returns the working cameras sorted by index"""
+    found = {}
+    lock = threading.Lock()
+
+    def probe(index):
+        camera = probe_camera(index, backends)
+        if camera is not None:
+            with lock:
+                found[index] = camera
+
+    threads = [threading.Thread(target=probe, args=(i,), name=f'camera-probe-{i}', daemon=True) for i in indices]
+    for thread in threads:
+        thread.start()
+    deadline = time.time() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.time()))
+    pending = sum(thread.is_alive() for thread in threads)
+    if pending:
+        print(f"Camera scan timed out after {timeout:.0f}s; {pending} index(es) still probing were skipped")
+
+    with lock:
+        return [found[i] for i in sorted(found)]
+
+
+def valid_camera(camera):
+    """True for a camera description with every field probe_camera writes, as integers"""
+    return isinstance(camera, dict) and all(isinstance(camera.get(field), int) for field in CAMERA_FIELDS)
+
+
+def load_camera_cache(path=CAMERA_CACHE_PATH):
+    """Cameras found by the last scan, or [] if there is no usable cache.
+
+    An entry with missing or malformed fields (a stale or hand-edited file)
+    makes the whole cache a miss, so the caller rescans.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        cameras = data.get('cameras', [])
+    except (OSError, ValueError, AttributeError):
+        return []
+    if not isinstance(cameras, list) or not all(valid_camera(camera) for camera in cameras):
+        return []
+    return cameras
+
+
+def save_camera_cache(cameras, path=CAMERA_CACHE_PATH):
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'scanned_at': time.time(), 'cameras': cameras}, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not write camera cache {path}: {e}")
@@ -0,0 +1,133 @@
+"""
+Building blocks for the threaded capture -> recognition -> attendance pipeline.
+
+A FrameGrabber thread keeps only the freshest camera frame and recognition
+workers consume frames through a drop-oldest queue, so display FPS is
+decoupled from recognition latency. Database writes are done off the display
+thread by attendance_writer.AttendanceWriter.
+"""
+import collections
+import threading
+import time
+
+
+class DropOldestQueue:
+    """Bounded queue that discards the oldest item instead of blocking the producer"""
+
+    def __init__(self, maxsize=1):
+        self.items = collections.deque(maxlen=maxsize)
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+            self.items.append(item)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Return the oldest queued item, or None on timeout/close"""
+        with self.cond:
+            if not self.items and not self.closed:
+                self.cond.wait(timeout)
+            return self.items.popleft() if self.items else None
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class FrameGrabber(threading.Thread):
+    """Continuously reads frames so consumers always see the most recent one"""
+
+    def __init__(self, read_frame, out_queue=None, name='FrameGrabber'):
+        super().__init__(name=name, daemon=True)
+        self.read_frame = read_frame
+        self.out_queue = out_queue
+        self.cond = threading.Condition()
+        self.frame = None
+        self.seq = 0
+        self.running = True
+        self.fps = 0.0
+
+    def run(self):
+        window_start = time.time()
+        window_frames = 0
+        while self.running:
+            try:
+                ret, frame = self.read_frame()
+            except Exception as e:
+                print(f"Error reading frame: {e}")
+                ret, frame = False, None
+            if not ret or frame is None:
+                time.sleep(0.05)
+                continue
+
+            with self.cond:
+                self.seq += 1
+                self.frame = frame
+                seq = self.seq
+                self.cond.notify_all()
+            if self.out_queue is not None:
+                self.out_queue.put((seq, time.time(), frame))
+
+            window_frames += 1
+            elapsed = time.time() - window_start
+            if elapsed >= 1.0:
+                self.fps = window_frames / elapsed
+                window_start = time.time()
+                window_frames = 0
+
+    def latest(self, after_seq=0, timeout=0.1):
+        """Wait up to timeout for a frame newer than after_seq; returns (seq, frame)"""
+        with self.cond:
+            if self.seq <= after_seq:
+                self.cond.wait(timeout)
+            return self.seq, self.frame
+
+    def stop(self):
+        self.running = False
+
+
+class RecognitionWorkers:
+    """Pool of threads running recognize(frame) on frames taken from a DropOldestQueue.
+
+    cv2 detection and numpy matching release the GIL, so threads run in parallel;
+    each thread gets its own cascade through face_detector.
+    """
+
+    def __init__(self, in_queue, recognize, on_result, workers=2):
+        self.in_queue = in_queue
+        self.recognize = recognize
+        self.on_result = on_result
+        self.running = True
+        self.latency_ms = 0.0
+        self.threads = [threading.Thread(target=self._work, name=f'RecognitionWorker-{i}', daemon=True)
+                        for i in range(workers)]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+    def _work(self):
+        while self.running:
+            item = self.in_queue.get(timeout=0.1)
+            if item is None:
+                continue
+            seq, captured_at, frame = item
+            try:
+                results = self.recognize(frame)
+            except Exception as e:
+                print(f"Error in face matching: {e}")
+                continue
+            self.latency_ms = (time.time() - captured_at) * 1000.0
+            self.on_result(seq, results)
+
+    def stop(self):
+        self.running = False
+        self.in_queue.close()
+        for t in self.threads:
+            t.join(timeout=1.0)
@@ -0,0 +1,93 @@
+"""
+Two-stage coarse-to-fine template matching.
+
+Stage one ranks the whole gallery by Pearson correlation of 16x16
+downsampled faces (256 values per face instead of 10,000). Stage two
+re-scores only the top-k candidates with the full 100x100 correlation that
+FaceMatcher uses, so best_matches() returns the same kind of similarity.
+
+Two shortcuts skip most of stage two:
+  - early reject: the best coarse score is below reject_below, so the probe
+    cannot match anyone and no fine scores are computed;
+  - early accept: the best coarse score leads the runner-up by at least
+    accept_margin, so only that one candidate is re-scored.
+"""
+import cv2
+import numpy as np
+from face_matcher import FACE_SIZE, FaceMatcher, normalize_faces
+
+
+COARSE_SIZE = (16, 16)
+
+
+def coarse_signatures(normalized):
+    """Zero-mean, unit-norm 16x16 signatures from normalize_faces() rows"""
+    rows = np.empty((len(normalized), COARSE_SIZE[0] * COARSE_SIZE[1]), dtype=np.float32)
+    for i, row in enumerate(normalized):
+        small = cv2.resize(row.reshape(FACE_SIZE[1], FACE_SIZE[0]), COARSE_SIZE, interpolation=cv2.INTER_AREA)
+        vec = small.astype(np.float64).ravel()
+        vec -= vec.mean()
+        norm = np.linalg.norm(vec)
+        rows[i] = vec / norm if norm > 0 else 0.0
+    return rows
+
+
+class CascadeMatcher(FaceMatcher):
+    """FaceMatcher that ranks with 16x16 signatures and re-scores the top k at full resolution"""
+
+    def __init__(self, reference_faces, reference_student_ids=None, reference_names=None,
+                 k=10, accept_margin=0.15, reject_below=0.2):
+        super().__init__(reference_faces, reference_student_ids, reference_names)
+        self.coarse = np.ascontiguousarray(coarse_signatures(self.gallery))
+        self.k = k
+        self.accept_margin = accept_margin
+        self.reject_below = reject_below
+        # How probes left the cascade, for tuning k and the margins
+        self.stats = {'rejected': 0, 'accepted': 0, 'reranked': 0}
+
+    def best_matches(self, probes, threshold=0.4):
+        """Return (index, similarity) of the best reference above threshold per probe, (None, 0.0) otherwise"""
+        if len(probes) == 0:
+            return []
+        if len(self.gallery) == 0:
+            return [(None, 0.0)] * len(probes)
+        normalized = normalize_faces(probes)
+        coarse_scores = coarse_signatures(normalized) @ self.coarse.T
+        k = min(self.k, len(self.gallery))
+
+        results = []
+        for fine_probe, row in zip(normalized, coarse_scores):
+            if k < len(row):
+                top = np.argpartition(-row, k - 1)[:k]
+                top = top[np.argsort(-row[top], kind='stable')]
+            else:
+                top = np.argsort(-row, kind='stable')
+            if row[top[0]] < self.reject_below:
+                self.stats['rejected'] += 1
+                results.append((None, 0.0))
+                continue
+            if len(top) == 1 or row[top[0]] - row[top[1]] >= self.accept_margin:
+                self.stats['accepted'] += 1
+                top = top[:1]
+            else:
+                self.stats['reranked'] += 1
+
+            fine = self.gallery[top] @ fine_probe
+            best = int(np.argmax(fine))
+            similarity = float(fine[best])
+            results.append((int(top[best]), similarity) if similarity > threshold else (None, 0.0))
+        return results
+
+
+def add_cascade_arguments(parser):
+    """Command-line options for the cascade backend, shared by the recognition entry points"""
+    parser.add_argument('--cascade_k', type=int, default=10,
+                        help='Cascade backend: candidates re-scored at full resolution per face')
+    parser.add_argument('--cascade_accept_margin', type=float, default=0.15,
+                        help='Cascade backend: coarse lead over the runner-up that skips re-ranking')
+    parser.add_argument('--cascade_reject_below', type=float, default=0.2,
+                        help='Cascade backend: best coarse score under which a face is unknown')
+
+
+def cascade_options_from_args(args):
+    return {'k': args.cascade_k, 'accept_margin': args.cascade_accept_margin, 'reject_below': args.cascade_reject_below}
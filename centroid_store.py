@@ -0,0 +1,152 @@
+"""
+Binary per-student centroid store for the LBPH fallback matcher.
+
+Centroids (mean 200x200 training face per LBPH label, scaled to 0..1) are kept
+as one (K, 40000) float32 .npy block that consumers open with np.load(...,
+mmap_mode='r'), plus a small JSON index with the label -> student mapping,
+per-label sample counts and the row statistics the matcher needs. The old
+lbph_centroids.json (nested lists) is converted on first load.
+"""
+import os
+import json
+import cv2
+import numpy as np
+
+
+ROOT = os.path.dirname(__file__)
+CENTROIDS_NPY_PATH = os.path.join(ROOT, 'lbph_centroids.npy')
+CENTROIDS_INDEX_PATH = os.path.join(ROOT, 'lbph_centroids_index.json')
+LEGACY_CENTROIDS_PATH = os.path.join(ROOT, 'lbph_centroids.json')
+CENTROID_SHAPE = (200, 200)
+
+
+def _row_stats(matrix):
+    """Per-row mean and zero-mean L2 norm, used to turn dot products into correlations"""
+    means = np.empty(len(matrix), dtype=np.float64)
+    norms = np.empty(len(matrix), dtype=np.float64)
+    for i, row in enumerate(matrix):
+        row = np.asarray(row, dtype=np.float64)
+        means[i] = row.mean()
+        norms[i] = np.linalg.norm(row - means[i])
+    return means, norms
+
+
+def save_centroids(labels, student_ids, centroids, counts,
+                   npy_path=CENTROIDS_NPY_PATH, index_path=CENTROIDS_INDEX_PATH):
+    """Write centroids (K x 200 x 200, or K x 40000) and their index, each replaced atomically"""
+    matrix = np.ascontiguousarray(np.asarray(centroids, dtype=np.float32).reshape(len(labels), -1))
+    means, norms = _row_stats(matrix)
+
+    tmp_path = npy_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, matrix)
+    os.replace(tmp_path, npy_path)
+
+    index = {
+        'shape': list(CENTROID_SHAPE),
+        'labels': [int(l) for l in labels],
+        'student_ids': [int(s) for s in student_ids],
+        'counts': [int(c) for c in counts],
+        'means': means.tolist(),
+        'norms': norms.tolist(),
+    }
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+
+
+def convert_legacy_json(json_path=LEGACY_CENTROIDS_PATH,
+                        npy_path=CENTROIDS_NPY_PATH, index_path=CENTROIDS_INDEX_PATH):
+    """Convert an lbph_centroids.json written by older train_lbph.py into the binary store"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    label_to_student = data['label_to_student']
+    labels = sorted(int(k) for k in data['centroids'])
+    centroids = np.stack([np.asarray(data['centroids'][str(l)], dtype=np.float32) for l in labels])
+    student_ids = [label_to_student[str(l)] for l in labels]
+    # Sample counts were never recorded; train_lbph used 3 augmentations per photo
+    save_centroids(labels, student_ids, centroids, [3] * len(labels), npy_path, index_path)
+
+
+class CentroidStore:
+    """Memory-mapped centroids plus their index"""
+
+    def __init__(self, matrix, index):
+        self.matrix = matrix
+        self.labels = index['labels']
+        self.student_ids = index['student_ids']
+        self.counts = index['counts']
+        self.means = np.asarray(index['means'], dtype=np.float32)
+        self.norms = np.asarray(index['norms'], dtype=np.float32)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def centroid(self, row):
+        return np.asarray(self.matrix[row]).reshape(CENTROID_SHAPE)
+
+
+def load_centroids(npy_path=CENTROIDS_NPY_PATH, index_path=CENTROIDS_INDEX_PATH,
+                   legacy_path=LEGACY_CENTROIDS_PATH, mmap=True):
+    """Open the centroid store (zero-copy when mmap=True), or None if nothing was trained"""
+    if not (os.path.exists(npy_path) and os.path.exists(index_path)):
+        if not legacy_path or not os.path.exists(legacy_path):
+            return None
+        convert_legacy_json(legacy_path, npy_path, index_path)
+
+    # The two files are replaced separately; retry once if we caught them mid-update
+    for _ in range(2):
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        matrix = np.load(npy_path, mmap_mode='r' if mmap else None, allow_pickle=False)
+        if matrix.shape[0] == len(index['labels']):
+            return CentroidStore(matrix, index)
+    raise ValueError(f"Centroid index {index_path} does not match {npy_path}")
+
+
+def prepare_probe(face):
+    """Turn an equalized grayscale face ROI into a flat 0..1 float32 probe row"""
+    if face.shape[:2] != CENTROID_SHAPE:
+        face = cv2.resize(face, CENTROID_SHAPE[::-1])
+    return face.astype(np.float32).ravel() / 255.0
+
+
+class CentroidMatcher:
+    """Nearest-centroid matcher scoring probes against every centroid in one matrix product.
+
+    Scores are Pearson correlations between the probe and each centroid, the same
+    measure FaceMatcher uses for the 100x100 templates.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store)
+
+    def score(self, probes):
+        """Return the (probes x centroids) correlation matrix for prepared probe rows"""
+        probes = np.atleast_2d(np.asarray(probes, dtype=np.float32))
+        if len(self.store) == 0 or len(probes) == 0:
+            return np.zeros((len(probes), len(self.store)), dtype=np.float32)
+        n = probes.shape[1]
+        p_means = probes.mean(axis=1, keepdims=True)
+        p_norms = np.linalg.norm(probes - p_means, axis=1, keepdims=True)
+        # sum((p - mp)(c - mc)) = p.c - n * mp * mc
+        dots = probes @ self.store.matrix.T
+        cov = dots - n * p_means * self.store.means[None, :]
+        denom = p_norms * self.store.norms[None, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.where(denom > 0, cov / denom, 0.0)
+        return scores.astype(np.float32)
+
+    def nearest(self, probes, k=1):
+        """Return, per probe, the k best (student_id, similarity) pairs in descending order"""
+        scores = self.score(probes)
+        k = min(k, scores.shape[1])
+        results = []
+        for row in scores:
+            top = np.argsort(-row, kind='stable')[:k]
+            results.append([(self.store.student_ids[i], float(row[i])) for i in top])
+        return results
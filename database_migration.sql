@@ -133,5 +133,13 @@ INSERT IGNORE INTO system_settings (setting_key, setting_value, description) VAL
 ('admin_email', 'admin@cihe.edu.au', 'Administrator email address'),
 ('announcements', '', 'System announcements');
 
+-- 13. Store face encodings as packed float32 BLOBs (existing JSON rows are converted by `python encoding_store.py --migrate`)
+SET @column_exists = (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA = 'fullattend_db' AND TABLE_NAME = 'student_face_encodings' AND COLUMN_NAME = 'encoding_blob');
+SET @sql = IF(@column_exists = 0, 'ALTER TABLE student_face_encodings ADD COLUMN encoding_blob BLOB NULL AFTER face_encoding', 'SELECT "Column encoding_blob already exists" as message');
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+ALTER TABLE student_face_encodings MODIFY COLUMN face_encoding TEXT NULL;
+
 -- Migration completed successfully
 SELECT 'Database migration completed successfully!' as Status;
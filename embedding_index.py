@@ -0,0 +1,302 @@
+"""
+Nearest-neighbour indexes over dlib face encodings.
+
+BruteForceIndex scores every stored encoding (what face_distance did).
+IVFIndex clusters the encodings with k-means and only scores the encodings in
+the `nprobe` clusters closest to the query, so lookups stay fast with tens of
+thousands of encodings. Both return per-student top-k matches as
+(student_id, distance); callers keep using confidence = 1 - distance.
+
+The index is built from student_face_encodings, saved next to the code and
+brought up to date on load: encodings inserted since the last save (higher
+sfe.id) are added incrementally, while updated or removed rows trigger a
+rebuild.
+"""
+import os
+import numpy as np
+from encoding_store import ENCODING_DIM, encodings_from_rows, ensure_schema
+
+
+ROOT = os.path.dirname(__file__)
+INDEX_PATH = os.path.join(ROOT, 'face_encodings_index.npz')
+# Below this many encodings an exhaustive scan is as fast as probing clusters
+IVF_MIN_ENCODINGS = 5000
+
+INDEXED_ROWS_QUERY = """
+    SELECT sfe.id, sfe.student_id, sfe.encoding_blob, sfe.face_encoding
+    FROM student_face_encodings sfe
+    JOIN users u ON u.id = sfe.student_id
+    WHERE u.status = 'active' AND sfe.id > %s
+    ORDER BY sfe.id
+"""
+
+# Fingerprint of the rows already in the index (id <= watermark)
+INDEXED_VERSION_QUERY = """
+    SELECT COUNT(*), MAX(sfe.updated_at), MAX(u.updated_at)
+    FROM student_face_encodings sfe
+    JOIN users u ON u.id = sfe.student_id
+    WHERE u.status = 'active' AND sfe.id <= %s
+"""
+
+
+def squared_distances(queries, vectors, vector_norms=None):
+    """(queries x vectors) squared Euclidean distances via one matrix product"""
+    if vector_norms is None:
+        vector_norms = np.einsum('ij,ij->i', vectors, vectors)
+    q_norms = np.einsum('ij,ij->i', queries, queries)
+    d = q_norms[:, None] - 2.0 * (queries @ vectors.T) + vector_norms[None, :]
+    return np.maximum(d, 0.0)
+
+
+def best_per_student(rows, distances, student_ids, k):
+    """Turn candidate rows sorted by distance into up to k (student_id, distance), one per student"""
+    matches = []
+    seen = set()
+    for row, dist in zip(rows, distances):
+        sid = int(student_ids[row])
+        if sid in seen:
+            continue
+        seen.add(sid)
+        matches.append((sid, float(dist)))
+        if len(matches) == k:
+            break
+    return matches
+
+
+class BruteForceIndex:
+    """Exhaustive search over every stored encoding"""
+
+    kind = 'brute'
+
+    def __init__(self):
+        self.vectors = np.zeros((0, ENCODING_DIM), dtype=np.float32)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.student_ids = np.zeros(0, dtype=np.int64)
+        # Highest student_face_encodings.id included, for incremental updates
+        self.watermark = 0
+        self.indexed_version = ''
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def add(self, vectors, student_ids):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self.norms = np.concatenate([self.norms, np.einsum('ij,ij->i', vectors, vectors)])
+        self.student_ids = np.concatenate([self.student_ids, np.asarray(student_ids, dtype=np.int64)])
+
+    def candidates(self, query):
+        """Rows worth scoring exactly for one query"""
+        return None
+
+    def search(self, queries, k=1):
+        """Per query, the k nearest students as [(student_id, distance), ...] in ascending distance"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        results = []
+        for query in queries:
+            rows = self.candidates(query)
+            if rows is None:
+                vectors, norms = self.vectors, self.norms
+            else:
+                vectors, norms = self.vectors[rows], self.norms[rows]
+            if len(vectors) == 0:
+                results.append([])
+                continue
+            d = squared_distances(query[None, :], vectors, norms)[0]
+            if rows is None:
+                rows = np.arange(len(d))
+            # Extra candidates so students with several encodings don't crowd out others
+            n = min(len(d), k * 4)
+            top = np.argpartition(d, n - 1)[:n]
+            top = top[np.argsort(d[top], kind='stable')]
+            matches = best_per_student(rows[top], np.sqrt(d[top]), self.student_ids, k)
+            if len(matches) < k and n < len(d):
+                top = np.argsort(d, kind='stable')
+                matches = best_per_student(rows[top], np.sqrt(d[top]), self.student_ids, k)
+            results.append(matches)
+        return results
+
+    def state(self):
+        return {
+            'kind': np.array(self.kind),
+            'vectors': self.vectors,
+            'student_ids': self.student_ids,
+            'watermark': np.int64(self.watermark),
+            'indexed_version': np.array(self.indexed_version),
+        }
+
+    def load_state(self, data):
+        self.vectors = data['vectors']
+        self.norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+        self.student_ids = data['student_ids']
+        self.watermark = int(data['watermark'])
+        self.indexed_version = str(data['indexed_version'])
+
+    def save(self, path=INDEX_PATH):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **self.state())
+        os.replace(tmp_path, path)
+
+
+class IVFIndex(BruteForceIndex):
+    """Inverted-file index: k-means coarse clusters, exact distances inside the probed clusters"""
+
+    kind = 'ivf'
+
+    def __init__(self, nlist=None, nprobe=8, iterations=10, seed=0):
+        super().__init__()
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids = np.zeros((0, ENCODING_DIM), dtype=np.float32)
+        self.assignments = np.zeros(0, dtype=np.int64)
+        self.order = None
+        self.offsets = None
+
+    def train(self, vectors):
+        """Fit the coarse clusters with k-means on (a sample of) the encodings"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        nlist = self.nlist or max(1, int(round(np.sqrt(len(vectors)))))
+        nlist = min(nlist, len(vectors))
+        rng = np.random.default_rng(self.seed)
+        sample = vectors
+        if len(vectors) > nlist * 256:
+            sample = vectors[rng.choice(len(vectors), nlist * 256, replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            assign = np.argmin(squared_distances(sample, centroids), axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+        self.centroids = centroids
+        self.assignments = np.zeros(0, dtype=np.int64)
+        self.order = None
+
+    def add(self, vectors, student_ids):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        if len(self.centroids) == 0 and len(vectors):
+            self.train(vectors)
+        super().add(vectors, student_ids)
+        if len(vectors):
+            new = np.argmin(squared_distances(vectors, self.centroids), axis=1)
+            self.assignments = np.concatenate([self.assignments, new])
+        self.order = None
+
+    def _build_lists(self):
+        self.order = np.argsort(self.assignments, kind='stable')
+        self.offsets = np.searchsorted(self.assignments[self.order], np.arange(len(self.centroids) + 1))
+
+    def candidates(self, query):
+        if len(self.centroids) == 0:
+            return np.zeros(0, dtype=np.int64)
+        if self.order is None:
+            self._build_lists()
+        nprobe = min(self.nprobe, len(self.centroids))
+        coarse = squared_distances(query[None, :], self.centroids)[0]
+        lists = np.argpartition(coarse, nprobe - 1)[:nprobe]
+        rows = np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+        # Every probed list can be empty (clusters left without encodings); search exhaustively then
+        return rows if len(rows) else None
+
+    def state(self):
+        state = super().state()
+        state.update({
+            'centroids': self.centroids,
+            'assignments': self.assignments,
+            'nprobe': np.int64(self.nprobe),
+        })
+        return state
+
+    def load_state(self, data):
+        super().load_state(data)
+        self.centroids = data['centroids']
+        self.assignments = data['assignments']
+        self.nprobe = int(data['nprobe'])
+        self.order = None
+
+
+INDEX_TYPES = {'brute': BruteForceIndex, 'ivf': IVFIndex}
+
+
+def create_index(kind='auto', size=0, **options):
+    if kind == 'auto':
+        kind = 'ivf' if size >= IVF_MIN_ENCODINGS else 'brute'
+    return INDEX_TYPES[kind](**options)
+
+
+def read_index(path=INDEX_PATH):
+    """Load a saved index, or None if missing/unreadable"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            index = INDEX_TYPES[str(data['kind'])]()
+            index.load_state({key: data[key] for key in data.files})
+        return index
+    except Exception as e:
+        print(f"Ignoring unreadable encoding index {path}: {e}")
+        return None
+
+
+def indexed_version(conn, watermark):
+    cur = conn.cursor()
+    cur.execute(INDEXED_VERSION_QUERY, (int(watermark),))
+    row = cur.fetchone()
+    cur.close()
+    return '|'.join(str(v) for v in row)
+
+
+def fetch_rows_after(conn, watermark):
+    """(encodings, student_ids, new watermark) for active rows with id > watermark"""
+    cur = conn.cursor()
+    cur.execute(INDEXED_ROWS_QUERY, (int(watermark),))
+    rows = cur.fetchall()
+    cur.close()
+    if not rows:
+        return np.zeros((0, ENCODING_DIM), dtype=np.float32), [], watermark
+    matrix, student_ids = encodings_from_rows([row[1:] for row in rows])
+    return matrix, student_ids, max(int(row[0]) for row in rows)
+
+
+def build_index(conn, kind='auto', path=INDEX_PATH, **options):
+    """Build an index over every active encoding and save it"""
+    ensure_schema(conn)
+    matrix, student_ids, watermark = fetch_rows_after(conn, 0)
+    index = create_index(kind, len(matrix), **options)
+    if len(matrix):
+        index.add(matrix, student_ids)
+    index.watermark = watermark
+    index.indexed_version = indexed_version(conn, watermark)
+    if path:
+        index.save(path)
+    return index
+
+
+def load_index(conn, kind='auto', path=INDEX_PATH, **options):
+    """Load the saved index and bring it up to date with student_face_encodings.
+
+    New rows are appended; if rows already in the index were updated or removed
+    (or a different index kind was requested) the index is rebuilt.
+    """
+    index = read_index(path)
+    if index is None or (kind != 'auto' and index.kind != kind):
+        return build_index(conn, kind, path, **options)
+    if indexed_version(conn, index.watermark) != index.indexed_version:
+        return build_index(conn, kind, path, **options)
+
+    matrix, student_ids, watermark = fetch_rows_after(conn, index.watermark)
+    if watermark == index.watermark:
+        return index
+    if kind == 'auto' and index.kind == 'brute' and len(index) + len(matrix) >= IVF_MIN_ENCODINGS:
+        return build_index(conn, kind, path, **options)
+    if len(matrix):
+        index.add(matrix, student_ids)
+    index.watermark = watermark
+    index.indexed_version = indexed_version(conn, watermark)
+    if path:
+        index.save(path)
+    return index
@@ -0,0 +1,224 @@
+"""
+Binary storage and bulk loading of dlib face encodings.
+
+Encodings are kept in student_face_encodings.encoding_blob as packed
+little-endian float32 (512 bytes for 128 dims) instead of JSON text, and are
+loaded into one contiguous (N, 128) matrix. A local snapshot file holds the
+last loaded matrix and is reused until the table changes (row count, MAX(id)
+or MAX(updated_at) differ), so an unchanged gallery costs one small query.
+
+Rows written as JSON (older rows, or faces registered or re-registered from the
+PHP admin page) are converted by migrate_json_rows(), which ensure_schema()
+runs automatically. A non-NULL face_encoding always wins over the BLOB, since
+the migration clears it and only the PHP page writes it afterwards.
+
+    python encoding_store.py --migrate
+"""
+import argparse
+import json
+import os
+import numpy as np
+
+
+ROOT = os.path.dirname(__file__)
+SNAPSHOT_PATH = os.path.join(ROOT, 'face_encodings_snapshot.npz')
+ENCODING_DIM = 128
+ENCODING_DTYPE = np.dtype('<f4')
+
+GALLERY_VERSION_QUERY = """
+    SELECT COUNT(*), MAX(sfe.id), MAX(sfe.updated_at), MAX(u.updated_at)
+    FROM student_face_encodings sfe
+    JOIN users u ON u.id = sfe.student_id
+    WHERE u.status = 'active'
+"""
+
+ENCODINGS_QUERY = """
+    SELECT sfe.student_id, sfe.encoding_blob, sfe.face_encoding
+    FROM student_face_encodings sfe
+    JOIN users u ON u.id = sfe.student_id
+    WHERE u.status = 'active'
+    ORDER BY sfe.id
+"""
+
+
+def pack_encoding(encoding):
+    """Pack a 128-d encoding into the float32 BLOB format"""
+    return np.asarray(encoding, dtype=ENCODING_DTYPE).reshape(ENCODING_DIM).tobytes()
+
+
+def unpack_encoding(blob):
+    return np.frombuffer(bytes(blob), dtype=ENCODING_DTYPE)
+
+
+def has_blob_column(conn):
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'student_face_encodings' AND COLUMN_NAME = 'encoding_blob'"
+    )
+    exists = cur.fetchone()[0] > 0
+    cur.close()
+    return exists
+
+
+def ensure_schema(conn):
+    """Add the encoding_blob column if missing and convert any JSON-only rows"""
+    if not has_blob_column(conn):
+        cur = conn.cursor()
+        cur.execute("ALTER TABLE student_face_encodings ADD COLUMN encoding_blob BLOB NULL AFTER face_encoding")
+        cur.execute("ALTER TABLE student_face_encodings MODIFY COLUMN face_encoding TEXT NULL")
+        conn.commit()
+        cur.close()
+        print("✓ Added student_face_encodings.encoding_blob")
+    migrated = migrate_json_rows(conn)
+    if migrated:
+        print(f"✓ Converted {migrated} JSON encoding(s) to float32 BLOBs")
+    return migrated
+
+
+def migrate_json_rows(conn, batch_size=500):
+    """Move JSON face_encoding values into encoding_blob; returns the row count"""
+    cur = conn.cursor()
+    cur.execute("SELECT id, face_encoding FROM student_face_encodings WHERE face_encoding IS NOT NULL")
+    rows = cur.fetchall()
+    updates = []
+    for row_id, enc_json in rows:
+        try:
+            updates.append((pack_encoding(json.loads(enc_json)), None, row_id))
+        except Exception:
+            print(f"✗ Skipping unreadable encoding row {row_id}")
+    for start in range(0, len(updates), batch_size):
+        cur.executemany(
+            "UPDATE student_face_encodings SET encoding_blob = %s, face_encoding = %s WHERE id = %s",
+            updates[start:start + batch_size],
+        )
+        conn.commit()
+    cur.close()
+    return len(updates)
+
+
+def store_encoding(conn, student_id, encoding, image_path=None):
+    """Insert one encoding as a float32 BLOB"""
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO student_face_encodings (student_id, encoding_blob, image_path) VALUES (%s, %s, %s)",
+        (int(student_id), pack_encoding(encoding), image_path),
+    )
+    conn.commit()
+    cur.close()
+
+
+def insert_encodings(cur, rows):
+    """Insert (student_id, encoding, image_path) rows with one multi-row INSERT (caller commits)"""
+    if not rows:
+        return
+    values = ', '.join(['(%s, %s, %s)'] * len(rows))
+    params = []
+    for student_id, encoding, image_path in rows:
+        params.extend([int(student_id), pack_encoding(encoding), image_path])
+    cur.execute(f"INSERT INTO student_face_encodings (student_id, encoding_blob, image_path) VALUES {values}", params)
+
+
+def gallery_version(conn):
+    """A string that changes whenever the set of active encodings may have changed"""
+    cur = conn.cursor()
+    cur.execute(GALLERY_VERSION_QUERY)
+    row = cur.fetchone()
+    cur.close()
+    return '|'.join(str(v) for v in row)
+
+
+def fetch_encodings(conn):
+    """Bulk-load every active encoding with one query"""
+    cur = conn.cursor()
+    cur.execute(ENCODINGS_QUERY)
+    rows = cur.fetchall()
+    cur.close()
+    return encodings_from_rows(rows)
+
+
+def encodings_from_rows(rows):
+    """Build the (N, 128) float32 matrix and student IDs in a single pass over
+    (student_id, encoding_blob, face_encoding) rows"""
+    matrix = np.empty((len(rows), ENCODING_DIM), dtype=np.float32)
+    student_ids = []
+    n = 0
+    for student_id, blob, enc_json in rows:
+        try:
+            if enc_json is not None:
+                # Row (re)written as JSON since the last migration
+                matrix[n] = json.loads(enc_json)
+            else:
+                matrix[n] = unpack_encoding(blob)
+        except Exception:
+            continue
+        student_ids.append(int(student_id))
+        n += 1
+    return matrix[:n], student_ids
+
+
+def read_snapshot(snapshot_path, version):
+    """Return (matrix, student_ids) from the snapshot if it matches version, else None"""
+    if not snapshot_path or not os.path.exists(snapshot_path):
+        return None
+    try:
+        with np.load(snapshot_path, allow_pickle=False) as data:
+            if str(data['version']) != version:
+                return None
+            return data['encodings'], [int(s) for s in data['student_ids']]
+    except Exception as e:
+        print(f"Ignoring unreadable encoding snapshot {snapshot_path}: {e}")
+        return None
+
+
+def write_snapshot(snapshot_path, version, matrix, student_ids):
+    tmp_path = snapshot_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, version=np.array(version), encodings=matrix,
+                 student_ids=np.array(student_ids, dtype=np.int64))
+    os.replace(tmp_path, snapshot_path)
+
+
+def load_encodings(conn, snapshot_path=SNAPSHOT_PATH):
+    """Load all active encodings as ((N, 128) float32 matrix, student_ids).
+
+    Served from the local snapshot while the table is unchanged; otherwise the
+    schema is brought up to date, the rows are bulk-loaded and the snapshot is
+    rewritten.
+    """
+    version = gallery_version(conn)
+    cached = read_snapshot(snapshot_path, version)
+    if cached is not None:
+        return cached
+
+    if ensure_schema(conn):
+        # Converting rows bumps updated_at
+        version = gallery_version(conn)
+    matrix, student_ids = fetch_encodings(conn)
+    if snapshot_path:
+        try:
+            write_snapshot(snapshot_path, version, matrix, student_ids)
+        except Exception as e:
+            print(f"Could not write encoding snapshot {snapshot_path}: {e}")
+    return matrix, student_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the binary face encoding store')
+    parser.add_argument('--migrate', action='store_true', help='Add encoding_blob and convert JSON rows')
+    args = parser.parse_args()
+
+    import mysql.connector
+    from recognize_face import DB_CONFIG
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        if args.migrate:
+            ensure_schema(conn)
+        matrix, student_ids = load_encodings(conn)
+        print(f"{len(student_ids)} encoding(s) loaded, {matrix.nbytes / 1024:.0f} KiB")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Bulk face enrollment for the dlib recognizer.
+
+Encodes every profile photo in uploads/profiles that has no row in
+student_face_encodings yet and stores the encodings as float32 BLOBs.
+HOG detection and the 128-d encoder run in a process pool (in-process with
+--workers 1) and results stream back as they finish; rows are written with
+multi-row INSERTs, one transaction per batch. Photos already in the table are skipped, so an interrupted run
+picks up where it stopped; photos without a detectable face are remembered in
+a small state file and only retried with --retry_failed.
+
+    python enroll_faces.py [--workers N] [--batch_size 200]
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import time
+import mysql.connector
+from encoding_store import ensure_schema, insert_encodings
+from face_gallery import student_id_from_filename
+
+
+ROOT = os.path.dirname(__file__)
+PROFILES_DIR = os.path.join(ROOT, 'uploads', 'profiles')
+STATE_PATH = os.path.join(ROOT, 'enroll_state.json')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def relative_image_path(fname):
+    return os.path.join('uploads', 'profiles', fname)
+
+
+def encode_image(path):
+    """Worker: return (path, 128-d encoding or None, error message or None)"""
+    import face_recognition
+    try:
+        img = face_recognition.load_image_file(path)
+        boxes = face_recognition.face_locations(img, model='hog')
+        if not boxes:
+            return path, None, 'no face'
+        return path, face_recognition.face_encodings(img, boxes)[0], None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def load_state(state_path):
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'failed': {}}
+
+
+def save_state(state_path, state):
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+
+def pending_images(conn, profiles_dir, state, retry_failed=False):
+    """Profile photos that still need enrolling, as [(fname, student_id)]"""
+    cur = conn.cursor()
+    cur.execute("SELECT image_path FROM student_face_encodings WHERE image_path IS NOT NULL")
+    enrolled = {os.path.basename(row[0].replace('\\', '/')) for row in cur.fetchall()}
+    cur.execute("SELECT id FROM users")
+    user_ids = {int(row[0]) for row in cur.fetchall()}
+    cur.close()
+
+    pending = []
+    unknown = 0
+    for fname in sorted(os.listdir(profiles_dir)):
+        if not fname.lower().endswith(IMAGE_EXTENSIONS) or fname in enrolled:
+            continue
+        if not retry_failed and fname in state['failed']:
+            continue
+        student_id = student_id_from_filename(fname)
+        if student_id is None or student_id not in user_ids:
+            unknown += 1
+            continue
+        pending.append((fname, student_id))
+    if unknown:
+        print(f"Skipping {unknown} photo(s) whose filename does not match a user id")
+    return pending
+
+
+def enroll_profiles(conn, profiles_dir=PROFILES_DIR, workers=None, batch_size=200,
+                    state_path=STATE_PATH, retry_failed=False, progress_every=2.0):
+    """Encode and store all pending profile photos; returns (enrolled, failed).
+
+    workers=1 encodes in the calling process without starting a pool.
+    """
+    ensure_schema(conn)
+    state = load_state(state_path)
+    pending = pending_images(conn, profiles_dir, state, retry_failed)
+    total = len(pending)
+    if not total:
+        print("Nothing to enroll.")
+        return 0, 0
+
+    workers = workers or os.cpu_count() or 1
+    print(f"Enrolling {total} photo(s) with {workers} worker(s)...")
+    student_by_path = {os.path.join(profiles_dir, fname): (fname, sid) for fname, sid in pending}
+
+    enrolled = 0
+    failed = 0
+    done = 0
+    batch = []
+    start = time.time()
+    last_report = start
+    cur = conn.cursor()
+
+    def flush():
+        nonlocal enrolled
+        if not batch:
+            return
+        insert_encodings(cur, batch)
+        conn.commit()
+        enrolled += len(batch)
+        batch.clear()
+        save_state(state_path, state)
+
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    if pool is not None:
+        results = pool.imap_unordered(encode_image, list(student_by_path), chunksize=4)
+    else:
+        results = map(encode_image, list(student_by_path))
+    with pool or contextlib.nullcontext():
+        try:
+            for path, encoding, error in results:
+                fname, student_id = student_by_path[path]
+                done += 1
+                if encoding is None:
+                    failed += 1
+                    state['failed'][fname] = error
+                else:
+                    state['failed'].pop(fname, None)
+                    batch.append((student_id, encoding, relative_image_path(fname)))
+                if len(batch) >= batch_size:
+                    flush()
+
+                now = time.time()
+                if now - last_report >= progress_every or done == total:
+                    rate = done / (now - start) if now > start else 0.0
+                    eta = (total - done) / rate if rate else 0.0
+                    print(f"[{done}/{total}] {rate:.1f} img/s, {failed} without face, ETA {eta:.0f}s")
+                    last_report = now
+            flush()
+            save_state(state_path, state)
+        except BaseException:
+            # Keep what was encoded so far; the next run resumes after it
+            flush()
+            raise
+        finally:
+            cur.close()
+
+    elapsed = time.time() - start
+    print(f"✓ Enrolled {enrolled} face(s), {failed} failed, in {elapsed:.1f}s ({total / elapsed:.1f} img/s)")
+    return enrolled, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-enroll profile photos into student_face_encodings')
+    parser.add_argument('--profiles_dir', default=PROFILES_DIR)
+    parser.add_argument('--workers', type=int, default=None, help='Encoder processes (default: all cores)')
+    parser.add_argument('--batch_size', type=int, default=200, help='Rows per INSERT/transaction')
+    parser.add_argument('--retry_failed', action='store_true', help='Retry photos where no face was found before')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.profiles_dir):
+        print('No images directory found at', args.profiles_dir)
+        return
+
+    from recognize_face import DB_CONFIG
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        enroll_profiles(conn, args.profiles_dir, args.workers, args.batch_size, retry_failed=args.retry_failed)
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun to continue where it stopped.")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+One-to-one assignment of detected faces to students.
+
+Scores every face in a frame against the gallery in one (faces x gallery)
+distance matrix, collapses it to one column per student (their closest
+encoding) and assigns faces to students so no student is claimed by two faces.
+Uses scipy's Hungarian solver when scipy is installed, otherwise a greedy
+closest-pair-first assignment.
+"""
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+
+def distance_matrix(face_encodings, known_encodings):
+    """(faces x known) Euclidean distances, same values as face_recognition.face_distance"""
+    faces = np.atleast_2d(np.asarray(face_encodings, dtype=np.float64))
+    known = np.atleast_2d(np.asarray(known_encodings, dtype=np.float64))
+    if faces.size == 0 or known.size == 0:
+        return np.zeros((len(faces) if faces.size else 0, len(known) if known.size else 0))
+    d = (np.einsum('ij,ij->i', faces, faces)[:, None] - 2.0 * faces @ known.T
+         + np.einsum('ij,ij->i', known, known)[None, :])
+    return np.sqrt(np.maximum(d, 0.0))
+
+
+def per_label(distances, labels):
+    """Collapse columns sharing a label (several encodings of one student) to their minimum.
+
+    Returns (unique labels, faces x labels distance matrix).
+    """
+    unique = list(dict.fromkeys(labels))
+    if not unique:
+        return unique, np.zeros((len(distances), 0))
+    column = {label: i for i, label in enumerate(unique)}
+    collapsed = np.full((len(distances), len(unique)), np.inf)
+    for j, label in enumerate(labels):
+        c = column[label]
+        collapsed[:, c] = np.minimum(collapsed[:, c], distances[:, j])
+    return unique, collapsed
+
+
+def candidate_matrix(candidates):
+    """Build (labels, faces x labels distances) from per-face [(label, distance), ...] lists,
+    e.g. embedding_index search results; pairs that were not returned are inf"""
+    labels = list(dict.fromkeys(label for matches in candidates for label, _ in matches))
+    column = {label: i for i, label in enumerate(labels)}
+    distances = np.full((len(candidates), len(labels)), np.inf)
+    for i, matches in enumerate(candidates):
+        for label, dist in matches:
+            distances[i, column[label]] = min(distances[i, column[label]], dist)
+    return labels, distances
+
+
+def assign_faces(distances, tolerance=0.6):
+    """Assign each face (row) at most one label (column) within tolerance, each column at most once.
+
+    Returns a list with the column index or None per face.
+    """
+    n_faces = distances.shape[0]
+    assignment = [None] * n_faces
+    if distances.size == 0:
+        return assignment
+
+    allowed = distances <= tolerance
+    if linear_sum_assignment is not None:
+        # Minimize total distance; disallowed pairs get a cost no valid assignment can reach
+        cost = np.where(allowed, distances, tolerance * (n_faces + 1) + 1.0)
+        rows, cols = linear_sum_assignment(cost)
+        for r, c in zip(rows, cols):
+            if allowed[r, c]:
+                assignment[r] = int(c)
+        return assignment
+
+    taken = set()
+    for flat in np.argsort(distances, axis=None, kind='stable'):
+        r, c = divmod(int(flat), distances.shape[1])
+        if not allowed[r, c]:
+            break
+        if assignment[r] is None and c not in taken:
+            assignment[r] = c
+            taken.add(c)
+    return assignment
+
+
+def match_faces(face_encodings, known_encodings, known_labels, tolerance=0.6):
+    """Score all faces against the gallery at once and resolve them one-to-one.
+
+    Returns per face (label or None, distance to that label or to the closest label).
+    """
+    labels, distances = per_label(distance_matrix(face_encodings, known_encodings), list(known_labels))
+    results = []
+    for i, col in enumerate(assign_faces(distances, tolerance)):
+        if col is not None:
+            results.append((labels[col], float(distances[i, col])))
+        else:
+            results.append((None, float(distances[i].min()) if distances.shape[1] else None))
+    return results
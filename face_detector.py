@@ -0,0 +1,168 @@
+"""
+Shared Haar cascade face detector.
+
+cv2.CascadeClassifier parses its XML on construction and is not safe to share
+between threads, so classifiers are kept in a per-thread registry: each thread
+loads a cascade once and reuses it for every call. Detection settings live in
+DETECTION_PROFILES instead of being hard-coded at each call site.
+
+FrameDetector runs live-frame detection on a downscaled copy and maps the
+boxes back to full resolution, optionally bounding the searched face sizes by
+what the camera can see at its mounting distance.
+"""
+import argparse
+import math
+import threading
+import time
+import cv2
+
+
+CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+
+DETECTION_PROFILES = {
+    # Live frames, CLI probes and reference photos
+    'default': {'scaleFactor': 1.1, 'minNeighbors': 5, 'minSize': (30, 30)},
+    # LBPH training only keeps reasonably large, well-framed faces
+    'training': {'scaleFactor': 1.1, 'minNeighbors': 5, 'minSize': (80, 80)},
+}
+
+# Detection window of haarcascade_frontalface_default; smaller faces cannot be found
+CASCADE_WINDOW = 24
+# Typical adult face width, for predicting face size from camera geometry
+FACE_WIDTH_M = 0.15
+
+_registry = threading.local()
+_loads_lock = threading.Lock()
+_loads = 0
+
+
+def get_cascade(cascade_path=CASCADE_PATH):
+    """Return this thread's classifier for cascade_path, loading it on first use"""
+    global _loads
+    cascades = getattr(_registry, 'cascades', None)
+    if cascades is None:
+        cascades = _registry.cascades = {}
+    cascade = cascades.get(cascade_path)
+    if cascade is None:
+        cascade = cv2.CascadeClassifier(cascade_path)
+        if cascade.empty():
+            raise RuntimeError(f"Could not load cascade from {cascade_path}")
+        cascades[cascade_path] = cascade
+        with _loads_lock:
+            _loads += 1
+    return cascade
+
+
+def cascade_loads():
+    """Number of classifiers loaded so far across all threads"""
+    return _loads
+
+
+def detection_params(profile='default', **overrides):
+    """Merge a named detection profile with per-call overrides"""
+    params = dict(DETECTION_PROFILES[profile])
+    params.update(overrides)
+    return params
+
+
+def detect_faces(gray, profile='default', cascade_path=CASCADE_PATH, **overrides):
+    """Detect faces in a grayscale image and return (x, y, w, h) boxes"""
+    return get_cascade(cascade_path).detectMultiScale(gray, **detection_params(profile, **overrides))
+
+
+def largest_face(faces):
+    """Return the box with the largest area, or None if there are no boxes"""
+    if len(faces) == 0:
+        return None
+    return max(faces, key=lambda f: f[2] * f[3])
+
+
+def detect_largest_face(gray, profile='default', **overrides):
+    """Return the grayscale ROI of the largest detected face, or None"""
+    box = largest_face(detect_faces(gray, profile, **overrides))
+    if box is None:
+        return None
+    x, y, w, h = box
+    return gray[y:y + h, x:x + w]
+
+
+def expected_face_px(frame_width, distance_m, hfov_deg=60.0, face_width_m=FACE_WIDTH_M):
+    """Face width in pixels for a camera with horizontal field of view hfov_deg at distance_m"""
+    focal_px = (frame_width / 2.0) / math.tan(math.radians(hfov_deg) / 2.0)
+    return focal_px * face_width_m / distance_m
+
+
+class FrameDetector:
+    """Face detection for live frames on a downscaled copy, with full-resolution boxes.
+
+    scale < 1 shrinks the frame before detectMultiScale, so the image pyramid
+    has far fewer pixels; boxes are scaled back so ROIs are cut from the
+    full-resolution frame. With distance_m set, minSize/maxSize are derived from
+    the face size expected at that distance (faces between size_range of it),
+    which also skips pyramid levels that cannot contain a face.
+    detection_ms is a moving average of the time per frame.
+    """
+
+    def __init__(self, scale=1.0, distance_m=None, hfov_deg=60.0, size_range=(0.5, 2.0), profile='default'):
+        if not 0 < scale <= 1:
+            raise ValueError(f"Detection scale must be in (0, 1], got {scale}")
+        self.scale = scale
+        self.distance_m = distance_m
+        self.hfov_deg = hfov_deg
+        self.size_range = size_range
+        self.profile = profile
+        self.detection_ms = 0.0
+
+    def size_limits(self, frame_width):
+        """(minSize, maxSize or None) in the coordinates of the downscaled image"""
+        if self.distance_m:
+            face = expected_face_px(frame_width, self.distance_m, self.hfov_deg) * self.scale
+            min_side = max(CASCADE_WINDOW, int(face * self.size_range[0]))
+            max_side = max(min_side + 1, int(math.ceil(face * self.size_range[1])))
+            return (min_side, min_side), (max_side, max_side)
+        min_w, min_h = DETECTION_PROFILES[self.profile]['minSize']
+        return (max(CASCADE_WINDOW, int(min_w * self.scale)), max(CASCADE_WINDOW, int(min_h * self.scale))), None
+
+    def detect(self, gray):
+        """Detect faces in a full-resolution grayscale frame; returns (x, y, w, h) boxes at full resolution"""
+        start = time.perf_counter()
+        height, width = gray.shape[:2]
+        small = gray
+        if self.scale < 1.0:
+            small = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        min_size, max_size = self.size_limits(width)
+        overrides = {'minSize': min_size}
+        if max_size is not None:
+            overrides['maxSize'] = max_size
+        faces = detect_faces(small, self.profile, **overrides)
+
+        boxes = []
+        for (x, y, w, h) in faces:
+            x0, y0 = int(round(x / self.scale)), int(round(y / self.scale))
+            x1, y1 = min(width, int(round((x + w) / self.scale))), min(height, int(round((y + h) / self.scale)))
+            boxes.append((x0, y0, x1 - x0, y1 - y0))
+
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        self.detection_ms = elapsed_ms if not self.detection_ms else 0.9 * self.detection_ms + 0.1 * elapsed_ms
+        return boxes
+
+
+def detection_scale(value):
+    """argparse type for --detect_scale: a downscale factor in (0, 1]"""
+    scale = float(value)
+    if not 0 < scale <= 1:
+        raise argparse.ArgumentTypeError(f"must be greater than 0 and at most 1, got {value}")
+    return scale
+
+
+def add_detection_arguments(parser):
+    """Command-line options for FrameDetector, shared by the live recognition entry points"""
+    parser.add_argument('--detect_scale', type=detection_scale, default=1.0,
+                        help='Run face detection on a copy downscaled by this factor in (0, 1], e.g. 0.5')
+    parser.add_argument('--camera_distance', type=float, default=None,
+                        help='Typical camera-to-face distance in metres; bounds the detected face sizes')
+    parser.add_argument('--camera_fov', type=float, default=60.0, help='Horizontal field of view of the camera in degrees')
+
+
+def detector_from_args(args):
+    return FrameDetector(args.detect_scale, args.camera_distance, args.camera_fov)
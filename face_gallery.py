@@ -0,0 +1,254 @@
+import os
+import re
+import struct
+import zipfile
+import cv2
+import numpy as np
+from face_detector import detect_largest_face
+
+
+ROOT = os.path.dirname(__file__)
+PHOTOS_DIR = os.path.join(ROOT, 'uploads', 'profiles')
+GALLERY_CACHE_PATH = os.path.join(ROOT, 'face_gallery_cache.npz')
+
+# Bump when the ROI extraction below changes so stale caches are rebuilt
+GALLERY_CACHE_VERSION = 1
+FACE_SIZE = (100, 100)
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp']
+
+
+def student_id_from_filename(fname):
+    """users.id of a profile photo: the first number in its filename ('123.jpg', 'profile_123_1700000000.png')"""
+    m = re.findall(r"\d+", fname)
+    return int(m[0]) if m else None
+
+
+def _extract_face_roi(image_path):
+    """Decode an image and return the normalized ROI of its largest face, or None"""
+    img = cv2.imread(image_path)
+    if img is None:
+        return None
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    face = detect_largest_face(gray)
+    if face is None:
+        return None
+    return cv2.resize(face, FACE_SIZE)
+
+
+def read_cache(cache_path):
+    """Read cached entries keyed by filename, or an empty dict if the cache is missing/stale.
+
+    Each entry is {'mtime_ns', 'size', 'has_face', 'face'}, as passed to write_cache().
+    """
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with np.load(cache_path, allow_pickle=False) as data:
+            if int(data['version']) != GALLERY_CACHE_VERSION:
+                return {}
+            # NpzFile re-reads a member on every access, so pull each array once
+            filenames, mtimes, sizes = data['filenames'], data['mtimes'], data['sizes']
+            has_face, faces = data['has_face'], data['faces']
+        entries = {}
+        for i, filename in enumerate(filenames):
+            entries[str(filename)] = {
+                'mtime_ns': int(mtimes[i]),
+                'size': int(sizes[i]),
+                'has_face': bool(has_face[i]),
+                'face': faces[i],
+            }
+        return entries
+    except Exception as e:
+        print(f"Ignoring unreadable gallery cache {cache_path}: {e}")
+        return {}
+
+
+def write_cache(cache_path, filenames, entries):
+    """Atomically write entries (filename -> read_cache() entry) for filenames as an uncompressed .npz"""
+    faces = np.zeros((len(filenames),) + FACE_SIZE[::-1], dtype=np.uint8)
+    for i, filename in enumerate(filenames):
+        if entries[filename]['has_face']:
+            faces[i] = entries[filename]['face']
+
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(
+            f,
+            version=np.int64(GALLERY_CACHE_VERSION),
+            filenames=np.array(filenames, dtype=str),
+            mtimes=np.array([entries[n]['mtime_ns'] for n in filenames], dtype=np.int64),
+            sizes=np.array([entries[n]['size'] for n in filenames], dtype=np.int64),
+            has_face=np.array([entries[n]['has_face'] for n in filenames], dtype=bool),
+            faces=faces,
+        )
+    os.replace(tmp_path, cache_path)
+
+
+def _read_cached_rows(cache_path, filenames):
+    """Read cache entries for just `filenames`, seeking to their rows of the face array.
+
+    The cache .npz is an uncompressed zip, so each face is read straight from its
+    file offset instead of loading the whole (N, 100, 100) array.
+    """
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    try:
+        with np.load(cache_path, allow_pickle=False) as data:
+            if int(data['version']) != GALLERY_CACHE_VERSION:
+                return {}
+            cached_names = data['filenames']
+            rows = np.nonzero(np.isin(cached_names, list(filenames)))[0]
+            if len(rows) == 0:
+                return {}
+            mtimes, sizes, has_face = data['mtimes'], data['sizes'], data['has_face']
+            info = data.zip.getinfo('faces.npy')
+        if info.compress_type != zipfile.ZIP_STORED:
+            return {}
+
+        entries = {}
+        with open(cache_path, 'rb') as f:
+            # Skip the zip local file header to reach the .npy member
+            f.seek(info.header_offset)
+            name_len, extra_len = struct.unpack('<HH', f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+            start = f.tell()
+            row_bytes = int(np.prod(shape[1:])) * dtype.itemsize
+            for i in rows:
+                f.seek(start + int(i) * row_bytes)
+                face = np.frombuffer(f.read(row_bytes), dtype=dtype).reshape(shape[1:])
+                entries[str(cached_names[i])] = {
+                    'mtime_ns': int(mtimes[i]),
+                    'size': int(sizes[i]),
+                    'has_face': bool(has_face[i]),
+                    'face': face,
+                }
+        return entries
+    except Exception as e:
+        print(f"Ignoring unreadable gallery cache {cache_path}: {e}")
+        return {}
+
+
+def load_gallery(photos_dir=PHOTOS_DIR, cache_path=GALLERY_CACHE_PATH, verbose=False):
+    """Load reference face ROIs, re-processing only photos that changed since the last cache write.
+
+    Returns (faces, names, student_ids) where faces is a (N, 100, 100) uint8 array
+    in directory listing order.
+    """
+    empty = np.zeros((0,) + FACE_SIZE[::-1], dtype=np.uint8)
+    if not os.path.exists(photos_dir):
+        if verbose:
+            print("No profiles directory found")
+        return empty, [], []
+
+    cached = read_cache(cache_path) if cache_path else {}
+    entries = {}
+    filenames = []
+    processed = 0
+
+    for filename in os.listdir(photos_dir):
+        if not any(filename.lower().endswith(ext) for ext in IMAGE_EXTENSIONS):
+            continue
+        image_path = os.path.join(photos_dir, filename)
+        try:
+            st = os.stat(image_path)
+        except OSError:
+            continue
+
+        entry = cached.get(filename)
+        if entry is None or entry['mtime_ns'] != st.st_mtime_ns or entry['size'] != st.st_size:
+            # New or changed photo: decode and detect
+            try:
+                face = _extract_face_roi(image_path)
+            except Exception as e:
+                print(f"Error loading {filename}: {e}")
+                continue
+            entry = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'has_face': face is not None, 'face': face}
+            processed += 1
+            if verbose:
+                if face is None:
+                    print(f"✗ No face found in: {filename}")
+                else:
+                    print(f"✓ Processed reference photo: {filename}")
+
+        entries[filename] = entry
+        filenames.append(filename)
+
+    # Rewrite the cache only when something was added, changed or removed
+    if cache_path and (processed or set(filenames) != set(cached)):
+        try:
+            write_cache(cache_path, filenames, entries)
+        except Exception as e:
+            print(f"Could not write gallery cache {cache_path}: {e}")
+
+    kept = [n for n in filenames if entries[n]['has_face']]
+    faces = np.stack([entries[n]['face'] for n in kept]) if kept else empty
+    names = [os.path.splitext(n)[0] for n in kept]
+    student_ids = [student_id_from_filename(name) for name in names]
+
+    if verbose:
+        print(f"Gallery: {len(kept)} face(s), {processed} photo(s) processed, {len(filenames) - processed} from cache")
+
+    return faces, names, student_ids
+
+
+def load_student_gallery(student_id, photos_dir=PHOTOS_DIR, cache_path=GALLERY_CACHE_PATH):
+    """Load only one student's reference ROIs, for 1:1 verification.
+
+    The student's photos ('<id>.<ext>' or 'profile_<id>_<ts>.<ext>') are picked
+    by the ID in their filename, without decoding the others, and their ROIs are
+    read from the gallery cache by row.
+    Returns (faces, names, student_ids) like load_gallery.
+    """
+    empty = np.zeros((0,) + FACE_SIZE[::-1], dtype=np.uint8)
+    try:
+        filenames = os.listdir(photos_dir)
+    except OSError:
+        return empty, [], []
+    candidates = {}
+    seen_paths = set()
+    for filename in sorted(filenames):
+        if not any(filename.lower().endswith(ext) for ext in IMAGE_EXTENSIONS):
+            continue
+        if student_id_from_filename(filename) != int(student_id):
+            continue
+        image_path = os.path.join(photos_dir, filename)
+        # The same file reached through a link or another spelling is loaded once
+        real_path = os.path.normcase(os.path.realpath(image_path))
+        if real_path in seen_paths:
+            continue
+        try:
+            candidates[filename] = os.stat(image_path)
+        except OSError:
+            continue
+        seen_paths.add(real_path)
+    if not candidates:
+        return empty, [], []
+
+    cached = _read_cached_rows(cache_path, candidates)
+    faces = []
+    names = []
+    for filename in sorted(candidates):
+        st = candidates[filename]
+        entry = cached.get(filename)
+        if entry is not None and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            face = entry['face'] if entry['has_face'] else None
+        else:
+            # Not cached yet (or changed): detect now; the next full load refreshes the cache
+            try:
+                face = _extract_face_roi(os.path.join(photos_dir, filename))
+            except Exception as e:
+                print(f"Error loading {filename}: {e}")
+                continue
+        if face is not None:
+            faces.append(face)
+            names.append(os.path.splitext(filename)[0])
+
+    if not faces:
+        return empty, [], []
+    return np.stack(faces), names, [student_id_from_filename(name) for name in names]
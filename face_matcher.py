@@ -0,0 +1,94 @@
+import cv2
+import numpy as np
+
+
+FACE_SIZE = (100, 100)
+
+
+def normalize_faces(faces):
+    """Equalize face ROIs and flatten them into zero-mean, unit-norm float32 rows.
+
+    For two same-size images cv2.TM_CCOEFF_NORMED is the Pearson correlation of
+    their pixels, so the dot product of two normalized rows reproduces it exactly.
+    """
+    rows = np.empty((len(faces), FACE_SIZE[0] * FACE_SIZE[1]), dtype=np.float32)
+    for i, face in enumerate(faces):
+        if face.shape[:2] != (FACE_SIZE[1], FACE_SIZE[0]):
+            face = cv2.resize(face, FACE_SIZE)
+        vec = cv2.equalizeHist(face).astype(np.float64).ravel()
+        vec -= vec.mean()
+        norm = np.linalg.norm(vec)
+        # A flat image has no correlation with anything
+        rows[i] = vec / norm if norm > 0 else 0.0
+    return rows
+
+
+class FaceMatcher:
+    """Scores probe faces against a whole reference gallery with one matrix product"""
+
+    def __init__(self, reference_faces, reference_student_ids=None, reference_names=None):
+        self.gallery = np.ascontiguousarray(normalize_faces(reference_faces))
+        self.student_ids = list(reference_student_ids) if reference_student_ids is not None else [None] * len(self.gallery)
+        self.names = list(reference_names) if reference_names is not None else [None] * len(self.gallery)
+        # student_id -> gallery rows, for 1:1 verification
+        self.rows_by_student = {}
+        for i, student_id in enumerate(self.student_ids):
+            if student_id is not None:
+                self.rows_by_student.setdefault(int(student_id), []).append(i)
+
+    def __len__(self):
+        return len(self.gallery)
+
+    def face_rois(self, gray, boxes):
+        """Probes for best_matches() from a full-resolution grayscale image and face boxes"""
+        return [cv2.resize(gray[y:y+h, x:x+w], FACE_SIZE) for (x, y, w, h) in boxes]
+
+    def score(self, probes):
+        """Return the (probes x gallery) similarity matrix for a batch of face ROIs"""
+        if len(probes) == 0 or len(self.gallery) == 0:
+            return np.zeros((len(probes), len(self.gallery)), dtype=np.float32)
+        return normalize_faces(probes) @ self.gallery.T
+
+    def best_matches(self, probes, threshold=0.4):
+        """Return (index, similarity) of the best reference above threshold per probe, (None, 0.0) otherwise"""
+        results = []
+        for row in self.score(probes):
+            if len(row) == 0:
+                results.append((None, 0.0))
+                continue
+            idx = int(np.argmax(row))
+            similarity = float(row[idx])
+            results.append((idx, similarity) if similarity > threshold else (None, 0.0))
+        return results
+
+    def best_match(self, probe, threshold=0.4):
+        """Single-probe convenience wrapper around best_matches"""
+        return self.best_matches([probe], threshold)[0]
+
+    def verify(self, probe, student_id, threshold=0.4):
+        """Score a probe against one student's references only.
+
+        Returns (index, similarity) of that student's best reference above
+        threshold, or (None, 0.0).
+        """
+        rows = self.rows_by_student.get(int(student_id))
+        if not rows:
+            return None, 0.0
+        scores = normalize_faces([probe])[0] @ self.gallery[rows].T
+        best = int(np.argmax(scores))
+        similarity = float(scores[best])
+        return (rows[best], similarity) if similarity > threshold else (None, 0.0)
+
+    def top_k(self, probes, k=5):
+        """Return, per probe, the k best (student_id, name, similarity) tuples in descending order"""
+        scores = self.score(probes)
+        k = min(k, scores.shape[1])
+        results = []
+        for row in scores:
+            if k == 0:
+                results.append([])
+                continue
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top], kind='stable')]
+            results.append([(self.student_ids[i], self.names[i], float(row[i])) for i in top])
+        return results
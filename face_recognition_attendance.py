@@ -1,12 +1,22 @@
+import argparse
+import contextlib
 import cv2
-import os
-import numpy as np
-import json
-import mysql.connector
+import queue
 import sys
 import time
 import threading
-from datetime import datetime
+from attendance_writer import AttendanceEvent, AttendanceWriter
+from camera_discovery import load_camera_cache
+from capture_pipeline import DropOldestQueue, FrameGrabber, RecognitionWorkers
+from cascade_matcher import add_cascade_arguments, cascade_options_from_args
+from face_detector import add_detection_arguments, detector_from_args
+from face_matcher import FaceMatcher
+from face_tracker import FaceTracker
+from gallery_partition import PartitionedMatcher, load_enrolled_student_ids
+from headless_control import ControlServer, EventEmitter, install_signal_handlers
+from lbph_backend import RECOGNITION_BACKENDS
+from multi_camera import CameraStream
+from video_attendance import run_video_attendance
 from recognize_face import RobustFaceRecognition
 
 
@@ -22,110 +32,118 @@ DB_CONFIG = {
 class AttendanceFaceRecognition(RobustFaceRecognition):
     """Extended face recognition class with attendance marking capabilities"""
     
-    def __init__(self, session_instance_id=None):
-        super().__init__()
+    def __init__(self, session_instance_id=None, detector=None, tracker=None, campus_fallback=False, backend='template',
+                 cascade_options=None):
+        super().__init__(detector, tracker, backend, cascade_options)
         self.session_instance_id = session_instance_id
         self.attendance_marked = set()  # Track which students have already been marked
+        self.attendance_lock = threading.Lock()
+        self.attendance_writer = AttendanceWriter(
+            DB_CONFIG, session_instance_id,
+            on_written=self.on_attendance_written, on_failed=self.on_attendance_failed)
+        self.results_lock = threading.Lock()
+        self.last_results = []
+        self.last_result_seq = 0
+        # Set in headless mode: structured events instead of an overlay window
+        self.events = None
+        self.frames_processed = 0
+        # Students of the session's class (None: no session or unknown, match the whole gallery)
+        self.enrolled_student_ids = None
+        self.campus_fallback = campus_fallback
     
-    def mark_attendance(self, student_id):
-        """Mark attendance in the database"""
+    def load_reference_faces(self):
+        """Load the gallery and, for a fixed session, restrict matching to the class's students"""
+        super().load_reference_faces()
+        if self.session_instance_id:
+            self.partition_gallery()
+    
+    def partition_gallery(self):
+        """Match against the students enrolled in the session's class (resolved once)"""
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor()
-            
-            if self.session_instance_id:
-                # Mark attendance for specific session
-                query = """
-                    INSERT INTO attendance_records (student_id, session_instance_id, status, check_in_time) 
-                    VALUES (%s, %s, 'present', NOW())
-                    ON DUPLICATE KEY UPDATE status = 'present', check_in_time = NOW()
-                """
-                cursor.execute(query, (student_id, self.session_instance_id))
-            else:
-                # Find current active session for this student
-                query = """
-                    SELECT si.id 
-                    FROM student_enrollments se
-                    JOIN classes c ON se.class_id = c.id
-                    JOIN timetable_sessions ts ON ts.class_id = c.id
-                    JOIN session_instances si ON si.timetable_session_id = ts.id AND si.session_date = CURDATE()
-                    WHERE se.student_id = %s 
-                      AND se.status = 'enrolled' 
-                      AND c.status = 'active'
-                      AND si.status = 'in_progress'
-                      AND NOW() BETWEEN CONCAT(si.session_date, ' ', ts.start_time) 
-                      AND CONCAT(si.session_date, ' ', ts.end_time)
-                    LIMIT 1
-                """
-                cursor.execute(query, (student_id,))
-                result = cursor.fetchone()
-                
-                if result:
-                    session_id = result[0]
-                    query = """
-                        INSERT INTO attendance_records (student_id, session_instance_id, status, check_in_time) 
-                        VALUES (%s, %s, 'present', NOW())
-                        ON DUPLICATE KEY UPDATE status = 'present', check_in_time = NOW()
-                    """
-                    cursor.execute(query, (student_id, session_id))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
+            conn = self.attendance_writer.get_connection()
+            try:
+                enrolled = load_enrolled_student_ids(conn, self.session_instance_id)
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Could not load enrolled students, matching against the whole gallery: {e}")
+            return
+        if not enrolled:
+            print(f"No students enrolled for session {self.session_instance_id}, matching against the whole gallery")
+            return
+        
+        self.enrolled_student_ids = enrolled
+        if not isinstance(self.matcher, FaceMatcher):
+            # The LBPH model predicts over every trained student; only attendance is restricted
+            print(f"Marking attendance for the {len(enrolled)} enrolled student(s) only")
+            return
+        self.matcher = PartitionedMatcher(self.matcher, enrolled, self.campus_fallback)
+        fallback_note = " (campus-wide fallback on)" if self.campus_fallback else ""
+        print(f"Matching against {len(self.matcher)} of {len(self.reference_faces)} reference face(s) "
+              f"for {len(enrolled)} enrolled student(s){fallback_note}")
+    
+    def is_enrolled(self, student_id):
+        """False for students recognized only through the campus-wide fallback"""
+        return self.enrolled_student_ids is None or student_id in self.enrolled_student_ids
+    
+    def mark_attendance(self, student_id, confidence=None):
+        """Mark attendance in the database (synchronously, over the writer's connection pool)"""
+        try:
+            written, unresolved = self.attendance_writer.write([AttendanceEvent(student_id, confidence)])
+            if unresolved:
+                print(f"No active session found for Student {student_id}")
             return True
         except Exception as e:
             print(f"Database error: {e}")
             return False
     
+    def recognize_faces(self, frame):
+        """Detect and identify faces without drawing; returns a list of (box, name, student_id, similarity)"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces = self.detector.detect(gray)
+        
+        # Extract and normalize every full-resolution face ROI, then score them against the gallery in one batch
+        face_rois = self.matcher.face_rois(gray, faces)
+        best = self.matcher.best_matches(face_rois, threshold=0.4)
+        
+        results = []
+        for box, (idx, best_similarity) in zip(faces, best):
+            best_match = self.matcher.names[idx] if idx is not None else None
+            best_student_id = self.matcher.student_ids[idx] if idx is not None else None
+            results.append((tuple(int(v) for v in box), best_match, best_student_id, best_similarity))
+        return results
+    
+    def draw_face_results(self, frame, results):
+        """Draw a labelled rectangle for every recognized face"""
+        for (x, y, w, h), best_match, best_student_id, best_similarity in results:
+            if best_match and best_student_id:
+                color = (0, 255, 0)  # Green for match
+                label = f"Student {best_student_id} ({best_similarity:.2f})"
+            else:
+                color = (0, 0, 255)  # Red for unknown
+                label = "Unknown"
+            
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+            cv2.rectangle(frame, (x, y - 30), (x + w, y), color, cv2.FILLED)
+            cv2.putText(frame, label, (x + 5, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    
     def check_face_match_with_attendance(self, frame):
         """Check for face matches and return student IDs for attendance marking"""
         if frame is None:
             return [], [], []
             
         try:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(
-                gray, 
-                scaleFactor=1.1, 
-                minNeighbors=5, 
-                minSize=(30, 30)
-            )
+            results = self.recognize_faces(frame)
+            self.draw_face_results(frame, results)
             
             matches_found = []
             matched_student_ids = []
             confidences = []
-            
-            for (x, y, w, h) in faces:
-                # Extract face region
-                face_roi = gray[y:y+h, x:x+w]
-                face_roi = cv2.resize(face_roi, (100, 100))
-                
-                best_match = None
-                best_similarity = 0
-                best_student_id = None
-                
-                # Compare with all reference faces
-                for i, ref_face in enumerate(self.reference_faces):
-                    is_match, similarity = self.compare_faces(ref_face, face_roi)
-                    if is_match and similarity > best_similarity:
-                        best_similarity = similarity
-                        best_match = self.reference_names[i]
-                        best_student_id = self.reference_student_ids[i]
-                
-                # Draw rectangle and label
+            for _, best_match, best_student_id, best_similarity in results:
                 if best_match and best_student_id:
-                    color = (0, 255, 0)  # Green for match
-                    label = f"Student {best_student_id} ({best_similarity:.2f})"
                     matches_found.append(best_match)
                     matched_student_ids.append(best_student_id)
                     confidences.append(best_similarity)
-                else:
-                    color = (0, 0, 255)  # Red for unknown
-                    label = "Unknown"
-                
-                cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
-                cv2.rectangle(frame, (x, y - 30), (x + w, y), color, cv2.FILLED)
-                cv2.putText(frame, label, (x + 5, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
             
             return matches_found, matched_student_ids, confidences
             
@@ -156,45 +174,36 @@ class AttendanceFaceRecognition(RobustFaceRecognition):
         print("\nWhen MATCH FOUND appears, attendance will be automatically marked!")
         
         frame_count = 0
-        last_camera_check = time.time()
         
         while self.running:
             try:
-                with self.camera_lock:
-                    if self.cap is None or not self.cap.isOpened():
-                        print("Camera not available, trying to reinitialize...")
-                        if not self.initialize_camera():
-                            time.sleep(1)
-                            continue
-                    
-                    ret, frame = self.cap.read()
-                
+                ret, frame = self.read_frame()
                 if not ret or frame is None:
-                    print("Failed to read frame, trying to reinitialize camera...")
                     time.sleep(0.1)
-                    if time.time() - last_camera_check > 2:
-                        self.initialize_camera()
-                        last_camera_check = time.time()
                     continue
                 
                 frame_count += 1
                 
-                # Check for face matches with attendance marking
-                if frame_count % 5 == 0:  # Process every 5th frame
-                    matches, student_ids, confidences = self.check_face_match_with_attendance(frame)
+                # Detect every 5th frame and follow the tracked faces in between;
+                # only new or uncertain tracks go through the matcher
+                if frame_count % 5 == 0:
+                    tracks = self.track_faces(frame)
                     
-                    # Auto-mark attendance for matched students
-                    for i, student_id in enumerate(student_ids):
-                        if student_id and student_id not in self.attendance_marked:
-                            if self.mark_attendance(student_id):
-                                print(f"✓ SUCCESS: Attendance marked for Student {student_id} (confidence: {confidences[i]:.2f})")
+                    # Auto-mark attendance for identified students
+                    for track in tracks:
+                        student_id = track.student_id
+                        if student_id and student_id not in self.attendance_marked and self.is_enrolled(student_id):
+                            if self.mark_attendance(student_id, track.similarity):
+                                print(f"✓ SUCCESS: Attendance marked for Student {student_id} (confidence: {track.similarity:.2f})")
                                 self.attendance_marked.add(student_id)
                             else:
                                 print(f"✗ ERROR: Failed to mark attendance for Student {student_id}")
-                    
-                    self.last_matches = matches
                 else:
-                    matches = self.last_matches
+                    tracks = self.tracker.follow(frame)
+                
+                results = [(track.box, track.name, track.student_id, track.similarity) for track in tracks]
+                self.draw_face_results(frame, results)
+                matches = [name for _, name, student_id, _ in results if name and student_id]
                 
                 # Display status
                 status_text = "MATCH FOUND!" if matches else "No match"
@@ -205,7 +214,8 @@ class AttendanceFaceRecognition(RobustFaceRecognition):
                     match_text = f"Matched: {', '.join([f'Student {sid}' for sid in self.attendance_marked if sid])}"
                     cv2.putText(frame, match_text, (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
                 
-                # Display current camera info
+                # Display detection time and current camera info
+                cv2.putText(frame, self.timing_text(), (10, frame.shape[0] - 50), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
                 camera_id = self.available_cameras[self.current_camera_index] if self.available_cameras else "N/A"
                 camera_info = self.camera_names.get(camera_id, f"Camera {camera_id}")
                 cv2.putText(frame, camera_info, (10, frame.shape[0] - 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
@@ -223,8 +233,8 @@ class AttendanceFaceRecognition(RobustFaceRecognition):
                     matches, student_ids, confidences = self.check_face_match_with_attendance(frame)
                     if matches and student_ids:
                         for i, student_id in enumerate(student_ids):
-                            if student_id:
-                                if self.mark_attendance(student_id):
+                            if student_id and self.is_enrolled(student_id):
+                                if self.mark_attendance(student_id, confidences[i]):
                                     print(f"✓ SUCCESS: Attendance marked for Student {student_id} (confidence: {confidences[i]:.2f})")
                                     self.attendance_marked.add(student_id)
                                 else:
@@ -259,28 +269,449 @@ class AttendanceFaceRecognition(RobustFaceRecognition):
                 time.sleep(0.1)
         
         self.cleanup()
-
+    
+    def queue_attendance(self, student_id, confidence):
+        """Hand a newly recognized student to the batched attendance writer (once per run)"""
+        if not self.is_enrolled(student_id):
+            return
+        with self.attendance_lock:
+            if student_id in self.attendance_marked:
+                return
+            self.attendance_marked.add(student_id)
+        self.attendance_writer.submit(student_id, confidence)
+    
+    def on_attendance_written(self, events):
+        """AttendanceWriter callback for a successfully flushed batch"""
+        for event in events:
+            print(f"✓ SUCCESS: Attendance marked for Student {event.student_id} (confidence: {event.confidence or 0.0:.2f})")
+            if self.events:
+                self.events.emit('attendance_marked', student_id=event.student_id, confidence=event.confidence,
+                                 seen_at=event.seen_at.isoformat(timespec='seconds'))
+    
+    def on_attendance_failed(self, events):
+        """AttendanceWriter callback for events that could not be written"""
+        for event in events:
+            if self.events:
+                self.events.emit('attendance_failed', student_id=event.student_id,
+                                 reason='no_active_session' if event.unresolved else 'database_error')
+            if event.unresolved:
+                print(f"No active session found for Student {event.student_id}")
+                continue
+            print(f"✗ ERROR: Failed to mark attendance for Student {event.student_id}")
+            # Allow a retry on the next sighting
+            with self.attendance_lock:
+                self.attendance_marked.discard(event.student_id)
+    
+    def on_recognition_result(self, seq, results):
+        """RecognitionWorkers callback: keep the newest overlay and queue attendance"""
+        with self.results_lock:
+            # Workers can finish out of order; never replace a newer result with an older one
+            if seq > self.last_result_seq:
+                self.last_result_seq = seq
+                self.last_results = results
+        for _, _, student_id, similarity in results:
+            if student_id:
+                self.queue_attendance(student_id, similarity)
+    
+    def run_pipelined_attendance_mode(self, workers=2):
+        """Run attendance mode with capture, recognition and database writes on separate threads.
+        
+        A grabber thread keeps the freshest frame, a pool of recognition workers takes
+        frames from a drop-oldest queue (so recognition always works on recent frames
+        instead of every 5th one), and attendance is written by a background writer,
+        so the display never waits for detection or the database.
+        """
+        if not self.initialize():
+            print("Failed to initialize face recognition system")
+            return
+        
+        if not self.reference_faces:
+            print("No reference faces loaded. Please add photos to the uploads/profiles directory.")
+            return
+        
+        print(f"Loaded {len(self.reference_faces)} reference face(s)")
+        print(f"Available cameras: {self.available_cameras}")
+        print(f"\nStarting pipelined face recognition for attendance ({workers} recognition worker(s))...")
+        print("Controls:")
+        print("- 'q': quit")
+        print("- 's': capture and check for matches")
+        print("- 'c': switch to next camera")
+        print("- '0-9': switch to specific camera")
+        print("- 'r': refresh/rescan cameras")
+        print("- 'i': show camera info")
+        print("\nWhen MATCH FOUND appears, attendance will be automatically marked!")
+        
+        frame_queue = DropOldestQueue(maxsize=workers)
+        grabber = FrameGrabber(self.read_frame, frame_queue)
+        recognizers = RecognitionWorkers(frame_queue, self.recognize_faces, self.on_recognition_result, workers)
+        
+        self.attendance_writer.start()
+        recognizers.start()
+        grabber.start()
+        
+        last_seq = 0
+        display_fps = 0.0
+        window_start = time.time()
+        window_frames = 0
+        
+        try:
+            while self.running:
+                seq, frame = grabber.latest(last_seq)
+                if frame is not None and seq != last_seq:
+                    last_seq = seq
+                    frame = frame.copy()
+                    
+                    with self.results_lock:
+                        results = self.last_results
+                    self.draw_face_results(frame, results)
+                    matches = [r for r in results if r[1] and r[2]]
+                    
+                    # Display status
+                    status_text = "MATCH FOUND!" if matches else "No match"
+                    status_color = (0, 255, 0) if matches else (0, 0, 255)
+                    cv2.putText(frame, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, status_color, 2)
+                    
+                    if matches:
+                        with self.attendance_lock:
+                            marked = list(self.attendance_marked)
+                        match_text = f"Matched: {', '.join([f'Student {sid}' for sid in marked if sid])}"
+                        cv2.putText(frame, match_text, (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                    
+                    # Display pipeline and camera info
+                    stats_text = f"Display {display_fps:.0f} fps | Camera {grabber.fps:.0f} fps | Recognition {recognizers.latency_ms:.0f} ms ({self.timing_text()})"
+                    cv2.putText(frame, stats_text, (10, frame.shape[0] - 50), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                    camera_id = self.available_cameras[self.current_camera_index] if self.available_cameras else "N/A"
+                    camera_info = self.camera_names.get(camera_id, f"Camera {camera_id}")
+                    cv2.putText(frame, camera_info, (10, frame.shape[0] - 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                    cv2.putText(frame, f"Total cameras: {len(self.available_cameras)}", (10, frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                    
+                    cv2.imshow('Face Recognition Attendance - Press Q to quit', frame)
+                    
+                    window_frames += 1
+                    elapsed = time.time() - window_start
+                    if elapsed >= 1.0:
+                        display_fps = window_frames / elapsed
+                        window_start = time.time()
+                        window_frames = 0
+                
+                key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
+                    self.running = False
+                    break
+                elif key == ord('s'):
+                    # Manual capture and check on the freshest frame
+                    _, frame = grabber.latest()
+                    results = self.recognize_faces(frame) if frame is not None else []
+                    matched = [(sid, sim) for _, name, sid, sim in results if name and sid]
+                    if matched:
+                        for student_id, similarity in matched:
+                            self.queue_attendance(student_id, similarity)
+                    else:
+                        print("✗ NO MATCH: Face not recognized")
+                elif key == ord('c'):
+                    print("Switching camera...")
+                    self.switch_camera()
+                elif key >= ord('0') and key <= ord('9'):
+                    requested_camera = int(chr(key))
+                    print(f"Switching to camera {requested_camera}...")
+                    self.switch_camera(requested_camera)
+                elif key == ord('r'):
+                    print("Rescanning for cameras...")
+                    with self.camera_lock:
+                        self.find_available_cameras()
+                        if self.available_cameras:
+                            self.current_camera_index = 0
+                            self.initialize_camera()
+                elif key == ord('i'):
+                    print("\n=== Camera Information ===")
+                    for i, cam_id in enumerate(self.available_cameras):
+                        current_marker = " <- CURRENT" if i == self.current_camera_index else ""
+                        print(f"  [{i}] {self.camera_names.get(cam_id, f'Camera {cam_id}')}{current_marker}")
+                    print(f"  Dropped frames: {frame_queue.dropped}")
+                    print(f"  {self.timing_text()}")
+                    print("==========================")
+        except KeyboardInterrupt:
+            print("\nReceived keyboard interrupt")
+        finally:
+            grabber.stop()
+            recognizers.stop()
+            grabber.join(timeout=2.0)
+            # Flush queued attendance before exiting
+            self.attendance_writer.stop()
+            self.cleanup()
+    
+    def headless_status(self):
+        """Snapshot for the control socket's status command"""
+        with self.attendance_lock:
+            marked = sorted(self.attendance_marked)
+        camera_id = self.available_cameras[self.current_camera_index] if self.available_cameras else None
+        return {
+            'session_instance_id': self.session_instance_id,
+            'camera': camera_id,
+            'cameras': list(self.available_cameras),
+            'frames_processed': self.frames_processed,
+            'detection_ms': round(self.detector.detection_ms, 1),
+            'tracked_faces': len(self.tracker.visible()),
+            'attendance_marked': marked,
+        }
+    
+    def handle_control_command(self, command, argument):
+        """Execute a queued signal/socket command on the capture thread"""
+        if command == 'stop':
+            self.running = False
+        elif command == 'switch':
+            if self.available_cameras and self.switch_camera(argument):
+                self.events.emit('camera_switched', camera=self.available_cameras[self.current_camera_index])
+        elif command == 'rescan':
+            with self.camera_lock:
+                self.find_available_cameras()
+                if self.available_cameras:
+                    self.current_camera_index = 0
+                    self.initialize_camera()
+            self.tracker.reset()
+            self.events.emit('cameras_rescanned', cameras=list(self.available_cameras))
+    
+    def run_headless_mode(self, control_port=None, detect_every=5):
+        """Run attendance without any window, overlay drawing or keyboard handling.
+        
+        Structured events (one JSON object per line) go to stdout and to control-socket
+        subscribers; human-readable log messages go to stderr. Control commands come
+        from signals or the optional localhost control socket (see headless_control).
+        """
+        self.headless = True
+        self.events = EventEmitter(sys.stdout)
+        commands = queue.Queue()
+        server = None
+        
+        with contextlib.redirect_stdout(sys.stderr):
+            if not self.initialize():
+                self.events.emit('error', message='Failed to initialize face recognition system')
+                return
+            if not self.reference_faces:
+                self.events.emit('error', message='No reference faces loaded')
+                return
+            
+            install_signal_handlers(commands)
+            if control_port:
+                server = ControlServer(control_port, commands, self.events, self.headless_status)
+                server.start()
+            self.attendance_writer.start()
+            self.events.emit('started', session_instance_id=self.session_instance_id,
+                             cameras=list(self.available_cameras), reference_faces=len(self.reference_faces),
+                             control_port=control_port)
+            
+            reported = {}
+            frame_count = 0
+            try:
+                while self.running:
+                    while not commands.empty():
+                        self.handle_control_command(*commands.get_nowait())
+                    if not self.running:
+                        break
+                    
+                    ret, frame = self.read_frame()
+                    if not ret or frame is None:
+                        time.sleep(0.1)
+                        continue
+                    frame_count += 1
+                    if frame_count % detect_every:
+                        continue
+                    
+                    tracks = self.track_faces(frame)
+                    self.frames_processed += 1
+                    for track in tracks:
+                        # One event per new track and per change of identity
+                        if reported.get(track.track_id, 'new') == track.student_id:
+                            continue
+                        reported[track.track_id] = track.student_id
+                        self.events.emit('face', track_id=track.track_id, student_id=track.student_id,
+                                         confidence=round(track.similarity, 4), box=list(track.box),
+                                         detection_ms=round(self.detector.detection_ms, 1))
+                        if track.student_id:
+                            self.queue_attendance(track.student_id, track.similarity)
+                    visible = {track.track_id for track in tracks}
+                    reported = {tid: sid for tid, sid in reported.items() if tid in visible}
+            except Exception as e:
+                self.events.emit('error', message=str(e))
+            finally:
+                if server is not None:
+                    server.stop()
+                # Flush queued attendance before exiting
+                self.attendance_writer.stop()
+                self.cleanup()
+                self.events.emit('stopped', frames_processed=self.frames_processed)
+    
+    def on_camera_result(self, stream, seq, results):
+        """CameraStream callback: keep the camera's newest overlay and queue attendance"""
+        stream.set_results(seq, results)
+        for _, _, student_id, similarity in results:
+            if student_id:
+                self.queue_attendance(student_id, similarity)
+    
+    def run_multi_camera_mode(self, camera_ids=None, workers_per_camera=1, headless=False, stats_every=10.0):
+        """Run attendance on several cameras at once, sharing one gallery, matcher and writer.
+        
+        Every camera gets its own grabber thread and recognition workers (see
+        multi_camera.CameraStream). With headless=True no windows are opened and
+        per-camera stats are emitted as JSON events like in run_headless_mode();
+        only the stop signals are acted on (there is no control socket).
+        """
+        self.headless = headless
+        if headless:
+            self.events = EventEmitter(sys.stdout)
+        
+        with contextlib.redirect_stdout(sys.stderr) if headless else contextlib.nullcontext():
+            self.load_reference_faces()
+            if not self.reference_faces:
+                print("No reference faces loaded. Please add photos to the uploads/profiles directory.")
+                return
+            
+            cached = load_camera_cache()
+            if cached:
+                self.set_cameras(cached)
+            if not camera_ids and not self.available_cameras:
+                self.find_available_cameras()
+            camera_ids = camera_ids or list(self.available_cameras)
+            
+            streams = []
+            for camera_id in camera_ids:
+                stream = CameraStream(camera_id, self.open_camera, self.recognize_faces, self.on_camera_result,
+                                      workers_per_camera, self.camera_names.get(camera_id))
+                if stream.open():
+                    streams.append(stream)
+            if not streams:
+                print("Failed to open any camera")
+                return
+            
+            print(f"Loaded {len(self.reference_faces)} reference face(s)")
+            print(f"\nStarting multi-camera attendance on {len(streams)} camera(s): {[s.camera_id for s in streams]}")
+            if not headless:
+                print("Controls:")
+                print("- 'q': quit")
+                print("- 'i': show per-camera stats")
+            commands = queue.Queue()
+            if headless:
+                install_signal_handlers(commands)
+                self.events.emit('started', session_instance_id=self.session_instance_id,
+                                 cameras=[s.camera_id for s in streams], reference_faces=len(self.reference_faces))
+            
+            self.attendance_writer.start()
+            for stream in streams:
+                stream.start()
+            
+            last_seq = {stream.camera_id: 0 for stream in streams}
+            last_stats = time.time()
+            try:
+                while self.running:
+                    if headless:
+                        while not commands.empty():
+                            command = commands.get_nowait()[0]
+                            if command == 'stop':
+                                self.running = False
+                            else:
+                                # Every camera is already running; there is nothing to switch or rescan
+                                self.events.emit('error', message=f"'{command}' is not supported with several cameras")
+                        time.sleep(0.1)
+                    else:
+                        for stream in streams:
+                            seq, frame = stream.grabber.latest(last_seq[stream.camera_id], timeout=0.01)
+                            if frame is None or seq == last_seq[stream.camera_id]:
+                                continue
+                            last_seq[stream.camera_id] = seq
+                            frame = frame.copy()
+                            self.draw_face_results(frame, stream.latest_results())
+                            stats = stream.stats()
+                            stats_text = (f"{stream.name} | Camera {stats['fps']:.0f} fps | "
+                                          f"Recognition {stats['latency_ms']:.0f} ms")
+                            cv2.putText(frame, stats_text, (10, frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                            cv2.imshow(f"Attendance - {stream.name} - Press Q to quit", frame)
+                        
+                        key = cv2.waitKey(1) & 0xFF
+                        if key == ord('q'):
+                            self.running = False
+                            break
+                        elif key == ord('i'):
+                            print("\n=== Camera Stats ===")
+                            for stream in streams:
+                                stats = stream.stats()
+                                print(f"  {stream.name}: {stats['fps']:.1f} fps, recognition {stats['latency_ms']:.0f} ms, "
+                                      f"{stats['recognitions']} frame(s) recognized, {stats['dropped']} dropped")
+                            print("====================")
+                    
+                    if self.events and time.time() - last_stats >= stats_every:
+                        last_stats = time.time()
+                        self.events.emit('camera_stats', cameras=[stream.stats() for stream in streams])
+            except KeyboardInterrupt:
+                print("\nReceived keyboard interrupt")
+            finally:
+                for stream in streams:
+                    stream.stop()
+                # Flush queued attendance before exiting
+                self.attendance_writer.stop()
+                self.cleanup()
+                if self.events:
+                    self.events.emit('stopped', cameras=[stream.stats() for stream in streams])
 
 # Legacy functions removed - now using AttendanceFaceRecognition class
 
 
 def main():
-    # Get session instance ID from command line if provided
-    session_instance_id = None
-    if len(sys.argv) > 1:
-        try:
-            session_instance_id = int(sys.argv[1])
-        except ValueError:
-            pass
+    parser = argparse.ArgumentParser()
+    # Session instance ID is optional and positional for compatibility with start_face_recognition.php
+    parser.add_argument('session_instance_id', nargs='?', type=int, default=None)
+    parser.add_argument('--sequential', action='store_true',
+                        help='Use the single-threaded loop that recognizes every 5th frame')
+    parser.add_argument('--workers', type=int, default=2, help='Recognition worker threads (pipelined mode)')
+    add_detection_arguments(parser)
+    parser.add_argument('--video', default=None,
+                        help='Process a recorded lecture video instead of a live camera (see video_attendance.py)')
+    parser.add_argument('--cameras', type=int, nargs='+', default=None,
+                        help='Run on several cameras at once, e.g. --cameras 0 2 (one gallery and writer for all)')
+    parser.add_argument('--all_cameras', action='store_true', help='Run on every discovered camera at once')
+    parser.add_argument('--backend', choices=RECOGNITION_BACKENDS, default='template',
+                        help='template: correlation against the photo gallery; cascade: the same, ranked at 16x16 first; '
+                             'lbph: lbph_model.yml from train_lbph.py')
+    add_cascade_arguments(parser)
+    parser.add_argument('--campus_fallback', action='store_true',
+                        help='With a session, also match campus-wide when no confident in-class match exists')
+    parser.add_argument('--headless', action='store_true',
+                        help='No window: JSON events on stdout, control via signals or --control_port')
+    parser.add_argument('--control_port', type=int, default=None,
+                        help='Headless mode: localhost TCP port for stop/switch/rescan/status/subscribe commands '
+                             '(single camera only)')
+    parser.add_argument('--follow_faces', action='store_true',
+                        help='Move face boxes between detections with an OpenCV MOSSE/KCF tracker (sequential mode)')
+    args = parser.parse_args()
+    if args.control_port and (args.cameras or args.all_cameras):
+        parser.error('--control_port works with a single camera only; stop a multi-camera run with SIGTERM')
+
+    if args.video:
+        if args.session_instance_id is None:
+            print("A session_instance_id is required for recorded video")
+            return
+        run_video_attendance(args.video, args.session_instance_id, detector_from_args(args),
+                             campus_fallback=args.campus_fallback)
+        return
 
     # Create and run the attendance face recognition system
     try:
-        attendance_system = AttendanceFaceRecognition(session_instance_id)
-        attendance_system.run_attendance_mode()
+        attendance_system = AttendanceFaceRecognition(args.session_instance_id, detector_from_args(args),
+                                                      FaceTracker(use_opencv=args.follow_faces), args.campus_fallback,
+                                                      args.backend, cascade_options_from_args(args))
+        if args.cameras or args.all_cameras:
+            attendance_system.run_multi_camera_mode(args.cameras, headless=args.headless)
+        elif args.headless:
+            attendance_system.run_headless_mode(args.control_port)
+        elif args.sequential:
+            attendance_system.run_attendance_mode()
+        else:
+            attendance_system.run_pipelined_attendance_mode(workers=args.workers)
     except Exception as e:
-        print(f"Application error: {e}")
+        # In headless mode stdout carries only JSON events
+        print(f"Application error: {e}", file=sys.stderr if args.headless else sys.stdout)
     finally:
-        cv2.destroyAllWindows()
+        if not args.headless:
+            cv2.destroyAllWindows()
 
 
 if __name__ == '__main__':
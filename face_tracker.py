@@ -0,0 +1,144 @@
+"""
+Face tracking between detections for the live recognition loops.
+
+Detections are associated with existing tracks by box overlap (IoU, greedy
+best-first), so a face that stays in view keeps its track ID and identity.
+Only tracks that are new or whose identification was not confident are sent
+to the matcher, which makes recognition cost follow new arrivals instead of
+frames x faces. Tracks that go unmatched for max_missed detections are
+dropped; a face reappearing after that starts a new track and is identified
+again.
+
+Between detections, track boxes are carried forward unchanged or, with
+use_opencv=True and opencv-contrib installed, moved by a MOSSE (or KCF)
+correlation tracker per face, so the overlay follows moving faces.
+"""
+import itertools
+import cv2
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+def create_opencv_tracker():
+    """A MOSSE or KCF tracker if this OpenCV build has one, else None"""
+    legacy = getattr(cv2, 'legacy', None)
+    for factory in (getattr(legacy, 'TrackerMOSSE_create', None), getattr(cv2, 'TrackerKCF_create', None)):
+        if factory is not None:
+            try:
+                return factory()
+            except cv2.error:
+                continue
+    return None
+
+
+class FaceTrack:
+    """One face followed across frames, with the best identity found for it so far"""
+
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        self.name = None
+        self.student_id = None
+        self.similarity = 0.0
+        self.attempts = 0
+        self.missed = 0
+        self.follower = None
+
+    @property
+    def identified(self):
+        return self.name is not None
+
+
+class FaceTracker:
+    """Assigns track IDs to detected faces and decides which ones need (re-)identification"""
+
+    def __init__(self, iou_threshold=0.3, max_missed=2, confident_similarity=0.55, use_opencv=False):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.confident_similarity = confident_similarity
+        self.use_opencv = use_opencv
+        self.tracks = []
+        self.ids = itertools.count(1)
+
+    def update(self, boxes, frame=None):
+        """Associate this frame's detections with the tracks; returns the current tracks"""
+        boxes = [tuple(int(v) for v in box) for box in boxes]
+        pairs = sorted(
+            ((box_iou(track.box, box), t, b) for t, track in enumerate(self.tracks) for b, box in enumerate(boxes)),
+            reverse=True,
+        )
+        matched_tracks = set()
+        matched_boxes = set()
+        for iou, t, b in pairs:
+            if iou < self.iou_threshold:
+                break
+            if t in matched_tracks or b in matched_boxes:
+                continue
+            matched_tracks.add(t)
+            matched_boxes.add(b)
+            self.tracks[t].box = boxes[b]
+            self.tracks[t].missed = 0
+
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.missed += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+
+        for b, box in enumerate(boxes):
+            if b not in matched_boxes:
+                self.tracks.append(FaceTrack(next(self.ids), box))
+
+        if self.use_opencv and frame is not None:
+            for track in self.tracks:
+                if track.missed == 0:
+                    track.follower = create_opencv_tracker()
+                    if track.follower is not None:
+                        track.follower.init(frame, track.box)
+        return self.visible()
+
+    def follow(self, frame):
+        """Move track boxes along with the faces on frames without detection"""
+        if not self.use_opencv:
+            return self.visible()
+        for track in self.visible():
+            if track.follower is None:
+                continue
+            ok, box = track.follower.update(frame)
+            if ok:
+                track.box = tuple(int(v) for v in box)
+            else:
+                track.follower = None
+        return self.visible()
+
+    def visible(self):
+        """Tracks matched by the latest detection"""
+        return [track for track in self.tracks if track.missed == 0]
+
+    def needs_identification(self):
+        """Visible tracks that are new or not confidently identified yet"""
+        return [track for track in self.visible()
+                if not track.identified or track.similarity < self.confident_similarity]
+
+    def set_identity(self, track, name, student_id, similarity):
+        """Record a matcher result, keeping the most confident identity seen for the track"""
+        track.attempts += 1
+        if name is not None and (not track.identified or similarity >= track.similarity):
+            track.name = name
+            track.student_id = student_id
+            track.similarity = float(similarity)
+        elif not track.identified:
+            track.similarity = max(track.similarity, float(similarity))
+
+    def reset(self):
+        """Forget all tracks, e.g. after switching cameras"""
+        self.tracks = []
@@ -116,7 +116,7 @@ $stmt = $conn->query("
         u.user_id,
         u.first_name,
         u.last_name,
-        sfe.face_encoding,
+        sfe.id IS NOT NULL AS face_registered_flag,
         sfe.image_path,
         sfe.created_at as face_registered
     FROM users u
@@ -340,7 +340,7 @@ $recent_attendance = $stmt->fetchAll();
             <h2>Face Registration Status</h2>
             <div class="face-registration">
                 <?php foreach ($students as $student): ?>
-                    <div class="student-face-card <?php echo $student['face_encoding'] ? 'face-registered' : 'face-not-registered'; ?>">
+                    <div class="student-face-card <?php echo $student['face_registered_flag'] ? 'face-registered' : 'face-not-registered'; ?>">
                         <?php if ($student['image_path']): ?>
                             <img src="<?php echo htmlspecialchars($student['image_path']); ?>" alt="Student Photo">
                         <?php else: ?>
@@ -351,7 +351,7 @@ $recent_attendance = $stmt->fetchAll();
                         <h4><?php echo htmlspecialchars($student['first_name'] . ' ' . $student['last_name']); ?></h4>
                         <p><?php echo htmlspecialchars($student['user_id']); ?></p>
                         <p>
-                            <?php if ($student['face_encoding']): ?>
+                            <?php if ($student['face_registered_flag']): ?>
                                 <span style="color: green;">✓ Face Registered</span><br>
                                 <small><?php echo date('M d, Y', strtotime($student['face_registered'])); ?></small>
                             <?php else: ?>
@@ -85,7 +85,8 @@ CREATE TABLE session_instances (
 CREATE TABLE student_face_encodings (
     id INT PRIMARY KEY AUTO_INCREMENT,
     student_id INT NOT NULL,
-    face_encoding TEXT NOT NULL, -- JSON encoded face features
+    face_encoding TEXT NULL, -- JSON encoded face features (legacy; converted to encoding_blob)
+    encoding_blob BLOB NULL, -- 128 packed little-endian float32 values
     image_path VARCHAR(255),
     confidence_threshold FLOAT DEFAULT 0.6,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
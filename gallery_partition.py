@@ -0,0 +1,95 @@
+"""
+Class-scoped gallery partition for session-bound recognition.
+
+When attendance runs for one session_instance_id, only students enrolled in
+that session's class can be marked, so faces are matched against their
+references only (tens of rows instead of the whole campus). The enrolled set
+is resolved once at start-up through session_instances -> timetable_sessions
+-> student_enrollments.
+
+With the optional campus-wide fallback, probes whose best in-class
+similarity stays below confident_similarity are scored against the full
+gallery as well, so a visitor who resembles an enrolled student is reported
+as who they are instead of as that student.
+"""
+import numpy as np
+from face_matcher import normalize_faces
+
+
+ENROLLED_STUDENTS_QUERY = """
+    SELECT se.student_id
+    FROM session_instances si
+    JOIN timetable_sessions ts ON ts.id = si.timetable_session_id
+    JOIN student_enrollments se ON se.class_id = ts.class_id
+    WHERE si.id = %s AND se.status = 'enrolled'
+"""
+
+
+def load_enrolled_student_ids(conn, session_instance_id):
+    """Set of student IDs enrolled in the class of a session instance"""
+    cur = conn.cursor()
+    cur.execute(ENROLLED_STUDENTS_QUERY, (int(session_instance_id),))
+    rows = cur.fetchall()
+    cur.close()
+    return {int(row[0]) for row in rows}
+
+
+class PartitionedMatcher:
+    """FaceMatcher-compatible view that scores the class partition first.
+
+    Indices returned by best_matches() refer to the full gallery, so callers
+    keep looking up names/student_ids as before.
+    """
+
+    def __init__(self, matcher, student_ids, fallback=False, confident_similarity=0.5):
+        self.matcher = matcher
+        self.student_ids = matcher.student_ids
+        self.names = matcher.names
+        self.rows_by_student = matcher.rows_by_student
+        self.enrolled = set(int(s) for s in student_ids)
+        self.rows = np.array([i for i, sid in enumerate(matcher.student_ids)
+                              if sid is not None and int(sid) in self.enrolled], dtype=np.int64)
+        self.class_gallery = np.ascontiguousarray(matcher.gallery[self.rows])
+        self.fallback = fallback
+        self.confident_similarity = confident_similarity
+        self.fallback_probes = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def face_rois(self, gray, boxes):
+        return self.matcher.face_rois(gray, boxes)
+
+    def best_matches(self, probes, threshold=0.4):
+        """Return (full-gallery index, similarity) per probe, (None, 0.0) below threshold"""
+        if len(probes) == 0:
+            return []
+        normalized = normalize_faces(probes)
+        results = [(None, 0.0)] * len(probes)
+        uncertain = list(range(len(probes)))
+
+        if len(self.rows):
+            uncertain = []
+            for i, row in enumerate(normalized @ self.class_gallery.T):
+                best = int(np.argmax(row))
+                similarity = float(row[best])
+                if similarity > threshold:
+                    results[i] = (int(self.rows[best]), similarity)
+                if similarity < self.confident_similarity:
+                    uncertain.append(i)
+
+        if self.fallback and uncertain and len(self.matcher.gallery):
+            # Campus-wide pass only for probes without a confident in-class match, through the
+            # wrapped matcher so a CascadeMatcher can rank the campus coarsely first
+            self.fallback_probes += len(uncertain)
+            campus = self.matcher.best_matches([probes[i] for i in uncertain], threshold)
+            for i, (idx, similarity) in zip(uncertain, campus):
+                if idx is not None and similarity > results[i][1]:
+                    results[i] = (idx, similarity)
+        return results
+
+    def best_match(self, probe, threshold=0.4):
+        return self.best_matches([probe], threshold)[0]
+
+    def verify(self, probe, student_id, threshold=0.4):
+        return self.matcher.verify(probe, student_id, threshold)
@@ -0,0 +1,115 @@
+"""
+Control and event channels for headless attendance runs.
+
+Events are JSON objects, one per line, written to stdout and to every
+control-socket client that sent "subscribe". Commands come from signals
+(SIGTERM/SIGINT stop, SIGUSR1 switches to the next camera, SIGHUP rescans)
+or from line commands on a localhost TCP control socket:
+
+    stop | switch [camera_index] | rescan | status | subscribe
+
+Commands are queued and executed by the capture loop, so camera handling
+stays on one thread.
+"""
+import json
+import signal
+import socketserver
+import threading
+from datetime import datetime
+
+
+COMMANDS = ('stop', 'switch', 'rescan', 'status', 'subscribe')
+
+
+class EventEmitter:
+    """Writes structured events as JSON lines to a stream and to subscribed sockets"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.subscribers = []
+        self.lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        record = {'event': event, 'time': datetime.now().isoformat(timespec='milliseconds')}
+        record.update(fields)
+        line = json.dumps(record) + '\n'
+        with self.lock:
+            self.stream.write(line)
+            self.stream.flush()
+            for subscriber in list(self.subscribers):
+                try:
+                    subscriber.sendall(line.encode('utf-8'))
+                except OSError:
+                    self.subscribers.remove(subscriber)
+
+    def subscribe(self, sock):
+        with self.lock:
+            self.subscribers.append(sock)
+
+
+def parse_command(line):
+    """Return (command, argument or None) for a control line, or None if it is not a command"""
+    parts = line.strip().split()
+    if not parts or parts[0].lower() not in COMMANDS:
+        return None
+    command = parts[0].lower()
+    argument = None
+    if command == 'switch' and len(parts) > 1:
+        try:
+            argument = int(parts[1])
+        except ValueError:
+            return None
+    return command, argument
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        for raw in self.rfile:
+            parsed = parse_command(raw.decode('utf-8', 'replace'))
+            if parsed is None:
+                self.reply({'ok': False, 'message': f"Unknown command; expected one of {', '.join(COMMANDS)}"})
+                continue
+            command, argument = parsed
+            if command == 'status':
+                self.reply({'ok': True, 'status': server.status_provider()})
+            elif command == 'subscribe':
+                self.reply({'ok': True})
+                server.events.subscribe(self.connection)
+            else:
+                server.commands.put((command, argument))
+                self.reply({'ok': True})
+
+    def reply(self, payload):
+        self.wfile.write((json.dumps(payload) + '\n').encode('utf-8'))
+        self.wfile.flush()
+
+
+class ControlServer(socketserver.ThreadingTCPServer):
+    """Localhost TCP control socket feeding a command queue"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, port, commands, events, status_provider, host='127.0.0.1'):
+        super().__init__((host, port), ControlHandler)
+        self.commands = commands
+        self.events = events
+        self.status_provider = status_provider
+        self.thread = threading.Thread(target=self.serve_forever, name='control-socket', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def install_signal_handlers(commands):
+    """Map process signals to queued commands (SIGUSR1/SIGHUP only where the platform has them)"""
+    mapping = {'SIGTERM': 'stop', 'SIGINT': 'stop', 'SIGUSR1': 'switch', 'SIGHUP': 'rescan'}
+    for name, command in mapping.items():
+        signum = getattr(signal, name, None)
+        if signum is not None:
+            signal.signal(signum, lambda _signum, _frame, command=command: commands.put((command, None)))
@@ -0,0 +1,104 @@
+"""
+In-memory decoding of probe images.
+
+Probes arrive as a file path, a base64 string / data URL, or raw encoded bytes
+(on stdin or in an HTTP body). Bytes are decoded straight from memory with
+cv2.imdecode, so nothing is written to a temp file. Large uploads can be
+decoded at reduced resolution (IMREAD_REDUCED_COLOR_*): libjpeg then skips
+most of the IDCT work instead of decoding full size and downscaling.
+"""
+import base64
+import binascii
+import struct
+import cv2
+import numpy as np
+
+
+# (factor, flag) from the most to the least reduction
+REDUCED_DECODE_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+# JPEG start-of-frame markers carry the image size (C4, C8 and CC are not SOF)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def decode_base64(data):
+    """Decode a base64 string or data URL into raw image bytes"""
+    if data.startswith('data:') and 'base64,' in data:
+        data = data.split('base64,', 1)[1]
+    return base64.b64decode(data)
+
+
+def image_size(raw):
+    """Read (width, height) from a PNG or JPEG header without decoding, or None"""
+    if raw[:8] == b'\x89PNG\r\n\x1a\n' and len(raw) >= 24:
+        return struct.unpack('>II', raw[16:24])
+    if raw[:2] != b'\xff\xd8':
+        return None
+    i = 2
+    while i + 9 < len(raw):
+        if raw[i] != 0xFF:
+            return None
+        marker = raw[i + 1]
+        if marker == 0xFF:
+            # Fill byte
+            i += 1
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', raw[i + 5:i + 9])
+            return width, height
+        i += 2 + struct.unpack('>H', raw[i + 2:i + 4])[0]
+    return None
+
+
+def reduced_decode_flag(raw, max_side):
+    """Pick the strongest IMREAD_REDUCED_COLOR_* that keeps the longer side >= max_side"""
+    if not max_side:
+        return cv2.IMREAD_COLOR
+    size = image_size(raw)
+    if size is None:
+        return cv2.IMREAD_COLOR
+    longer = max(size)
+    for factor, flag in REDUCED_DECODE_FLAGS:
+        if longer // factor >= max_side:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def decode_image(raw, max_side=None):
+    """Decode encoded image bytes into a BGR array, or None if they are not an image"""
+    if not raw:
+        return None
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    return cv2.imdecode(buf, reduced_decode_flag(raw, max_side))
+
+
+def decode_probe_bytes(raw, max_side=None):
+    """Decode bytes that are either an encoded image or its base64 / data URL text"""
+    bgr = decode_image(raw, max_side)
+    if bgr is not None:
+        return bgr
+    try:
+        return decode_image(decode_base64(raw.decode('ascii').strip()), max_side)
+    except (UnicodeDecodeError, binascii.Error, ValueError):
+        return None
+
+
+def read_probe(image_path=None, image_base64=None, image_bytes=None, max_side=None):
+    """Load a probe image from whichever input was given; returns BGR or None"""
+    if image_bytes is not None:
+        return decode_probe_bytes(image_bytes, max_side)
+    if image_base64:
+        try:
+            return decode_image(decode_base64(image_base64), max_side)
+        except (binascii.Error, ValueError):
+            return None
+    if image_path:
+        try:
+            with open(image_path, 'rb') as f:
+                return decode_image(f.read(), max_side)
+        except OSError:
+            return None
+    return None
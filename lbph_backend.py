@@ -0,0 +1,176 @@
+"""
+LBPH recognition backend.
+
+Loads lbph_model.yml and lbph_labels.json written by train_lbph.py once and
+identifies faces with the training preprocessing: the whole grayscale image is
+equalized, then each face is cropped at full resolution and resized to 200x200.
+When the model is missing or unreadable, the per-student centroids from
+centroid_store are used instead. LBPHMatcher has the FaceMatcher interface
+(face_rois, best_matches, best_match, verify, student_ids, names), so the live
+loops, the recognition server and recognize_bgr can use either backend.
+
+The LBPH model accepts a face when its chi-square distance is at most
+max_distance, whatever correlation threshold the caller passes; that threshold
+only applies to the centroid fallback, whose scores are correlations like the
+template matcher's.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from centroid_store import CentroidMatcher, load_centroids, prepare_probe
+from train_lbph import LABELS_PATH, MODEL_PATH
+
+
+RECOGNITION_BACKENDS = ('template', 'cascade', 'lbph')
+LBPH_FACE_SIZE = (200, 200)
+# Chi-square histogram distance accepted as a match. With train_lbph's radius=2,
+# neighbors=16 model, same-person probes of the profile photos score ~55-70 and
+# other people ~95 and up.
+LBPH_MAX_DISTANCE = 80.0
+
+
+def prepare_faces(gray, boxes):
+    """Equalize the whole image, then crop and resize each face, in train_lbph.face_samples order"""
+    if len(boxes) == 0:
+        return []
+    equalized = cv2.equalizeHist(gray)
+    return [cv2.resize(equalized[y:y+h, x:x+w], LBPH_FACE_SIZE) for (x, y, w, h) in boxes]
+
+
+class LBPHMatcher:
+    """Identifies face ROIs with the trained LBPH model, or with the centroid store as a fallback.
+
+    Indices returned by best_matches() point into student_ids/names, one entry
+    per trained student; names_by_student ({student_id: display name}, e.g. from
+    the gallery) labels them, else the ID is shown. Probes come from face_rois(). Confidence for
+    LBPH is 1 - distance / (2 * max_distance), i.e. 0.5 at the acceptance cut-off.
+    close() (or leaving a with block) shuts the prediction thread pool down.
+    """
+
+    def __init__(self, recognizer=None, label_to_student=None, centroids=None,
+                 names_by_student=None, max_distance=LBPH_MAX_DISTANCE, workers=None):
+        self.recognizer = recognizer
+        self.label_to_student = {int(label): int(sid) for label, sid in (label_to_student or {}).items()}
+        self.centroids = centroids
+        self.backend = 'lbph' if recognizer is not None else 'centroid'
+        self.max_distance = max_distance
+        self.workers = workers or os.cpu_count() or 1
+        # predict() releases the GIL; a frame's faces are spread over these threads
+        self.pool_lock = threading.Lock()
+        self.pool = None
+        if recognizer is not None and self.workers > 1:
+            self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix='lbph')
+
+        trained = self.label_to_student.values() if recognizer is not None else centroids.store.student_ids
+        self.student_ids = sorted(set(int(sid) for sid in trained))
+        names_by_student = names_by_student or {}
+        self.names = [names_by_student.get(sid, str(sid)) for sid in self.student_ids]
+        self.row_of_student = {sid: i for i, sid in enumerate(self.student_ids)}
+
+        # Per-prediction latency, moving average and count
+        self.latency_ms = 0.0
+        self.predictions = 0
+
+    def __len__(self):
+        return len(self.row_of_student)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Shut the thread pool down; later predictions run on the calling thread"""
+        with self.pool_lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def face_rois(self, gray, boxes):
+        """Probes for best_matches() from a full-resolution grayscale image and face boxes"""
+        return prepare_faces(gray, boxes)
+
+    def predict(self, faces):
+        """Return (student_id or None, confidence) per face from face_rois()"""
+        if len(faces) == 0:
+            return []
+        start = time.perf_counter()
+        prepared = [face if face.shape[:2] == LBPH_FACE_SIZE[::-1] else cv2.resize(face, LBPH_FACE_SIZE)
+                    for face in faces]
+        results = []
+        if self.recognizer is not None:
+            futures = None
+            if len(prepared) > 1:
+                # Submitting under the lock keeps close() from shutting the pool down in between
+                with self.pool_lock:
+                    if self.pool is not None:
+                        futures = [self.pool.submit(self.recognizer.predict, face) for face in prepared]
+            if futures is not None:
+                raw = [future.result() for future in futures]
+            else:
+                raw = [self.recognizer.predict(face) for face in prepared]
+            for label, distance in raw:
+                student_id = self.label_to_student.get(int(label))
+                confidence = max(0.0, 1.0 - distance / (2.0 * self.max_distance))
+                results.append((student_id if distance <= self.max_distance else None, confidence))
+        else:
+            for matches in self.centroids.nearest([prepare_probe(face) for face in prepared]):
+                results.append(matches[0] if matches else (None, 0.0))
+
+        elapsed_ms = (time.perf_counter() - start) * 1000.0 / len(prepared)
+        self.latency_ms = elapsed_ms if not self.predictions else 0.9 * self.latency_ms + 0.1 * elapsed_ms
+        self.predictions += len(prepared)
+        return results
+
+    def best_matches(self, probes, threshold=0.4):
+        """Return (index, confidence) of the predicted student per probe, (None, 0.0) otherwise.
+
+        threshold applies to the centroid fallback only; the LBPH model's cut-off is max_distance.
+        """
+        results = []
+        for student_id, confidence in self.predict(probes):
+            row = self.row_of_student.get(int(student_id)) if student_id is not None else None
+            accepted = self.recognizer is not None or confidence > threshold
+            results.append((row, confidence) if row is not None and accepted else (None, 0.0))
+        return results
+
+    def best_match(self, probe, threshold=0.4):
+        return self.best_matches([probe], threshold)[0]
+
+    def verify(self, probe, student_id, threshold=0.4):
+        """Match only if the model predicts the expected student"""
+        idx, confidence = self.best_match(probe, threshold)
+        if idx is not None and self.student_ids[idx] == int(student_id):
+            return idx, confidence
+        return None, 0.0
+
+
+def load_lbph_matcher(names_by_student=None, model_path=MODEL_PATH,
+                      labels_path=LABELS_PATH, max_distance=LBPH_MAX_DISTANCE):
+    """Load the trained LBPH model, else the centroid store; None if neither exists or loads"""
+    if os.path.exists(model_path) and os.path.exists(labels_path):
+        try:
+            start = time.time()
+            recognizer = cv2.face.LBPHFaceRecognizer_create()
+            recognizer.read(model_path)
+            with open(labels_path, 'r', encoding='utf-8') as f:
+                label_to_student = json.load(f)
+            print(f"Loaded LBPH model with {len(label_to_student)} student(s) in {time.time() - start:.1f}s")
+            return LBPHMatcher(recognizer, label_to_student, None, names_by_student, max_distance)
+        except (cv2.error, OSError, ValueError) as e:
+            print(f"Could not load LBPH model {model_path}: {e}")
+
+    try:
+        store = load_centroids()
+    except (OSError, ValueError) as e:
+        print(f"Could not load LBPH centroids: {e}")
+        return None
+    if store is None or len(store) == 0:
+        print("No LBPH model or centroids found; run train_lbph.py first")
+        return None
+    print(f"Using nearest-centroid fallback with {len(store)} student(s)")
+    return LBPHMatcher(None, None, CentroidMatcher(store), names_by_student, max_distance)
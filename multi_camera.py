@@ -0,0 +1,85 @@
+"""
+Several cameras in one recognition process.
+
+Each CameraStream owns its VideoCapture, a FrameGrabber thread and a small
+pool of recognition workers fed through its own drop-oldest queue. All
+streams call the same recognize function, so they share one in-memory
+gallery, matcher and detector, and their results go to one attendance
+writer; an extra camera costs capture bandwidth and worker threads, not
+another copy of the gallery.
+"""
+import threading
+import time
+from capture_pipeline import DropOldestQueue, FrameGrabber, RecognitionWorkers
+
+
+class CameraStream:
+    """Capture, grabbing and recognition for one camera of a multi-camera run"""
+
+    def __init__(self, camera_id, open_camera, recognize, on_result, workers=1, name=None):
+        self.camera_id = camera_id
+        self.name = name or f"Camera {camera_id}"
+        self.open_camera = open_camera
+        self.cap = None
+        self.cap_lock = threading.Lock()
+        self.last_reopen = 0.0
+        self.queue = DropOldestQueue(maxsize=workers)
+        self.grabber = FrameGrabber(self.read_frame, self.queue, name=f'FrameGrabber-{camera_id}')
+        self.recognizers = RecognitionWorkers(
+            self.queue, recognize, lambda seq, results: on_result(self, seq, results), workers)
+        self.results_lock = threading.Lock()
+        self.results = []
+        self.result_seq = 0
+        self.recognitions = 0
+
+    def open(self):
+        self.cap = self.open_camera(self.camera_id)
+        return self.cap is not None
+
+    def read_frame(self):
+        """Read from this camera, reopening it at most every 2 seconds after a failure"""
+        with self.cap_lock:
+            if self.cap is None or not self.cap.isOpened():
+                if time.time() - self.last_reopen < 2:
+                    return False, None
+                self.last_reopen = time.time()
+                print(f"{self.name} not available, trying to reopen...")
+                if not self.open():
+                    return False, None
+            ret, frame = self.cap.read()
+            if not ret and time.time() - self.last_reopen > 2:
+                self.cap.release()
+            return ret, frame
+
+    def set_results(self, seq, results):
+        """Keep the newest recognition result (workers can finish out of order)"""
+        with self.results_lock:
+            self.recognitions += 1
+            if seq > self.result_seq:
+                self.result_seq = seq
+                self.results = results
+
+    def latest_results(self):
+        with self.results_lock:
+            return self.results
+
+    def start(self):
+        self.recognizers.start()
+        self.grabber.start()
+
+    def stop(self):
+        self.grabber.stop()
+        self.recognizers.stop()
+        self.grabber.join(timeout=2.0)
+        with self.cap_lock:
+            if self.cap is not None:
+                self.cap.release()
+
+    def stats(self):
+        return {
+            'camera': self.camera_id,
+            'fps': round(self.grabber.fps, 1),
+            'latency_ms': round(self.recognizers.latency_ms, 1),
+            'recognitions': self.recognitions,
+            'dropped': self.queue.dropped,
+        }
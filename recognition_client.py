@@ -0,0 +1,88 @@
+"""
+Thin client for recognition_server.py.
+
+Accepts the same arguments as recognize_face.py and prints the same JSON, so
+PHP callers can switch to it without changes. Only the standard library is
+imported on the fast path; if the server is not running the request falls back
+to recognize_face.main() in-process.
+"""
+import argparse
+import json
+import os
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+SERVER_HOST = os.environ.get('FACE_SERVER_HOST', '127.0.0.1')
+SERVER_PORT = int(os.environ.get('FACE_SERVER_PORT', '8765'))
+REQUEST_TIMEOUT = 30
+
+
+def send_request(payload, host=SERVER_HOST, port=SERVER_PORT, timeout=REQUEST_TIMEOUT):
+    """POST a recognition request to the resident server and return the decoded JSON"""
+    req = urllib.request.Request(
+        f'http://{host}:{port}/recognize',
+        data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read().decode('utf-8'))
+
+
+def send_image_bytes(image_bytes, options, host=SERVER_HOST, port=SERVER_PORT, timeout=REQUEST_TIMEOUT):
+    """POST raw image bytes (no base64 inflation) with options in the query string"""
+    query = urllib.parse.urlencode({k: v for k, v in options.items() if v is not None})
+    req = urllib.request.Request(
+        f'http://{host}:{port}/recognize?{query}',
+        data=image_bytes,
+        headers={'Content-Type': 'application/octet-stream'},
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read().decode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--image_path', help='Path to image file', default=None)
+    parser.add_argument('--image_base64', help='Data URL or base64 image string', default=None)
+    parser.add_argument('--image_stdin', action='store_true', help='Read the image bytes (or base64) from stdin')
+    parser.add_argument('--max_side', type=int, default=0, help='Decode large images at reduced resolution, keeping at least this many pixels on the longer side')
+    parser.add_argument('--threshold', type=float, default=0.6)
+    parser.add_argument('--expected_student_id', type=int, default=None)
+    parser.add_argument('--interactive', action='store_true', help='Run interactive face recognition')
+    args = parser.parse_args()
+
+    # stdin can only be read once, so keep the bytes for the in-process fallback too
+    image_bytes = sys.stdin.buffer.read() if args.image_stdin and not args.interactive else None
+
+    if not args.interactive and (args.image_path or args.image_base64 or image_bytes):
+        try:
+            if image_bytes:
+                result = send_image_bytes(image_bytes, {
+                    'threshold': args.threshold,
+                    'expected_student_id': args.expected_student_id,
+                    'max_side': args.max_side or None,
+                })
+            else:
+                result = send_request({
+                    'image_path': os.path.abspath(args.image_path) if args.image_path else None,
+                    'image_base64': args.image_base64,
+                    'threshold': args.threshold,
+                    'expected_student_id': args.expected_student_id,
+                    'max_side': args.max_side or None,
+                })
+            print(json.dumps(result))
+            return
+        except (urllib.error.URLError, ConnectionError, OSError, ValueError):
+            # Server not running or unreachable: recognize in this process instead
+            pass
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import recognize_face
+    recognize_face.main(image_bytes)
+
+
+if __name__ == '__main__':
+    main()
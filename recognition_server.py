@@ -0,0 +1,163 @@
+"""
+Resident face recognition server.
+
+Keeps the Haar cascade, reference gallery and matcher in memory and serves
+recognition requests on localhost, so check-ins no longer pay for a Python
+start-up, the cv2/numpy import and a gallery load each time.
+
+    python recognition_server.py [--host 127.0.0.1] [--port 8765]
+
+POST /recognize with a JSON body {image_path | image_base64, threshold,
+expected_student_id, max_side} returns the same JSON as `recognize_face.py`.
+Any other Content-Type is taken as the raw encoded image, with the options in
+the query string (/recognize?expected_student_id=12).
+GET /health reports the number of loaded reference faces.
+"""
+import argparse
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from cascade_matcher import add_cascade_arguments, cascade_options_from_args
+from face_detector import get_cascade
+from image_input import read_probe
+from lbph_backend import LBPHMatcher, RECOGNITION_BACKENDS
+from recognize_face import PHOTOS_DIR, RobustFaceRecognition, recognize_bgr
+from recognition_client import SERVER_HOST, SERVER_PORT
+
+
+class RecognitionService(RobustFaceRecognition):
+    """RobustFaceRecognition without cameras, serving single-image requests"""
+
+    def __init__(self, backend='template', cascade_options=None):
+        super().__init__(backend=backend, cascade_options=cascade_options)
+        self.gallery_lock = threading.Lock()
+        self.photos_dir_mtime = None
+
+    def initialize(self):
+        """Load the cascade and gallery only; the server never opens a camera"""
+        try:
+            # Fail at start-up, not on the first request, if the Haar cascade cannot be loaded
+            get_cascade()
+            self.refresh_gallery()
+            return True
+        except Exception as e:
+            print(f"Initialization error: {e}")
+            return False
+
+    def refresh_gallery(self):
+        """Reload the gallery when photos were added or removed since the last load"""
+        try:
+            mtime = os.stat(PHOTOS_DIR).st_mtime_ns
+        except OSError:
+            mtime = None
+        with self.gallery_lock:
+            if self.matcher is not None and mtime == self.photos_dir_mtime:
+                return
+            self.load_reference_faces()
+            self.photos_dir_mtime = mtime
+            print(f"Loaded {len(self.reference_faces)} reference face(s)")
+
+    def recognize(self, request, image_bytes=None):
+        """Handle one recognition request and return the CLI-compatible result dict.
+
+        The image comes from image_bytes (raw upload body), or the request's
+        image_base64 or image_path, and is decoded in memory.
+        """
+        image_path = request.get('image_path')
+        image_base64 = request.get('image_base64')
+        if not image_path and not image_base64 and not image_bytes:
+            return {'success': False, 'message': 'No image provided'}
+
+        self.refresh_gallery()
+        matcher = self.matcher
+        if matcher is None or len(matcher) == 0:
+            return {'success': False, 'message': 'No reference faces loaded'}
+
+        bgr = read_probe(image_path, image_base64, image_bytes, request.get('max_side'))
+        # Correlation threshold; the LBPH model uses its own distance cut-off (see lbph_backend)
+        threshold = float(request.get('threshold') if request.get('threshold') is not None else 0.6)
+        return recognize_bgr(bgr, matcher, threshold, request.get('expected_student_id'))
+
+
+def query_options(path):
+    """Recognition options from a /recognize?expected_student_id=..&threshold=.. query string"""
+    query = parse_qs(urlsplit(path).query)
+    options = {}
+    for key, convert in (('expected_student_id', int), ('threshold', float), ('max_side', int)):
+        if query.get(key):
+            options[key] = convert(query[key][0])
+    return options
+
+
+class RecognitionRequestHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json({'success': True, 'reference_faces': len(self.service.reference_faces)})
+        else:
+            self._send_json({'success': False, 'message': 'Not found'}, 404)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/recognize':
+            self._send_json({'success': False, 'message': 'Not found'}, 404)
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length)
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                result = self.service.recognize(json.loads(body.decode('utf-8')))
+            else:
+                # Raw image bytes in the body, options in the query string
+                result = self.service.recognize(query_options(self.path), image_bytes=body)
+        except Exception as e:
+            result = {'success': False, 'message': f'Recognition error: {str(e)}'}
+        self._send_json(result)
+
+    def log_message(self, format, *args):
+        # Keep stdout quiet; one line per request is too noisy at lecture start
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--backend', choices=RECOGNITION_BACKENDS, default='template',
+                        help='template: correlation against the photo gallery; cascade: the same, ranked at 16x16 first; '
+                             'lbph: lbph_model.yml from train_lbph.py')
+    add_cascade_arguments(parser)
+    args = parser.parse_args()
+
+    service = RecognitionService(args.backend, cascade_options_from_args(args))
+    if not service.initialize():
+        print("Failed to initialize face recognition service")
+        return
+
+    RecognitionRequestHandler.service = service
+    # Each handler thread gets its own cascade from the face_detector registry
+    server = ThreadingHTTPServer((args.host, args.port), RecognitionRequestHandler)
+    print(f"Recognition server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nReceived keyboard interrupt")
+    finally:
+        server.server_close()
+        if isinstance(service.matcher, LBPHMatcher):
+            service.matcher.close()
+
+
+if __name__ == '__main__':
+    main()
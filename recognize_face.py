@@ -1,14 +1,21 @@
 import argparse
-import base64
+import contextlib
 import json
 import os
 import sys
-import tempfile
 import numpy as np
-import mysql.connector
 import cv2
 import time
 import threading
+from camera_discovery import BACKEND_NAMES, MAX_CAMERA_INDEX, camera_label, discover_cameras, load_camera_cache, save_camera_cache
+from cascade_matcher import CascadeMatcher, add_cascade_arguments, cascade_options_from_args
+from face_detector import (FrameDetector, add_detection_arguments, detect_faces, detect_largest_face, detector_from_args,
+                           largest_face)
+from face_gallery import load_gallery, load_student_gallery
+from face_matcher import FaceMatcher
+from face_tracker import FaceTracker
+from image_input import read_probe
+from lbph_backend import LBPHMatcher, RECOGNITION_BACKENDS, load_lbph_matcher
 
 
 # Directory containing reference photos
@@ -23,28 +30,47 @@ DB_CONFIG = {
 
 
 class RobustFaceRecognition:
-    def __init__(self):
+    def __init__(self, detector=None, tracker=None, backend='template', cascade_options=None):
         self.reference_faces = []
         self.reference_names = []
         self.reference_student_ids = []
-        self.face_cascade = None
+        self.matcher = None
         self.cap = None
         self.current_camera_index = 0
         self.available_cameras = []
         self.camera_lock = threading.Lock()
         self.camera_names = {}
+        self.camera_details = {}
         self.running = True
+        # No GUI windows (headless capture boxes)
+        self.headless = False
         self.last_matches = []
+        self.last_camera_check = 0
+        # Live-frame detection settings (downscale, expected face size); reports detection_ms
+        self.detector = detector or FrameDetector()
+        # Faces followed between detections; only new or uncertain tracks are re-identified
+        self.tracker = tracker or FaceTracker()
+        # 'template' (FaceMatcher over the gallery), 'cascade' (coarse ranking, top-k rerank)
+        # or 'lbph' (trained model, centroid fallback)
+        self.backend = backend
+        self.cascade_options = cascade_options or {}
         
     def initialize(self):
         """Initialize the face recognition system"""
         try:
-            # Load face cascade classifier
-            self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            
             # Load reference faces
             self.load_reference_faces()
             
+            # Open the known-good camera from the last scan right away and rescan in the background
+            cached = load_camera_cache()
+            if cached:
+                self.set_cameras(cached)
+                print(f"Using cached camera list: {', '.join(self.camera_names.values())}")
+                if self.initialize_camera():
+                    self.rescan_cameras_in_background()
+                    return True
+                print("Cached camera did not respond, rescanning...")
+            
             # Find available cameras
             self.find_available_cameras()
             
@@ -57,123 +83,80 @@ class RobustFaceRecognition:
             return False
     
     def load_reference_faces(self):
-        """Load reference photos and detect faces in them"""
-        image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
-        
+        """Load reference faces from the on-disk gallery cache, processing only new or changed photos"""
         print("Loading reference photos...")
-        if not os.path.exists(PHOTOS_DIR):
-            print("No profiles directory found")
-            return
-            
-        for filename in os.listdir(PHOTOS_DIR):
-            if any(filename.lower().endswith(ext) for ext in image_extensions):
-                image_path = os.path.join(PHOTOS_DIR, filename)
-                
-                try:
-                    # Load image
-                    img = cv2.imread(image_path)
-                    if img is None:
-                        continue
-                        
-                    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                    
-                    # Detect faces
-                    faces = self.face_cascade.detectMultiScale(
-                        gray, 
-                        scaleFactor=1.1, 
-                        minNeighbors=5, 
-                        minSize=(30, 30)
-                    )
-                    
-                    if len(faces) > 0:
-                        # Take the largest face
-                        largest_face = max(faces, key=lambda x: x[2] * x[3])
-                        x, y, w, h = largest_face
-                        
-                        # Extract face region
-                        face_roi = gray[y:y+h, x:x+w]
-                        face_roi = cv2.resize(face_roi, (100, 100))
-                        
-                        self.reference_faces.append(face_roi)
-                        name = os.path.splitext(filename)[0]
-                        self.reference_names.append(name)
-                        
-                        # Extract student ID from filename
-                        try:
-                            student_id = int(name)
-                            self.reference_student_ids.append(student_id)
-                            print(f"✓ Loaded reference photo: {filename} (Student ID: {student_id})")
-                        except ValueError:
-                            self.reference_student_ids.append(None)
-                            print(f"✓ Loaded reference photo: {filename} (No student ID)")
-                    else:
-                        print(f"✗ No face found in: {filename}")
-                        
-                except Exception as e:
-                    print(f"Error loading {filename}: {e}")
+        faces, names, student_ids = load_gallery(PHOTOS_DIR, verbose=True)
+        
+        self.reference_faces = list(faces)
+        self.reference_names = names
+        self.reference_student_ids = student_ids
+        if isinstance(self.matcher, LBPHMatcher):
+            # Reloading (recognition server): stop the previous model's thread pool
+            self.matcher.close()
+        if self.backend == 'cascade':
+            self.matcher = CascadeMatcher(faces, student_ids, names, **self.cascade_options)
+        else:
+            self.matcher = FaceMatcher(faces, student_ids, names)
+        if self.backend == 'lbph':
+            # The model predicts student IDs; photos without one are not among its rows
+            names_by_student = {}
+            for sid, name in zip(student_ids, names):
+                if sid is not None:
+                    names_by_student.setdefault(sid, name)
+            lbph = load_lbph_matcher(names_by_student)
+            if lbph is not None:
+                self.matcher = lbph
+            else:
+                print("Falling back to template matching")
+    
+    def timing_text(self):
+        """Per-frame detection time, plus per-prediction latency for the LBPH backend"""
+        text = f"Detection {self.detector.detection_ms:.0f} ms"
+        if isinstance(self.matcher, LBPHMatcher):
+            text += f" | {self.matcher.backend.upper()} {self.matcher.latency_ms:.0f} ms/face"
+        return text
+    
+    def set_cameras(self, cameras):
+        """Replace the camera list with discovered or cached camera descriptions"""
+        cameras = sorted(cameras, key=lambda camera: camera['index'])
+        self.camera_details = {camera['index']: camera for camera in cameras}
+        self.available_cameras = [camera['index'] for camera in cameras]
+        self.camera_names = {camera['index']: camera_label(camera) for camera in cameras}
+    
+    def rescan_cameras_in_background(self):
+        """Refresh the camera list and cache without delaying start-up"""
+        def rescan():
+            with self.camera_lock:
+                in_use = self.available_cameras[self.current_camera_index] if self.available_cameras else None
+            cameras = discover_cameras([i for i in range(MAX_CAMERA_INDEX) if i != in_use])
+            with self.camera_lock:
+                if in_use in self.camera_details:
+                    cameras.append(self.camera_details[in_use])
+                self.set_cameras(cameras)
+                self.current_camera_index = self.available_cameras.index(in_use) if in_use in self.available_cameras else 0
+            if cameras:
+                save_camera_cache(cameras)
+            print(f"Background camera scan: {len(cameras)} camera(s) available")
+        
+        threading.Thread(target=rescan, name='camera-rescan', daemon=True).start()
     
     def find_available_cameras(self):
-        """Find available camera indices including external USB/webcams"""
-        self.available_cameras = []
-        self.camera_names = {}
+        """Find available camera indices including external USB/webcams, probing them in parallel"""
         print("Scanning for available cameras (including external USB/webcams)...")
         
-        # Extended range to detect more external cameras
-        for i in range(20):
-            try:
-                # Try different backends for better external camera support
-                backends = [cv2.CAP_ANY, cv2.CAP_DSHOW, cv2.CAP_V4L2, cv2.CAP_GSTREAMER]
-                
-                for backend in backends:
-                    try:
-                        cap_test = cv2.VideoCapture(i, backend)
-                        if cap_test.isOpened():
-                            # Set properties for external cameras
-                            cap_test.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                            cap_test.set(cv2.CAP_PROP_FPS, 30)
-                            
-                            # Try to read multiple frames to ensure stability
-                            frames_read = 0
-                            for _ in range(3):
-                                ret, frame = cap_test.read()
-                                if ret and frame is not None and frame.size > 0:
-                                    frames_read += 1
-                                time.sleep(0.1)
-                            
-                            if frames_read >= 2:  # At least 2 successful reads
-                                if i not in self.available_cameras:
-                                    self.available_cameras.append(i)
-                                    
-                                    # Try to get camera info
-                                    width = int(cap_test.get(cv2.CAP_PROP_FRAME_WIDTH))
-                                    height = int(cap_test.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                                    fps = int(cap_test.get(cv2.CAP_PROP_FPS))
-                                    
-                                    camera_info = f"Camera {i} ({width}x{height}@{fps}fps)"
-                                    if backend == cv2.CAP_DSHOW:
-                                        camera_info += " [DirectShow]"
-                                    elif backend == cv2.CAP_V4L2:
-                                        camera_info += " [V4L2]"
-                                    
-                                    self.camera_names[i] = camera_info
-                                    print(f"✓ {camera_info}")
-                                    break
-                            
-                            cap_test.release()
-                            time.sleep(0.2)  # Longer delay for external cameras
-                        else:
-                            cap_test.release()
-                            
-                    except Exception as e:
-                        if cap_test:
-                            cap_test.release()
-                        continue
-                        
-            except Exception as e:
-                continue
+        # The camera in use cannot be opened a second time on every platform; keep its entry
+        in_use = None
+        if self.cap is not None and self.cap.isOpened() and self.available_cameras:
+            in_use = self.available_cameras[self.current_camera_index]
+        cameras = discover_cameras([i for i in range(MAX_CAMERA_INDEX) if i != in_use])
+        if in_use in self.camera_details:
+            cameras.append(self.camera_details[in_use])
         
-        # Sort cameras (built-in cameras first, then external)
-        self.available_cameras.sort()
+        self.set_cameras(cameras)
+        for camera in cameras:
+            print(f"✓ {self.camera_names[camera['index']]}")
+        if cameras:
+            save_camera_cache(cameras)
         
         if not self.available_cameras:
             print("Warning: No cameras detected!")
@@ -201,60 +184,68 @@ class RobustFaceRecognition:
                 self.cap.release()
                 time.sleep(0.5)  # Wait for proper release
             
-            # Try different backends for external cameras
-            backends_to_try = [cv2.CAP_DSHOW, cv2.CAP_ANY, cv2.CAP_V4L2] if backend is None else [backend]
-            
-            for backend_type in backends_to_try:
-                try:
-                    # Initialize new camera with specific backend
-                    self.cap = cv2.VideoCapture(camera_id, backend_type)
-                    
-                    if self.cap.isOpened():
-                        # Set camera properties for better stability with external cameras
-                        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                        self.cap.set(cv2.CAP_PROP_FPS, 30)
-                        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                        
-                        # For external USB cameras, set additional properties
-                        self.cap.set(cv2.CAP_PROP_AUTOFOCUS, 1)
-                        self.cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.25)
-                        
-                        # Test if camera actually works with multiple frame reads
-                        successful_reads = 0
-                        for attempt in range(5):
-                            ret, frame = self.cap.read()
-                            if ret and frame is not None and frame.size > 0:
-                                successful_reads += 1
-                            time.sleep(0.1)
-                        
-                        if successful_reads >= 3:
-                            backend_name = {
-                                cv2.CAP_DSHOW: "DirectShow",
-                                cv2.CAP_V4L2: "V4L2", 
-                                cv2.CAP_ANY: "Auto"
-                            }.get(backend_type, f"Backend {backend_type}")
-                            
-                            camera_info = self.camera_names.get(camera_id, f"Camera {camera_id}")
-                            print(f"✓ {camera_info} initialized with {backend_name}")
-                            return True
-                        else:
-                            print(f"✗ Camera {camera_id} with backend {backend_type} failed stability test")
-                            self.cap.release()
-                            
-                except Exception as e:
-                    if self.cap:
-                        self.cap.release()
-                    print(f"Failed to initialize camera {camera_id} with backend {backend_type}: {e}")
-                    continue
-            
-            print(f"✗ Failed to initialize camera {camera_id} with any backend")
-            return False
+            self.cap = self.open_camera(camera_id, backend)
+            return self.cap is not None
                 
         except Exception as e:
             print(f"Error initializing camera {camera_id}: {e}")
             return False
     
+    def open_camera(self, camera_id, backend=None):
+        """Open and stability-test one camera; returns the VideoCapture or None"""
+        # Try different backends for external cameras
+        backends_to_try = [cv2.CAP_DSHOW, cv2.CAP_ANY, cv2.CAP_V4L2] if backend is None else [backend]
+        known_backend = self.camera_details.get(camera_id, {}).get('backend')
+        if backend is None and known_backend is not None:
+            # The backend that worked during discovery goes first
+            backends_to_try = [known_backend] + [b for b in backends_to_try if b != known_backend]
+        
+        for backend_type in backends_to_try:
+            cap = None
+            try:
+                # Initialize new camera with specific backend
+                cap = cv2.VideoCapture(camera_id, backend_type)
+                
+                if cap.isOpened():
+                    # Set camera properties for better stability with external cameras
+                    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                    cap.set(cv2.CAP_PROP_FPS, 30)
+                    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+                    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+                    
+                    # For external USB cameras, set additional properties
+                    cap.set(cv2.CAP_PROP_AUTOFOCUS, 1)
+                    cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.25)
+                    
+                    # Test if camera actually works with multiple frame reads
+                    # (read() already waits for the next frame, so no sleep between attempts)
+                    successful_reads = 0
+                    for attempt in range(5):
+                        ret, frame = cap.read()
+                        if ret and frame is not None and frame.size > 0:
+                            successful_reads += 1
+                            if successful_reads >= 3:
+                                break
+                    
+                    if successful_reads >= 3:
+                        backend_name = BACKEND_NAMES.get(backend_type, f"Backend {backend_type}")
+                        
+                        camera_info = self.camera_names.get(camera_id, f"Camera {camera_id}")
+                        print(f"✓ {camera_info} initialized with {backend_name}")
+                        return cap
+                    else:
+                        print(f"✗ Camera {camera_id} with backend {backend_type} failed stability test")
+                        cap.release()
+                        
+            except Exception as e:
+                if cap is not None:
+                    cap.release()
+                print(f"Failed to initialize camera {camera_id} with backend {backend_type}: {e}")
+                continue
+        
+        print(f"✗ Failed to initialize camera {camera_id} with any backend")
+        return None
+    
     def switch_camera(self, specific_camera=None):
         """Safely switch to next camera or specific camera"""
         with self.camera_lock:
@@ -272,6 +263,7 @@ class RobustFaceRecognition:
                 # Initialize the new camera
                 success = self.initialize_camera()
                 if success:
+                    self.tracker.reset()
                     camera_id = self.available_cameras[self.current_camera_index]
                     print(f"Switched to camera {camera_id}")
                     return True
@@ -283,6 +275,24 @@ class RobustFaceRecognition:
                 print(f"Error switching camera: {e}")
                 return False
     
+    def read_frame(self):
+        """Read one frame from the current camera, reinitializing it when it is closed or failing"""
+        with self.camera_lock:
+            if self.cap is None or not self.cap.isOpened():
+                print("Camera not available, trying to reinitialize...")
+                if not self.initialize_camera():
+                    time.sleep(1)
+                    return False, None
+            
+            ret, frame = self.cap.read()
+            if not ret or frame is None:
+                # Try reinitializing every 2 seconds
+                if time.time() - self.last_camera_check > 2:
+                    print("Failed to read frame, trying to reinitialize camera...")
+                    self.initialize_camera()
+                    self.last_camera_check = time.time()
+            return ret, frame
+    
     def compare_faces(self, face1, face2, threshold=0.4):
         """Compare two face images using template matching"""
         try:
@@ -309,29 +319,16 @@ class RobustFaceRecognition:
             
         try:
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(
-                gray, 
-                scaleFactor=1.1, 
-                minNeighbors=5, 
-                minSize=(30, 30)
-            )
+            faces = self.detector.detect(gray)
             
             matches_found = []
             
-            for (x, y, w, h) in faces:
-                # Extract face region
-                face_roi = gray[y:y+h, x:x+w]
-                face_roi = cv2.resize(face_roi, (100, 100))
-                
-                best_match = None
-                best_similarity = 0
-                
-                # Compare with all reference faces
-                for i, ref_face in enumerate(self.reference_faces):
-                    is_match, similarity = self.compare_faces(ref_face, face_roi)
-                    if is_match and similarity > best_similarity:
-                        best_similarity = similarity
-                        best_match = self.reference_names[i]
+            # Extract and normalize every full-resolution face ROI, then score them against the gallery in one batch
+            face_rois = self.matcher.face_rois(gray, faces)
+            best = self.matcher.best_matches(face_rois, threshold=0.4)
+            
+            for (x, y, w, h), (idx, best_similarity) in zip(faces, best):
+                best_match = self.matcher.names[idx] if idx is not None else None
                 
                 # Draw rectangle and label
                 if best_match:
@@ -352,6 +349,36 @@ class RobustFaceRecognition:
             print(f"Error in face matching: {e}")
             return []
     
+    def track_faces(self, frame):
+        """Detect faces, associate them with tracks and identify only new or uncertain tracks"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        tracks = self.tracker.update(self.detector.detect(gray), frame)
+        pending = self.tracker.needs_identification()
+        if pending:
+            face_rois = self.matcher.face_rois(gray, [track.box for track in pending])
+            best = self.matcher.best_matches(face_rois, threshold=0.4)
+            for track, (idx, similarity) in zip(pending, best):
+                if idx is not None:
+                    self.tracker.set_identity(track, self.matcher.names[idx], self.matcher.student_ids[idx], similarity)
+                else:
+                    self.tracker.set_identity(track, None, None, similarity)
+        return tracks
+    
+    def draw_tracks(self, frame, tracks):
+        """Draw a labelled rectangle for every tracked face"""
+        for track in tracks:
+            x, y, w, h = track.box
+            if track.identified:
+                color = (0, 255, 0)  # Green for match
+                label = f"{track.name} ({track.similarity:.2f})"
+            else:
+                color = (0, 0, 255)  # Red for unknown
+                label = "Unknown"
+            
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+            cv2.rectangle(frame, (x, y - 30), (x + w, y), color, cv2.FILLED)
+            cv2.putText(frame, label, (x + 5, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    
     def run(self):
         """Main application loop"""
         if not self.initialize():
@@ -374,35 +401,23 @@ class RobustFaceRecognition:
         print("- 'i': show camera info")
         
         frame_count = 0
-        last_camera_check = time.time()
         
         while self.running:
             try:
-                with self.camera_lock:
-                    if self.cap is None or not self.cap.isOpened():
-                        print("Camera not available, trying to reinitialize...")
-                        if not self.initialize_camera():
-                            time.sleep(1)
-                            continue
-                    
-                    ret, frame = self.cap.read()
-                
+                ret, frame = self.read_frame()
                 if not ret or frame is None:
-                    print("Failed to read frame, trying to reinitialize camera...")
                     time.sleep(0.1)
-                    if time.time() - last_camera_check > 2:  # Try reinitializing every 2 seconds
-                        self.initialize_camera()
-                        last_camera_check = time.time()
                     continue
                 
                 frame_count += 1
                 
-                # Check for face matches (reduce frequency for performance)
-                if frame_count % 5 == 0:  # Process every 5th frame
-                    matches = self.check_face_match(frame)
-                    self.last_matches = matches  # Store last result
+                # Detect every 5th frame and follow the tracked faces in between
+                if frame_count % 5 == 0:
+                    tracks = self.track_faces(frame)
                 else:
-                    matches = self.last_matches  # Use last known result
+                    tracks = self.tracker.follow(frame)
+                self.draw_tracks(frame, tracks)
+                matches = [track.name for track in tracks if track.identified]
                 
                 # Display status
                 status_text = "MATCH FOUND!" if matches else "No match"
@@ -413,7 +428,8 @@ class RobustFaceRecognition:
                     match_text = f"Matched: {', '.join(matches)}"
                     cv2.putText(frame, match_text, (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
                 
-                # Display current camera info
+                # Display detection time and current camera info
+                cv2.putText(frame, self.timing_text(), (10, frame.shape[0] - 50), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
                 camera_id = self.available_cameras[self.current_camera_index] if self.available_cameras else "N/A"
                 camera_info = self.camera_names.get(camera_id, f"Camera {camera_id}")
                 cv2.putText(frame, camera_info, (10, frame.shape[0] - 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
@@ -451,6 +467,7 @@ class RobustFaceRecognition:
                     for i, cam_id in enumerate(self.available_cameras):
                         current_marker = " <- CURRENT" if i == self.current_camera_index else ""
                         print(f"  [{i}] {self.camera_names.get(cam_id, f'Camera {cam_id}')}{current_marker}")
+                    print(f"  {self.timing_text()}")
                     print("==========================")
                     
             except KeyboardInterrupt:
@@ -467,7 +484,10 @@ class RobustFaceRecognition:
         try:
             if self.cap is not None:
                 self.cap.release()
-            cv2.destroyAllWindows()
+            if isinstance(self.matcher, LBPHMatcher):
+                self.matcher.close()
+            if not self.headless:
+                cv2.destroyAllWindows()
             print("Cleanup completed")
         except Exception as e:
             print(f"Error during cleanup: {e}")
@@ -475,58 +495,9 @@ class RobustFaceRecognition:
 
 # Legacy functions for backward compatibility with existing PHP integration
 def load_reference_faces():
-    """Load reference photos from uploads/profiles directory and detect faces in them"""
-    reference_faces = []
-    reference_names = []
-    reference_student_ids = []
-    
-    # Directory containing reference photos
-    photos_dir = PHOTOS_DIR
-    
-    # Load face cascade classifier
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-    
-    # Supported image extensions
-    image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
-    
-    if not os.path.exists(photos_dir):
-        return reference_faces, reference_names, reference_student_ids
-    
-    for filename in os.listdir(photos_dir):
-        if any(filename.lower().endswith(ext) for ext in image_extensions):
-            image_path = os.path.join(photos_dir, filename)
-            
-            # Load image
-            img = cv2.imread(image_path)
-            if img is None:
-                continue
-                
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
-            # Detect faces
-            faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
-            
-            if len(faces) > 0:
-                # Take the largest face
-                largest_face = max(faces, key=lambda x: x[2] * x[3])
-                x, y, w, h = largest_face
-                
-                # Extract face region
-                face_roi = gray[y:y+h, x:x+w]
-                face_roi = cv2.resize(face_roi, (100, 100))  # Normalize size
-                
-                reference_faces.append(face_roi)
-                name = os.path.splitext(filename)[0]
-                reference_names.append(name)
-                
-                # Extract student ID from filename (assuming format like "123.jpg" where 123 is student_id)
-                try:
-                    student_id = int(name)
-                    reference_student_ids.append(student_id)
-                except ValueError:
-                    reference_student_ids.append(None)
-    
-    return reference_faces, reference_names, reference_student_ids
+    """Load reference photos from uploads/profiles via the gallery cache"""
+    faces, reference_names, reference_student_ids = load_gallery(PHOTOS_DIR)
+    return list(faces), reference_names, reference_student_ids
 
 
 def compare_faces(face1, face2, threshold=0.6):
@@ -547,28 +518,63 @@ def compare_faces(face1, face2, threshold=0.6):
 
 def detect_face(gray):
     """Detect face in grayscale image"""
-    cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-    face_cascade = cv2.CascadeClassifier(cascade_path)
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
-    if len(faces) == 0:
-        return None
-    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
-    return gray[y:y + h, x:x + w]
+    return detect_largest_face(gray)
+
+
+def recognize_bgr(bgr, matcher, threshold=0.6, expected_student_id=None):
+    """Detect the largest face in a BGR image and match it against the gallery.
+
+    Returns the JSON-serializable result dict printed by the CLI.
+    """
+    if bgr is None:
+        return {'success': False, 'message': 'Invalid image'}
+
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    box = largest_face(detect_faces(gray))
+    if box is None:
+        return {'success': False, 'message': 'No face detected'}
 
+    # Crop and prepare the face the way the matcher's backend expects
+    face_resized = matcher.face_rois(gray, [box])[0]
 
-def main():
+    if expected_student_id is not None:
+        # 1:1 verification: score only the expected student's references
+        idx, similarity = matcher.verify(face_resized, expected_student_id, threshold)
+    else:
+        # Score against every reference face in one pass
+        idx, similarity = matcher.best_match(face_resized, threshold)
+    matched = idx is not None
+    student_id = matcher.student_ids[idx] if matched else None
+    confidence = similarity if matched else 0.0
+
+    return {'success': True, 'matched': matched, 'student_id': student_id, 'confidence': confidence}
+
+
+def main(image_bytes=None):
     parser = argparse.ArgumentParser()
     parser.add_argument('--image_path', help='Path to image file', default=None)
     parser.add_argument('--image_base64', help='Data URL or base64 image string', default=None)
-    parser.add_argument('--threshold', type=float, default=0.6)
+    parser.add_argument('--image_stdin', action='store_true', help='Read the image bytes (or base64) from stdin')
+    parser.add_argument('--max_side', type=int, default=0, help='Decode large images at reduced resolution, keeping at least this many pixels on the longer side')
+    parser.add_argument('--threshold', type=float, default=0.6,
+                        help='Correlation a template/cascade match must exceed; with --backend lbph the model accepts '
+                             'distances up to LBPH_MAX_DISTANCE (80) instead, and this applies to its centroid fallback only')
     parser.add_argument('--expected_student_id', type=int, default=None)
     parser.add_argument('--interactive', action='store_true', help='Run interactive face recognition')
+    parser.add_argument('--backend', choices=RECOGNITION_BACKENDS, default='template',
+                        help='template: correlation against the photo gallery; cascade: the same, ranked at 16x16 first; '
+                             'lbph: lbph_model.yml from train_lbph.py')
+    add_cascade_arguments(parser)
+    add_detection_arguments(parser)
+    parser.add_argument('--follow_faces', action='store_true',
+                        help='Move face boxes between detections with an OpenCV MOSSE/KCF tracker')
     args = parser.parse_args()
 
     # If interactive mode requested, run the robust face recognition system
     if args.interactive:
         try:
-            face_recognition_system = RobustFaceRecognition()
+            face_recognition_system = RobustFaceRecognition(detector_from_args(args), FaceTracker(use_opencv=args.follow_faces),
+                                                             args.backend, cascade_options_from_args(args))
             face_recognition_system.run()
         except Exception as e:
             print(f"Application error: {e}")
@@ -576,83 +582,50 @@ def main():
             cv2.destroyAllWindows()
         return
 
-    if not args.image_path and not args.image_base64:
+    if args.image_stdin and image_bytes is None:
+        image_bytes = sys.stdin.buffer.read()
+    if not args.image_path and not args.image_base64 and not image_bytes:
         print(json.dumps({'success': False, 'message': 'No image provided'}))
         return
 
-    # Load reference faces
+    bgr = read_probe(args.image_path, args.image_base64, image_bytes, args.max_side)
+    if args.backend == 'lbph':
+        # The trained model holds every student; no gallery photos are read.
+        # stdout carries only the JSON result
+        with contextlib.redirect_stdout(sys.stderr):
+            matcher = load_lbph_matcher()
+        if matcher is not None:
+            with matcher:
+                result = recognize_bgr(bgr, matcher, args.threshold, args.expected_student_id)
+            if result.get('success'):
+                result['backend'] = matcher.backend
+                result['latency_ms'] = round(matcher.latency_ms, 1)
+            print(json.dumps(result))
+            return
+    
+    # Load reference faces: only the expected student's for verification, else the whole gallery
     try:
-        reference_faces, reference_names, reference_student_ids = load_reference_faces()
-        if not reference_faces:
+        if args.expected_student_id is not None:
+            reference_faces, reference_names, reference_student_ids = load_student_gallery(args.expected_student_id, PHOTOS_DIR)
+        else:
+            reference_faces, reference_names, reference_student_ids = load_reference_faces()
+        if args.expected_student_id is None and not len(reference_faces):
             print(json.dumps({'success': False, 'message': 'No reference faces loaded'}))
             return
     except Exception as e:
         print(json.dumps({'success': False, 'message': f'Error loading reference photos: {str(e)}'}))
         return
 
-    # Prepare image file
-    image_path = args.image_path
-    tmp_file = None
-    if not image_path:
-        data = args.image_base64
-        if data.startswith('data:') and 'base64,' in data:
-            data = data.split('base64,', 1)[1]
-        raw = base64.b64decode(data)
-        fd, tmp_file = tempfile.mkstemp(suffix='.png')
-        with os.fdopen(fd, 'wb') as f:
-            f.write(raw)
-        image_path = tmp_file
-
-    # Load image and detect face
-    bgr = cv2.imread(image_path)
-    if bgr is None:
-        print(json.dumps({'success': False, 'message': 'Invalid image'}))
-        if tmp_file:
-            os.remove(tmp_file)
-        return
-    
-    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
-    face_img = detect_face(gray)
-    if face_img is None:
-        print(json.dumps({'success': False, 'message': 'No face detected'}))
-        if tmp_file:
-            os.remove(tmp_file)
-        return
-    
-    # Resize face for comparison
-    face_resized = cv2.resize(face_img, (100, 100))
-
-    # Compare with reference faces using template matching
-    student_id = None
-    matched = False
-    confidence = 0.0
-    best_match = None
-    best_similarity = 0
-
-    # Compare with all reference faces
-    for i, ref_face in enumerate(reference_faces):
-        is_match, similarity = compare_faces(ref_face, face_resized, args.threshold)
-        if is_match and similarity > best_similarity:
-            best_similarity = similarity
-            best_match = reference_names[i]
-            student_id = reference_student_ids[i]
-            matched = True
-            confidence = similarity
-
-    # If expected student provided, enforce identity match
-    if args.expected_student_id is not None:
-        matched = matched and (student_id == int(args.expected_student_id))
-
-    result = {'success': True, 'matched': matched, 'student_id': student_id, 'confidence': confidence}
+    # Detect face in the in-memory probe and match
+    if args.backend == 'cascade':
+        matcher = CascadeMatcher(reference_faces, reference_student_ids, reference_names, **cascade_options_from_args(args))
+    else:
+        matcher = FaceMatcher(reference_faces, reference_student_ids, reference_names)
+    result = recognize_bgr(bgr, matcher, args.threshold, args.expected_student_id)
 
     print(json.dumps(result))
 
-    if tmp_file:
-        os.remove(tmp_file)
-
 
 # Main execution
 if __name__ == "__main__":
     main()
-
-
@@ -1,12 +1,15 @@
 import argparse
-import base64
 import json
 import os
 import sys
-import tempfile
-import numpy as np
+import cv2
 import mysql.connector
 import face_recognition
+from embedding_index import load_index
+from encoding_store import load_encodings
+from enroll_faces import enroll_profiles
+from face_assignment import assign_faces, candidate_matrix
+from image_input import read_probe
 
 
 DB_CONFIG = {
@@ -30,124 +33,104 @@ def ensure_encodings_from_profiles(conn):
         cur.close()
         return
 
+    cur.close()
     profiles_dir = os.path.join(os.path.dirname(__file__), 'uploads', 'profiles')
     if not os.path.isdir(profiles_dir):
-        cur.close()
         return
 
-    insert_sql = (
-        "INSERT INTO student_face_encodings (student_id, face_encoding, image_path) "
-        "VALUES (%s, %s, %s)"
-    )
-
-    for fname in os.listdir(profiles_dir):
-        if not fname.lower().endswith(('.png', '.jpg', '.jpeg')):
-            continue
-        # Try to extract numeric users.id from filename
-        import re
-        m = re.findall(r"\d+", fname)
-        if not m:
-            continue
-        student_id = int(m[0])
-        path = os.path.join(profiles_dir, fname)
-        try:
-            img = face_recognition.load_image_file(path)
-            boxes = face_recognition.face_locations(img, model='hog')
-            if not boxes:
-                continue
-            enc = face_recognition.face_encodings(img, boxes)[0]
-            cur.execute(insert_sql, (student_id, json.dumps(enc.tolist()), os.path.join('uploads', 'profiles', fname)))
-            conn.commit()
-        except Exception:
-            continue
-    cur.close()
+    # Same code path as `python enroll_faces.py`, which should be preferred for large intakes.
+    # This runs inside a recognition request, so encode in-process instead of taking every core
+    enroll_profiles(conn, profiles_dir, workers=1)
 
 
 def load_known_encodings(conn):
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT sfe.student_id, sfe.face_encoding
-        FROM student_face_encodings sfe
-        JOIN users u ON u.id = sfe.student_id
-        WHERE u.status = 'active'
-        """
-    )
-    rows = cur.fetchall()
-    cur.close()
-    encodings = []
-    student_ids = []
-    for sid, enc_json in rows:
-        try:
-            enc = np.array(json.loads(enc_json))
-            encodings.append(enc)
-            student_ids.append(int(sid))
-        except Exception:
-            continue
-    return encodings, student_ids
+    """Return active students' encodings as one (N, 128) float32 matrix plus their IDs"""
+    return load_encodings(conn)
+
+
+def recognize_group(img, boxes, index, threshold=0.6, candidates=5):
+    """Classroom mode: encode all detected faces in one call and assign them to distinct students.
+
+    Returns {'success', 'faces': [{'box', 'matched', 'student_id', 'confidence'}], 'student_ids'}.
+    """
+    encodings = face_recognition.face_encodings(img, boxes)
+    # A few candidates per face lets a face fall back to its next-best student on a conflict
+    labels, distances = candidate_matrix(index.search(encodings, k=candidates))
+    assignment = assign_faces(distances, tolerance=1.0 - threshold)
+
+    faces = []
+    for i, (box, col) in enumerate(zip(boxes, assignment)):
+        if col is not None:
+            faces.append({'box': list(box), 'matched': True, 'student_id': int(labels[col]),
+                          'confidence': 1.0 - float(distances[i, col])})
+        else:
+            best = float(distances[i].min()) if distances.shape[1] else 1.0
+            faces.append({'box': list(box), 'matched': False, 'student_id': None,
+                          'confidence': max(0.0, 1.0 - best)})
+    return {'success': True, 'faces': faces, 'student_ids': [f['student_id'] for f in faces if f['matched']]}
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--image_path', default=None)
     parser.add_argument('--image_base64', default=None)
+    parser.add_argument('--image_stdin', action='store_true', help='Read the image bytes (or base64) from stdin')
+    parser.add_argument('--max_side', type=int, default=0, help='Decode large images at reduced resolution, keeping at least this many pixels on the longer side')
     parser.add_argument('--threshold', type=float, default=0.6)
     parser.add_argument('--expected_student_id', type=int, default=None)
+    parser.add_argument('--index', choices=['auto', 'brute', 'ivf'], default='auto', help='Nearest-neighbour index over the stored encodings')
+    parser.add_argument('--top_k', type=int, default=1, help='Also report the k best matching students')
+    parser.add_argument('--classroom', action='store_true', help='Recognize every face in the frame, one student per face')
     args = parser.parse_args()
 
-    if not args.image_path and not args.image_base64:
+    image_bytes = sys.stdin.buffer.read() if args.image_stdin else None
+    if not args.image_path and not args.image_base64 and not image_bytes:
         print(json.dumps({'success': False, 'message': 'No image provided'}))
         return
 
-    # Prepare image file
-    image_path = args.image_path
-    tmp_file = None
-    if not image_path:
-        data = args.image_base64
-        if data.startswith('data:') and 'base64,' in data:
-            data = data.split('base64,', 1)[1]
-        raw = base64.b64decode(data)
-        fd, tmp_file = tempfile.mkstemp(suffix='.png')
-        with os.fdopen(fd, 'wb') as f:
-            f.write(raw)
-        image_path = tmp_file
-
-    # Load query image
-    img = face_recognition.load_image_file(image_path)
+    # Decode the query image in memory; face_recognition expects RGB
+    bgr = read_probe(args.image_path, args.image_base64, image_bytes, args.max_side)
+    if bgr is None:
+        print(json.dumps({'success': False, 'message': 'Invalid image'}))
+        return
+    img = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
     boxes = face_recognition.face_locations(img, model='hog')
     if not boxes:
         print(json.dumps({'success': False, 'message': 'No face detected'}))
-        if tmp_file:
-            os.remove(tmp_file)
         return
-    query_enc = face_recognition.face_encodings(img, boxes)[0]
 
-    # Load known encodings (build from profiles if empty)
+    # Load the encoding index (build from profiles if empty); brought up to date with the table on load
     conn = get_connection()
     ensure_encodings_from_profiles(conn)
-    known_encodings, student_ids = load_known_encodings(conn)
+    index = load_index(conn, args.index)
     conn.close()
 
-    if not known_encodings:
+    if len(index) == 0:
         print(json.dumps({'success': False, 'message': 'No registered faces'}))
-        if tmp_file:
-            os.remove(tmp_file)
         return
 
-    distances = face_recognition.face_distance(known_encodings, query_enc)
-    best_idx = int(np.argmin(distances))
-    best_distance = float(distances[best_idx])
+    if args.classroom:
+        print(json.dumps(recognize_group(img, boxes, index, args.threshold)))
+        return
+
+    # Single-student mode only needs the first face encoded
+    query_enc = face_recognition.face_encodings(img, boxes[:1])[0]
+    matches = index.search(query_enc, k=max(1, args.top_k))[0]
+    if not matches:
+        print(json.dumps({'success': True, 'matched': False, 'student_id': None, 'confidence': 0.0}))
+        return
+    best_student_id, best_distance = matches[0]
     confidence = 1.0 - best_distance  # 0..1 (approx)
     matched = confidence >= args.threshold
-    student_id = int(student_ids[best_idx]) if matched else None
+    student_id = int(best_student_id) if matched else None
 
     if args.expected_student_id is not None:
         matched = matched and (student_id == int(args.expected_student_id))
 
-    print(json.dumps({'success': True, 'matched': matched, 'student_id': student_id, 'confidence': confidence}))
-
-    if tmp_file:
-        os.remove(tmp_file)
+    result = {'success': True, 'matched': matched, 'student_id': student_id, 'confidence': confidence}
+    if args.top_k > 1:
+        result['top_matches'] = [{'student_id': sid, 'confidence': 1.0 - dist} for sid, dist in matches]
+    print(json.dumps(result))
 
 
 if __name__ == '__main__':
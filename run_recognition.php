@@ -11,28 +11,32 @@ if (!$image_base64) {
 	exit();
 }
 
-// Write base64 to a temp file
-$tmp = tempnam(sys_get_temp_dir(), 'fa_');
-$png = $tmp . '.png';
-unlink($tmp);
-
 // Normalize base64
 if (strpos($image_base64, 'base64,') !== false) {
 	$image_base64 = substr($image_base64, strpos($image_base64, 'base64,') + 7);
 }
 $raw = base64_decode($image_base64);
-file_put_contents($png, $raw);
 
-// Call Python recognizer using venv python if present
+// Call Python recognizer using venv python if present.
+// recognition_client.py forwards to the resident recognition_server.py when it is running
+// and falls back to recognize_face.py in-process otherwise. The image bytes are piped
+// on stdin and decoded in memory, so no temp file is written.
 $venvPython = __DIR__ . DIRECTORY_SEPARATOR . '.venv' . DIRECTORY_SEPARATOR . 'Scripts' . DIRECTORY_SEPARATOR . 'python.exe';
 $python = file_exists($venvPython) ? $venvPython : 'python';
-$cmd = escapeshellcmd($python) . ' ' . escapeshellarg(__DIR__ . '/recognize_face.py') . ' --image_path ' . escapeshellarg($png);
+$cmd = escapeshellcmd($python) . ' ' . escapeshellarg(__DIR__ . '/recognition_client.py') . ' --image_stdin';
 // If a student is logged in, pass expected_student_id so Python compares against their saved profile image
 if (!empty($_SESSION['user_id']) && ($_SESSION['user_type'] ?? '') === 'student') {
     $cmd .= ' --expected_student_id ' . escapeshellarg((string)$_SESSION['user_id']);
 }
-$output = shell_exec($cmd . ' 2>&1');
-@unlink($png);
+$proc = proc_open($cmd . ' 2>&1', [0 => ['pipe', 'r'], 1 => ['pipe', 'w']], $pipes);
+$output = '';
+if (is_resource($proc)) {
+	fwrite($pipes[0], $raw);
+	fclose($pipes[0]);
+	$output = stream_get_contents($pipes[1]);
+	fclose($pipes[1]);
+	proc_close($proc);
+}
 
 // Parse JSON from Python
 $json_start = strpos($output, '{');
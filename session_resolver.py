@@ -0,0 +1,95 @@
+"""
+In-memory student -> active session_instance resolver.
+
+Loads every enrolled student's in-progress session for today in one query and
+answers lookups from a dict. The mapping is reloaded when a timetable slot
+boundary (any session start or end time) is crossed, when the date changes,
+or when the TTL expires (to pick up sessions started or ended by lecturers).
+"""
+import threading
+from datetime import datetime, timedelta
+
+
+DAY_SESSIONS_QUERY = """
+    SELECT se.student_id, si.id, ts.start_time, ts.end_time
+    FROM student_enrollments se
+    JOIN classes c ON se.class_id = c.id
+    JOIN timetable_sessions ts ON ts.class_id = c.id
+    JOIN session_instances si ON si.timetable_session_id = ts.id AND si.session_date = CURDATE()
+    WHERE se.status = 'enrolled'
+      AND c.status = 'active'
+      AND si.status = 'in_progress'
+    ORDER BY ts.start_time
+"""
+
+
+def _seconds(value):
+    """Seconds since midnight for a MySQL TIME (returned as timedelta) or datetime.time"""
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+class SessionResolver:
+    """Resolves a student's current session from a per-day in-memory map"""
+
+    def __init__(self, get_connection, ttl_seconds=60):
+        self.get_connection = get_connection
+        self.ttl = ttl_seconds
+        self.lock = threading.Lock()
+        # student_id -> [(start_seconds, end_seconds, session_instance_id), ...]
+        self.sessions = {}
+        self.boundaries = []
+        self.loaded_at = None
+
+    def refresh(self, now=None):
+        """Reload today's student -> session mapping with a single query"""
+        now = now or datetime.now()
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(DAY_SESSIONS_QUERY)
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+
+        sessions = {}
+        boundaries = set()
+        for student_id, session_id, start_time, end_time in rows:
+            start, end = _seconds(start_time), _seconds(end_time)
+            sessions.setdefault(int(student_id), []).append((start, end, int(session_id)))
+            boundaries.update((start, end))
+
+        with self.lock:
+            self.sessions = sessions
+            self.boundaries = sorted(boundaries)
+            self.loaded_at = now
+
+    def needs_refresh(self, now):
+        if self.loaded_at is None or now.date() != self.loaded_at.date():
+            return True
+        if (now - self.loaded_at).total_seconds() >= self.ttl:
+            return True
+        # Reload when a slot starts or ends between the last load and now
+        loaded, current = _seconds(self.loaded_at.time()), _seconds(now.time())
+        return any(loaded < b <= current for b in self.boundaries)
+
+    def resolve_many(self, student_ids, now=None):
+        """Map each student with an active session to its session_instance_id"""
+        now = now or datetime.now()
+        if self.needs_refresh(now):
+            self.refresh(now)
+        current = _seconds(now.time())
+        resolved = {}
+        with self.lock:
+            for student_id in student_ids:
+                for start, end, session_id in self.sessions.get(int(student_id), ()):
+                    if start <= current <= end:
+                        resolved[student_id] = session_id
+                        break
+        return resolved
+
+    def resolve(self, student_id, now=None):
+        """Return the student's current session_instance_id, or None"""
+        return self.resolve_many([student_id], now).get(student_id)
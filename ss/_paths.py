@@ -0,0 +1,10 @@
+"""Puts the repository root on sys.path so the ss/ scripts can import the shared modules.
+
+Import it before any repository module: `import _paths`.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
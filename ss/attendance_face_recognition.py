@@ -6,6 +6,8 @@ import threading
 import mysql.connector
 import json
 from datetime import datetime
+import _paths  # noqa: F401  (repository root on sys.path)
+from face_detector import detect_faces, get_cascade
 
 # Configuration
 PHOTOS_DIR = "../uploads/profiles"  # Use main system's profile photos
@@ -36,7 +38,7 @@ class AttendanceFaceRecognition:
         """Initialize the face recognition system"""
         try:
             # Load face cascade classifier
-            self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            self.face_cascade = get_cascade()
             
             # Load reference faces
             self.load_reference_faces()
@@ -74,12 +76,7 @@ class AttendanceFaceRecognition:
                     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
                     
                     # Detect faces
-                    faces = self.face_cascade.detectMultiScale(
-                        gray, 
-                        scaleFactor=1.1, 
-                        minNeighbors=5, 
-                        minSize=(30, 30)
-                    )
+                    faces = detect_faces(gray)
                     
                     if len(faces) > 0:
                         # Take the largest face
@@ -311,12 +308,7 @@ class AttendanceFaceRecognition:
             
         try:
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(
-                gray, 
-                scaleFactor=1.1, 
-                minNeighbors=5, 
-                minSize=(30, 30)
-            )
+            faces = detect_faces(gray)
             
             matches_found = []
             
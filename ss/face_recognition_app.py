@@ -1,7 +1,8 @@
 import cv2
 import face_recognition
 import os
-import numpy as np
+import _paths  # noqa: F401  (repository root on sys.path)
+from face_assignment import match_faces
 
 # Directory containing reference photos
 PHOTOS_DIR = "."  # Current directory where your photos are stored
@@ -45,21 +46,17 @@ def check_face_match(frame, known_face_encodings, known_face_names):
     
     matches_found = []
     
-    for face_encoding, face_location in zip(face_encodings, face_locations):
-        # Compare with known faces
-        matches = face_recognition.compare_faces(known_face_encodings, face_encoding, tolerance=0.6)
-        face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-        
+    # Score all faces against all references at once; each person can be claimed by one face only
+    assignments = match_faces(face_encodings, known_face_encodings, known_face_names, tolerance=0.6)
+    
+    for (matched_name, _), face_location in zip(assignments, face_locations):
         name = "Unknown"
         color = (0, 0, 255)  # Red for unknown
         
-        if True in matches:
-            # Find the best match
-            best_match_index = np.argmin(face_distances)
-            if matches[best_match_index]:
-                name = known_face_names[best_match_index]
-                color = (0, 255, 0)  # Green for match
-                matches_found.append(name)
+        if matched_name is not None:
+            name = matched_name
+            color = (0, 255, 0)  # Green for match
+            matches_found.append(name)
         
         # Draw rectangle and label
         top, right, bottom, left = face_location
@@ -1,7 +1,6 @@
 import cv2
-
-# Load the Haar Cascade classifier for face detection
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+import _paths  # noqa: F401  (repository root on sys.path)
+from face_detector import detect_faces
 
 # Open the default webcam
 cap = cv2.VideoCapture(0)
@@ -22,7 +21,7 @@ while True:
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
     # Detect faces in the grayscale frame
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+    faces = detect_faces(gray)
 
     # Draw rectangles around the detected faces
     for (x, y, w, h) in faces:
@@ -1,6 +1,8 @@
 import cv2
 import os
 import numpy as np
+import _paths  # noqa: F401  (repository root on sys.path)
+from face_detector import detect_faces, get_cascade
 
 # Directory containing reference photos
 PHOTOS_DIR = "."
@@ -10,9 +12,6 @@ def load_reference_faces():
     reference_faces = []
     reference_names = []
     
-    # Load face cascade classifier
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-    
     # Supported image extensions
     image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
     
@@ -29,7 +28,7 @@ def load_reference_faces():
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
             
             # Detect faces
-            faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+            faces = detect_faces(gray)
             
             if len(faces) > 0:
                 # Take the largest face
@@ -64,10 +63,10 @@ def compare_faces(face1, face2, threshold=0.6):
     
     return similarity > threshold, similarity
 
-def check_face_match(frame, reference_faces, reference_names, face_cascade):
+def check_face_match(frame, reference_faces, reference_names):
     """Check if any face in the frame matches known faces"""
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+    faces = detect_faces(gray)
     
     matches_found = []
     
@@ -112,8 +111,8 @@ except Exception as e:
     print(f"Error loading reference photos: {e}")
     exit()
 
-# Load face cascade classifier
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+# Load face cascade classifier (fails early if OpenCV's data files are missing)
+get_cascade()
 
 # Function to try different camera indices
 def find_available_cameras():
@@ -159,7 +158,7 @@ while True:
         break
 
     # Check for face matches in real-time
-    matches = check_face_match(frame, reference_faces, reference_names, face_cascade)
+    matches = check_face_match(frame, reference_faces, reference_names)
     
     # Display status
     status_text = "MATCH FOUND!" if matches else "No match"
@@ -178,7 +177,7 @@ while True:
         break
     elif key == ord('s'):
         # Capture and check
-        matches = check_face_match(frame, reference_faces, reference_names, face_cascade)
+        matches = check_face_match(frame, reference_faces, reference_names)
         if matches:
             print(f"✓ SUCCESS: Face matched with {', '.join(matches)}")
         else:
@@ -3,6 +3,8 @@ import os
 import numpy as np
 import time
 import threading
+import _paths  # noqa: F401  (repository root on sys.path)
+from face_detector import detect_faces, get_cascade
 
 # Directory containing reference photos
 PHOTOS_DIR = "."
@@ -24,7 +26,7 @@ class RobustFaceRecognition:
         """Initialize the face recognition system"""
         try:
             # Load face cascade classifier
-            self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            self.face_cascade = get_cascade()
             
             # Load reference faces
             self.load_reference_faces()
@@ -58,12 +60,7 @@ class RobustFaceRecognition:
                     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
                     
                     # Detect faces
-                    faces = self.face_cascade.detectMultiScale(
-                        gray, 
-                        scaleFactor=1.1, 
-                        minNeighbors=5, 
-                        minSize=(30, 30)
-                    )
+                    faces = detect_faces(gray)
                     
                     if len(faces) > 0:
                         # Take the largest face
@@ -281,12 +278,7 @@ class RobustFaceRecognition:
             
         try:
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(
-                gray, 
-                scaleFactor=1.1, 
-                minNeighbors=5, 
-                minSize=(30, 30)
-            )
+            faces = detect_faces(gray)
             
             matches_found = []
             
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The modules under test live at the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmark_recognition import synthetic_face, synthetic_probe  # noqa: E402
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(1234)
+
+
+@pytest.fixture
+def faces(rng):
+    """Twelve distinct synthetic 100x100 faces"""
+    return np.stack([synthetic_face(rng, size=100) for _ in range(12)])
+
+
+@pytest.fixture
+def probes(faces, rng):
+    """One noisy recapture per face in `faces`"""
+    return np.stack([synthetic_probe(face, rng) for face in faces])
@@ -0,0 +1,129 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from attendance_writer import INSERT_ATTENDANCE_QUERY, AttendanceEvent, AttendanceWriter
+
+SEEN_AT = datetime(2024, 3, 4, 9, 0, 0)
+
+
+class Cursor:
+    def __init__(self, executed):
+        self.executed = executed
+
+    def execute(self, query, params):
+        self.executed.append((query, list(params)))
+
+    def close(self):
+        pass
+
+
+class Connection:
+    def __init__(self):
+        self.executed = []
+        self.commits = 0
+        self.closed = 0
+
+    def cursor(self):
+        return Cursor(self.executed)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed += 1
+
+
+class Resolver:
+    """Student 3 has no active session"""
+
+    def resolve_many(self, student_ids):
+        return {sid: 40 + sid for sid in student_ids if sid != 3}
+
+
+@pytest.fixture
+def conn():
+    return Connection()
+
+
+def make_writer(conn, session_instance_id=12, **kwargs):
+    writer = AttendanceWriter({}, session_instance_id, **kwargs)
+    writer.get_connection = lambda: conn
+    return writer
+
+
+def test_write_sends_one_multi_row_upsert(conn):
+    writer = make_writer(conn)
+    written, unresolved = writer.write([AttendanceEvent(1, 0.5, SEEN_AT), AttendanceEvent(2, 0.7, SEEN_AT),
+                                        AttendanceEvent(1, 0.9, datetime(2024, 3, 4, 9, 5))])
+    assert [e.student_id for e in written] == [1, 2] and unresolved == []
+
+    rows = "(%s, %s, 'present', %s, %s), (%s, %s, 'present', %s, %s)"
+    assert conn.executed == [(INSERT_ATTENDANCE_QUERY.format(rows=rows), [1, 12, SEEN_AT, 0.9, 2, 12, SEEN_AT, 0.7])]
+    assert 'ON DUPLICATE KEY UPDATE' in conn.executed[0][0]
+    assert conn.commits == 1 and conn.closed == 1
+
+
+def test_students_without_a_session_are_returned_unresolved(conn):
+    writer = make_writer(conn, session_instance_id=None)
+    writer.session_resolver = Resolver()
+    written, unresolved = writer.write([AttendanceEvent(sid, 0.8, SEEN_AT) for sid in (1, 3, 5)])
+    assert [e.student_id for e in written] == [1, 5]
+    assert [e.student_id for e in unresolved] == [3]
+    assert conn.executed[0][1] == [1, 41, SEEN_AT, 0.8, 5, 45, SEEN_AT, 0.8]
+
+    conn.executed.clear()
+    written, unresolved = writer.write([AttendanceEvent(3)])
+    assert written == [] and [e.student_id for e in unresolved] == [3]
+    assert writer.write([]) == ([], [])
+    assert conn.executed == []
+
+
+def background_writer(conn, **kwargs):
+    batches = []
+    done = threading.Event()
+
+    def on_written(events):
+        batches.append(([e.student_id for e in events], time.monotonic()))
+        done.set()
+
+    writer = make_writer(conn, on_written=on_written, **kwargs)
+    writer.start()
+    return writer, batches, done
+
+
+def test_a_full_batch_is_flushed_without_waiting(conn):
+    writer, batches, done = background_writer(conn, batch_size=3, flush_interval_ms=60000)
+    try:
+        for sid in (1, 2, 3):
+            writer.submit(sid, 0.8)
+        assert done.wait(5)
+        assert batches[0][0] == [1, 2, 3]
+        assert len(conn.executed) == 1
+    finally:
+        writer.stop()
+
+
+def test_a_partial_batch_is_flushed_after_the_interval(conn):
+    writer, batches, done = background_writer(conn, batch_size=20)
+    try:
+        submitted = time.monotonic()
+        writer.submit(7, 0.8)
+        assert done.wait(5)
+        assert batches[0][0] == [7]
+        # flush_interval_ms defaults to 500
+        assert batches[0][1] - submitted >= 0.2
+    finally:
+        writer.stop()
+
+
+def test_stop_flushes_what_is_still_buffered(conn):
+    writer, batches, _ = background_writer(conn, batch_size=20, flush_interval_ms=60000)
+    writer.submit(4, 0.8)
+    writer.stop()
+    assert [ids for ids, _ in batches] == [[4]]
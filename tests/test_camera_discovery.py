@@ -0,0 +1,39 @@
+import json
+
+import cv2
+import pytest
+
+from camera_discovery import camera_label, load_camera_cache, save_camera_cache
+
+CAMERA = {'index': 1, 'backend': cv2.CAP_V4L2, 'width': 640, 'height': 480, 'fps': 30}
+
+
+def write_cache(path, cameras):
+    path.write_text(json.dumps({'scanned_at': 0, 'cameras': cameras}))
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'cameras.json')
+    save_camera_cache([CAMERA], path)
+    cameras = load_camera_cache(path)
+    assert cameras == [CAMERA]
+    assert camera_label(cameras[0]) == 'Camera 1 (640x480@30fps) [V4L2]'
+
+
+@pytest.mark.parametrize('cameras', [
+    [{'index': 1, 'backend': cv2.CAP_V4L2}],
+    [CAMERA, dict(CAMERA, fps='30')],
+    [CAMERA, None],
+    'not a list',
+])
+def test_entries_with_missing_or_malformed_fields_are_a_cache_miss(tmp_path, cameras):
+    path = tmp_path / 'cameras.json'
+    write_cache(path, cameras)
+    assert load_camera_cache(str(path)) == []
+
+
+def test_missing_or_corrupt_file_is_a_cache_miss(tmp_path):
+    assert load_camera_cache(str(tmp_path / 'missing.json')) == []
+    path = tmp_path / 'cameras.json'
+    path.write_text('{not json')
+    assert load_camera_cache(str(path)) == []
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from cascade_matcher import CascadeMatcher
+from face_matcher import FaceMatcher
+
+
+def test_same_top1_and_similarity_as_full_matching(faces, probes):
+    full = FaceMatcher(faces).best_matches(probes, threshold=0.4)
+    cascade = CascadeMatcher(faces, k=3).best_matches(probes, threshold=0.4)
+    assert [idx for idx, _ in cascade] == [idx for idx, _ in full]
+    for (_, a), (_, b) in zip(cascade, full):
+        assert a == pytest.approx(b, abs=1e-5)
+
+
+def test_clear_coarse_lead_is_accepted_without_reranking(faces, probes):
+    matcher = CascadeMatcher(faces, k=5, accept_margin=0.0)
+    matcher.best_matches(probes)
+    assert matcher.stats == {'rejected': 0, 'accepted': len(probes), 'reranked': 0}
+
+
+def test_without_a_clear_lead_the_top_k_are_reranked(faces, probes):
+    matcher = CascadeMatcher(faces, k=5, accept_margin=2.0)
+    assert [idx for idx, _ in matcher.best_matches(probes)] == list(range(len(faces)))
+    assert matcher.stats['reranked'] == len(probes)
+
+
+def test_low_coarse_score_is_rejected_early(faces, rng):
+    matcher = CascadeMatcher(faces, reject_below=0.5)
+    noise = rng.integers(0, 256, (100, 100), dtype=np.uint8)
+    assert matcher.best_matches([noise], threshold=0.0) == [(None, 0.0)]
+    assert matcher.stats['rejected'] == 1
+
+
+def test_threshold_edge_cases(faces, probes):
+    matcher = CascadeMatcher(faces, k=50)
+    assert matcher.best_matches([]) == []
+    assert matcher.best_matches(probes[:1], threshold=1.01) == [(None, 0.0)]
+    assert CascadeMatcher(np.zeros((0, 100, 100), np.uint8)).best_matches(probes[:2]) == [(None, 0.0)] * 2
+    assert CascadeMatcher(faces[:1]).best_match(probes[0])[0] == 0
@@ -0,0 +1,45 @@
+import numpy as np
+
+from embedding_index import BruteForceIndex, IVFIndex
+
+
+def encodings(rng, students=50, per_student=2):
+    centers = rng.normal(0, 0.09, (students, 128))
+    vectors = np.repeat(centers, per_student, axis=0) + rng.normal(0, 0.01, (students * per_student, 128))
+    return vectors.astype(np.float32), np.repeat(np.arange(1, students + 1), per_student)
+
+
+def test_brute_force_returns_distinct_students_nearest_first(rng):
+    vectors, ids = encodings(rng)
+    index = BruteForceIndex()
+    index.add(vectors, ids)
+    matches = index.search(vectors[10], k=3)[0]
+    assert matches[0][0] == ids[10]
+    assert len({sid for sid, _ in matches}) == 3
+    assert [d for _, d in matches] == sorted(d for _, d in matches)
+
+
+def test_ivf_agrees_with_brute_force_on_enrolled_faces(rng):
+    vectors, ids = encodings(rng)
+    brute, ivf = BruteForceIndex(), IVFIndex(nlist=8, nprobe=8)
+    brute.add(vectors, ids)
+    ivf.add(vectors, ids)
+    queries = vectors[::7] + rng.normal(0, 0.005, vectors[::7].shape).astype(np.float32)
+    assert [m[0][0] for m in ivf.search(queries)] == [m[0][0] for m in brute.search(queries)]
+
+
+def test_ivf_searches_everything_when_probed_lists_are_empty(rng):
+    vectors, ids = encodings(rng, students=20)
+    index = IVFIndex(nlist=4, nprobe=1)
+    index.add(vectors, ids)
+    # A cluster that holds no encodings, nearest to the query
+    far = np.full((1, 128), 5.0, dtype=np.float32)
+    index.centroids = np.vstack([index.centroids, far])
+    index.order = None
+    matches = index.search(far[0], k=2)[0]
+    assert len(matches) == 2
+
+
+def test_empty_index_returns_no_matches():
+    assert IVFIndex().search(np.zeros(128, np.float32)) == [[]]
+    assert BruteForceIndex().search(np.zeros(128, np.float32)) == [[]]
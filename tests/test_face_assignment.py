@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import face_assignment
+from face_assignment import assign_faces, candidate_matrix, distance_matrix, match_faces, per_label
+
+
+@pytest.fixture(params=['hungarian', 'greedy'])
+def solver(request, monkeypatch):
+    if request.param == 'greedy':
+        monkeypatch.setattr(face_assignment, 'linear_sum_assignment', None)
+    elif face_assignment.linear_sum_assignment is None:
+        pytest.skip('scipy is not installed')
+    return request.param
+
+
+def test_distance_matrix_is_euclidean(rng):
+    faces, known = rng.normal(size=(3, 128)), rng.normal(size=(5, 128))
+    expected = np.linalg.norm(faces[:, None, :] - known[None, :, :], axis=2)
+    assert np.allclose(distance_matrix(faces, known), expected)
+    assert distance_matrix([], known).shape == (0, 5)
+
+
+def test_per_label_keeps_each_students_closest_encoding():
+    distances = np.array([[0.5, 0.2, 0.9], [0.1, 0.8, 0.7]])
+    labels, collapsed = per_label(distances, ['a', 'a', 'b'])
+    assert labels == ['a', 'b']
+    assert np.array_equal(collapsed, [[0.2, 0.9], [0.1, 0.7]])
+
+
+def test_candidate_matrix_fills_missing_pairs_with_inf():
+    labels, distances = candidate_matrix([[(7, 0.3), (8, 0.5)], [(8, 0.2)]])
+    assert labels == [7, 8]
+    assert distances[1, 0] == np.inf and distances[1, 1] == 0.2
+
+
+def test_no_student_is_claimed_twice(solver):
+    # Both faces are closest to student 0; the second face must fall back to student 1
+    distances = np.array([[0.30, 0.50], [0.35, 0.40]])
+    assignment = assign_faces(distances, tolerance=0.6)
+    assert sorted(assignment) == [0, 1]
+
+
+def test_faces_beyond_tolerance_stay_unassigned(solver):
+    distances = np.array([[0.2, 0.9], [0.3, 0.95]])
+    assert assign_faces(distances, tolerance=0.6) == [0, None]
+    assert assign_faces(np.zeros((2, 0)), tolerance=0.6) == [None, None]
+
+
+def test_match_faces_returns_labels_and_distances(rng):
+    known = rng.normal(0, 0.09, (4, 128))
+    faces = known[[2, 0]] + rng.normal(0, 0.005, (2, 128))
+    results = match_faces(faces, known, ['s1', 's2', 's3', 's4'], tolerance=0.6)
+    assert [label for label, _ in results] == ['s3', 's1']
+    assert all(distance < 0.6 for _, distance in results)
@@ -0,0 +1,52 @@
+import argparse
+
+import numpy as np
+import pytest
+
+import face_detector
+from face_detector import CASCADE_WINDOW, FrameDetector, add_detection_arguments, expected_face_px
+
+
+@pytest.mark.parametrize('scale', [0, -0.5, 1.5])
+def test_scale_outside_unit_interval_is_rejected(scale):
+    with pytest.raises(ValueError):
+        FrameDetector(scale)
+
+
+def test_detect_scale_argument_is_validated():
+    parser = argparse.ArgumentParser()
+    add_detection_arguments(parser)
+    assert parser.parse_args(['--detect_scale', '0.5']).detect_scale == 0.5
+    with pytest.raises(SystemExit):
+        parser.parse_args(['--detect_scale', '0'])
+    with pytest.raises(SystemExit):
+        parser.parse_args(['--detect_scale', '2'])
+
+
+def test_expected_face_size_shrinks_with_distance():
+    near, far = expected_face_px(640, 1.0), expected_face_px(640, 3.0)
+    assert near == pytest.approx(3 * far)
+    # 60 degree lens, 640 px wide: focal length ~554 px, a 15 cm face at 1 m ~83 px
+    assert near == pytest.approx(83.1, abs=0.5)
+
+
+def test_size_limits_never_go_below_the_cascade_window():
+    min_size, max_size = FrameDetector(scale=0.25).size_limits(640)
+    assert min_size == (CASCADE_WINDOW, CASCADE_WINDOW) and max_size is None
+    min_size, max_size = FrameDetector(scale=0.5, distance_m=1.0).size_limits(640)
+    assert min_size[0] >= CASCADE_WINDOW and max_size[0] > min_size[0]
+
+
+def test_boxes_are_mapped_back_to_full_resolution(monkeypatch):
+    seen = {}
+
+    def fake_detect(small, profile, **overrides):
+        seen['shape'] = small.shape
+        return [(10, 20, 30, 30)]
+
+    monkeypatch.setattr(face_detector, 'detect_faces', fake_detect)
+    detector = FrameDetector(scale=0.5)
+    boxes = detector.detect(np.zeros((480, 640), np.uint8))
+    assert seen['shape'] == (240, 320)
+    assert boxes == [(20, 40, 60, 60)]
+    assert detector.detection_ms > 0
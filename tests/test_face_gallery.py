@@ -0,0 +1,118 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import face_gallery
+
+
+@pytest.fixture
+def extracted(monkeypatch):
+    """Replace face detection with a fixed ROI per file and record which files were processed"""
+    calls = []
+
+    def fake_extract(image_path):
+        calls.append(os.path.basename(image_path))
+        if 'noface' in image_path:
+            return None
+        value = int(cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)[0, 0])
+        return np.full(face_gallery.FACE_SIZE[::-1], value, dtype=np.uint8)
+
+    monkeypatch.setattr(face_gallery, '_extract_face_roi', fake_extract)
+    return calls
+
+
+def write_photo(path, value):
+    cv2.imwrite(str(path), np.full((40, 40), value, dtype=np.uint8))
+
+
+def test_second_load_is_served_from_cache(tmp_path, extracted):
+    photos = tmp_path / 'profiles'
+    photos.mkdir()
+    write_photo(photos / '1.png', 10)
+    write_photo(photos / '2.png', 20)
+    write_photo(photos / 'noface.png', 30)
+    cache = str(tmp_path / 'cache.npz')
+
+    faces, names, student_ids = face_gallery.load_gallery(str(photos), cache)
+    assert sorted(extracted) == ['1.png', '2.png', 'noface.png']
+    assert sorted(student_ids) == [1, 2]
+    assert faces.shape == (2, 100, 100)
+
+    extracted.clear()
+    cached_faces, cached_names, _ = face_gallery.load_gallery(str(photos), cache)
+    assert extracted == []
+    assert cached_names == names
+    assert np.array_equal(cached_faces, faces)
+
+
+def test_changed_added_and_removed_photos_invalidate_their_entries(tmp_path, extracted):
+    photos = tmp_path / 'profiles'
+    photos.mkdir()
+    write_photo(photos / '1.png', 10)
+    write_photo(photos / '2.png', 20)
+    cache = str(tmp_path / 'cache.npz')
+    face_gallery.load_gallery(str(photos), cache)
+
+    extracted.clear()
+    write_photo(photos / '1.png', 99)
+    st = os.stat(photos / '1.png')
+    # Make sure the modification time differs even on coarse-grained filesystems
+    os.utime(photos / '1.png', ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    write_photo(photos / '3.png', 30)
+    os.remove(photos / '2.png')
+
+    faces, names, _ = face_gallery.load_gallery(str(photos), cache)
+    assert sorted(extracted) == ['1.png', '3.png']
+    by_name = dict(zip(names, faces))
+    assert sorted(by_name) == ['1', '3']
+    assert by_name['1'][0, 0] == 99
+    assert set(face_gallery.read_cache(cache)) == {'1.png', '3.png'}
+
+
+def test_cache_from_another_version_is_ignored(tmp_path, extracted, monkeypatch):
+    photos = tmp_path / 'profiles'
+    photos.mkdir()
+    write_photo(photos / '1.png', 10)
+    cache = str(tmp_path / 'cache.npz')
+    face_gallery.load_gallery(str(photos), cache)
+
+    monkeypatch.setattr(face_gallery, 'GALLERY_CACHE_VERSION', face_gallery.GALLERY_CACHE_VERSION + 1)
+    assert face_gallery.read_cache(cache) == {}
+    extracted.clear()
+    face_gallery.load_gallery(str(photos), cache)
+    assert extracted == ['1.png']
+
+
+def test_student_gallery_reads_only_that_students_rows(tmp_path, extracted):
+    photos = tmp_path / 'profiles'
+    photos.mkdir()
+    for sid in range(1, 6):
+        write_photo(photos / f'{sid}.png', sid * 10)
+    cache = str(tmp_path / 'cache.npz')
+    face_gallery.load_gallery(str(photos), cache)
+
+    extracted.clear()
+    faces, names, student_ids = face_gallery.load_student_gallery(4, str(photos), cache)
+    assert extracted == []
+    assert names == ['4'] and student_ids == [4]
+    assert faces[0][0, 0] == 40
+    assert face_gallery.load_student_gallery(42, str(photos), cache)[1] == []
+
+
+def test_student_gallery_matches_profile_uploads_once(tmp_path, extracted):
+    photos = tmp_path / 'profiles'
+    photos.mkdir()
+    write_photo(photos / '4.png', 40)
+    write_photo(photos / 'profile_4_1700000000.jpg', 41)
+    write_photo(photos / 'profile_14_1700000000.png', 140)
+    os.symlink(photos / '4.png', photos / '4.PNG')
+    cache = str(tmp_path / 'cache.npz')
+
+    faces, names, student_ids = face_gallery.load_student_gallery(4, str(photos), cache)
+    assert names == ['4', 'profile_4_1700000000']
+    assert student_ids == [4, 4]
+    assert [face[0, 0] for face in faces] == [40, 41]
+    # 4.png and its 4.PNG link are one photo
+    assert len(extracted) == 2 and 'profile_4_1700000000.jpg' in extracted
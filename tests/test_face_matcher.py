@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from face_matcher import FaceMatcher, normalize_faces
+from recognize_face import compare_faces
+
+
+def test_scores_match_compare_faces(faces, probes):
+    matcher = FaceMatcher(faces)
+    scores = matcher.score(probes[:4])
+    for i, probe in enumerate(probes[:4]):
+        for j, face in enumerate(faces):
+            _, similarity = compare_faces(probe, face)
+            assert scores[i, j] == pytest.approx(similarity, abs=1e-4)
+
+
+def test_best_matches_find_each_identity(faces, probes):
+    matcher = FaceMatcher(faces, list(range(100, 112)), [f's{i}' for i in range(12)])
+    results = matcher.best_matches(probes, threshold=0.4)
+    assert [idx for idx, _ in results] == list(range(12))
+    assert all(similarity > 0.4 for _, similarity in results)
+
+
+def test_threshold_and_empty_inputs(faces, probes):
+    matcher = FaceMatcher(faces)
+    assert matcher.best_matches(probes[:2], threshold=1.01) == [(None, 0.0), (None, 0.0)]
+    assert matcher.best_matches([]) == []
+    assert FaceMatcher(np.zeros((0, 100, 100), np.uint8)).best_match(probes[0]) == (None, 0.0)
+
+
+def test_flat_image_correlates_with_nothing():
+    row = normalize_faces([np.full((100, 100), 128, np.uint8)])[0]
+    assert not row.any()
+
+
+def test_verify_scores_only_the_expected_student(faces, probes):
+    ids = [1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6]
+    matcher = FaceMatcher(faces, ids)
+    idx, similarity = matcher.verify(probes[3], 2)
+    assert idx == 3 and similarity > 0.4
+    other, other_similarity = matcher.verify(probes[3], 5, threshold=0.0)
+    assert other in (8, 9) and other_similarity < similarity
+    assert matcher.verify(probes[3], 5, threshold=similarity) == (None, 0.0)
+    assert matcher.verify(probes[3], 99) == (None, 0.0)
+
+
+def test_top_k_is_sorted_by_similarity(faces, probes):
+    matcher = FaceMatcher(faces, list(range(12)), [str(i) for i in range(12)])
+    top = matcher.top_k(probes[:1], k=3)[0]
+    assert len(top) == 3
+    assert top[0][0] == 0
+    assert [s for _, _, s in top] == sorted((s for _, _, s in top), reverse=True)
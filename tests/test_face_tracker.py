@@ -0,0 +1,53 @@
+import pytest
+
+from face_tracker import FaceTracker, box_iou
+
+
+def test_box_iou():
+    assert box_iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert box_iou((0, 0, 10, 10), (20, 20, 10, 10)) == 0.0
+    assert box_iou((0, 0, 10, 10), (5, 0, 10, 10)) == pytest.approx(50 / 150)
+
+
+def test_overlapping_detections_keep_their_track():
+    tracker = FaceTracker()
+    first = tracker.update([(100, 100, 50, 50), (300, 100, 50, 50)])
+    ids = {track.box: track.track_id for track in first}
+    moved = tracker.update([(305, 102, 50, 50), (104, 98, 50, 50)])
+    assert {track.box: track.track_id for track in moved} == {
+        (104, 98, 50, 50): ids[(100, 100, 50, 50)],
+        (305, 102, 50, 50): ids[(300, 100, 50, 50)],
+    }
+
+
+def test_tracks_are_dropped_after_max_missed():
+    tracker = FaceTracker(max_missed=2)
+    track_id = tracker.update([(0, 0, 40, 40)])[0].track_id
+    tracker.update([])
+    tracker.update([])
+    # Still remembered while missed <= max_missed, so the face resumes its track
+    assert tracker.update([(2, 2, 40, 40)])[0].track_id == track_id
+    for _ in range(3):
+        tracker.update([])
+    assert tracker.tracks == []
+    assert tracker.update([(2, 2, 40, 40)])[0].track_id != track_id
+
+
+def test_only_new_or_uncertain_tracks_need_identification():
+    tracker = FaceTracker(confident_similarity=0.55)
+    confident, uncertain, unknown = tracker.update([(0, 0, 40, 40), (100, 0, 40, 40), (200, 0, 40, 40)])
+    tracker.set_identity(confident, 'alice', 1, 0.8)
+    tracker.set_identity(uncertain, 'bob', 2, 0.45)
+    tracker.set_identity(unknown, None, None, 0.2)
+    pending = tracker.needs_identification()
+    assert confident not in pending
+    assert uncertain in pending and unknown in pending
+
+
+def test_identity_keeps_the_most_confident_match():
+    tracker = FaceTracker()
+    track = tracker.update([(0, 0, 40, 40)])[0]
+    tracker.set_identity(track, 'alice', 1, 0.7)
+    tracker.set_identity(track, 'bob', 2, 0.5)
+    tracker.set_identity(track, None, None, 0.9)
+    assert (track.name, track.student_id, track.similarity, track.attempts) == ('alice', 1, 0.7, 3)
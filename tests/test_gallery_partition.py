@@ -0,0 +1,65 @@
+from face_matcher import FaceMatcher
+from face_recognition_attendance import AttendanceFaceRecognition
+from gallery_partition import PartitionedMatcher, load_enrolled_student_ids
+
+STUDENT_IDS = list(range(1, 13))
+ENROLLED = {1, 2, 3, 4}
+
+
+def test_matches_only_enrolled_students_and_returns_gallery_indices(faces, probes):
+    matcher = PartitionedMatcher(FaceMatcher(faces, STUDENT_IDS), ENROLLED)
+    assert len(matcher) == 4
+    results = matcher.best_matches(probes[:4])
+    assert [idx for idx, _ in results] == [0, 1, 2, 3]
+    # An outsider can only come back as an enrolled student (or no match)
+    idx, _ = matcher.best_match(probes[8])
+    assert idx is None or STUDENT_IDS[idx] in ENROLLED
+
+
+def test_campus_fallback_reports_who_an_outsider_is(faces, probes):
+    full = FaceMatcher(faces, STUDENT_IDS)
+    matcher = PartitionedMatcher(full, ENROLLED, fallback=True, confident_similarity=0.99)
+    assert matcher.best_match(probes[8])[0] == 8
+    assert matcher.fallback_probes == 1
+
+
+def test_confident_in_class_matches_skip_the_fallback(faces, probes):
+    matcher = PartitionedMatcher(FaceMatcher(faces, STUDENT_IDS), ENROLLED, fallback=True, confident_similarity=0.0)
+    matcher.best_matches(probes[:4])
+    assert matcher.fallback_probes == 0
+
+
+def test_load_enrolled_student_ids_passes_the_session():
+    class Cursor:
+        def execute(self, query, params):
+            self.params = params
+
+        def fetchall(self):
+            return [(3,), (5,), (3,)]
+
+        def close(self):
+            pass
+
+    class Connection:
+        def cursor(self):
+            self.cur = Cursor()
+            return self.cur
+
+    conn = Connection()
+    assert load_enrolled_student_ids(conn, '12') == {3, 5}
+    assert conn.cur.params == (12,)
+
+
+def test_queue_attendance_skips_outsiders_and_duplicates():
+    submitted = []
+
+    class Writer:
+        def submit(self, student_id, confidence):
+            submitted.append(student_id)
+
+    system = AttendanceFaceRecognition(session_instance_id=12)
+    system.attendance_writer = Writer()
+    system.enrolled_student_ids = ENROLLED
+    for student_id in (1, 9, 1, 2):
+        system.queue_attendance(student_id, 0.8)
+    assert submitted == [1, 2]
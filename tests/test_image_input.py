@@ -0,0 +1,63 @@
+import base64
+
+import cv2
+import numpy as np
+import pytest
+
+from image_input import decode_probe_bytes, image_size, read_probe, reduced_decode_flag
+
+
+@pytest.fixture
+def image():
+    img = np.zeros((120, 200, 3), dtype=np.uint8)
+    cv2.circle(img, (100, 60), 40, (40, 160, 220), -1)
+    return img
+
+
+def encode(image, ext):
+    ok, buf = cv2.imencode(ext, image)
+    assert ok
+    return buf.tobytes()
+
+
+@pytest.mark.parametrize('ext', ['.png', '.jpg'])
+def test_image_size_reads_the_header(image, ext):
+    assert tuple(image_size(encode(image, ext))) == (200, 120)
+
+
+def test_image_size_of_non_images():
+    assert image_size(b'not an image') is None
+    assert image_size(b'\xff\xd8\x00') is None
+
+
+def test_raw_bytes_base64_and_data_url_decode_alike(image):
+    raw = encode(image, '.png')
+    text = base64.b64encode(raw).decode('ascii')
+    expected = cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_COLOR)
+    for decoded in (read_probe(image_bytes=raw),
+                    read_probe(image_base64=text),
+                    read_probe(image_base64='data:image/png;base64,' + text),
+                    decode_probe_bytes(text.encode('ascii'))):
+        assert np.array_equal(decoded, expected)
+
+
+def test_read_probe_from_path(image, tmp_path):
+    path = tmp_path / 'probe.png'
+    cv2.imwrite(str(path), image)
+    assert read_probe(image_path=str(path)).shape == image.shape
+    assert read_probe(image_path=str(tmp_path / 'missing.png')) is None
+
+
+def test_invalid_inputs_return_none():
+    assert read_probe() is None
+    assert read_probe(image_bytes=b'\x00\x01garbage') is None
+    assert read_probe(image_base64='***') is None
+
+
+def test_reduced_decode_keeps_at_least_max_side():
+    big = encode(np.zeros((1000, 1600, 3), np.uint8), '.jpg')
+    assert reduced_decode_flag(big, 0) == cv2.IMREAD_COLOR
+    assert reduced_decode_flag(big, 200) == cv2.IMREAD_REDUCED_COLOR_8
+    assert reduced_decode_flag(big, 400) == cv2.IMREAD_REDUCED_COLOR_4
+    assert reduced_decode_flag(big, 1000) == cv2.IMREAD_COLOR
+    assert read_probe(image_bytes=big, max_side=400).shape[:2] == (250, 400)
@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+import lbph_backend
+import recognize_face
+from face_gallery import student_id_from_filename
+from face_matcher import FaceMatcher
+from lbph_backend import LBPH_FACE_SIZE, LBPHMatcher, load_lbph_matcher, prepare_faces
+
+BOXES = [(20, 30, 100, 100), (150, 40, 100, 100)]
+
+
+def paste(faces):
+    """A 300x200 grayscale 'frame' with two faces pasted at BOXES"""
+    gray = np.full((200, 300), 90, np.uint8)
+    for face, (x, y, w, h) in zip(faces, BOXES):
+        gray[y:y+h, x:x+w] = face
+    return gray
+
+
+@pytest.fixture
+def frame(faces):
+    return paste(faces)
+
+
+@pytest.fixture
+def probe_frame(probes):
+    """Another capture of the same two people"""
+    return paste(probes)
+
+
+@pytest.fixture
+def recognizer(frame):
+    # Small radius/neighbours keep the model tiny; preprocessing is what is under test
+    model = cv2.face.LBPHFaceRecognizer_create(radius=1, neighbors=8, grid_x=8, grid_y=8)
+    model.train(prepare_faces(frame, BOXES), np.array([0, 1]))
+    return model
+
+
+def test_prepare_faces_follows_the_training_order(frame):
+    # train_lbph.face_samples: equalize the whole image, crop, then resize to 200x200
+    equalized = cv2.equalizeHist(frame)
+    expected = [cv2.resize(equalized[y:y+h, x:x+w], LBPH_FACE_SIZE) for (x, y, w, h) in BOXES]
+    prepared = prepare_faces(frame, BOXES)
+    assert all(np.array_equal(a, b) for a, b in zip(prepared, expected))
+    assert prepare_faces(frame, []) == []
+
+
+def test_model_cut_off_is_distance_not_caller_threshold(probe_frame, recognizer):
+    probes = prepare_faces(probe_frame, BOXES)
+    distances = [recognizer.predict(probe)[1] for probe in probes]
+    assert min(distances) > 0
+
+    # Accepted by distance even though every confidence is below the caller's threshold
+    with LBPHMatcher(recognizer, {0: 11, 1: 12}, max_distance=max(distances), workers=1) as matcher:
+        results = matcher.best_matches(probes, threshold=0.99)
+        assert [idx for idx, _ in results] == [0, 1]
+        assert all(0.5 <= confidence < 0.99 for _, confidence in results)
+        assert matcher.student_ids == [11, 12]
+    with LBPHMatcher(recognizer, {0: 11, 1: 12}, max_distance=min(distances) / 2, workers=1) as strict:
+        assert strict.best_matches(probes, threshold=0.0) == [(None, 0.0), (None, 0.0)]
+
+
+def test_rows_are_trained_students_named_from_profile_uploads(monkeypatch, faces, probe_frame, recognizer):
+    # Uploads are profile_<id>_<ts>.png; one photo carries no student ID at all
+    names = ['profile_11_1700000000', 'profile_12_1700000001', 'guest']
+    student_ids = [student_id_from_filename(name) for name in names]
+    monkeypatch.setattr(recognize_face, 'load_gallery', lambda *a, **k: (faces[:3], names, student_ids))
+    monkeypatch.setattr(recognize_face, 'load_lbph_matcher',
+                        lambda names_by_student: LBPHMatcher(recognizer, {0: 11, 1: 12}, None, names_by_student,
+                                                             max_distance=1000, workers=1))
+
+    system = recognize_face.RobustFaceRecognition(backend='lbph')
+    system.load_reference_faces()
+    matcher = system.matcher
+    assert len(matcher) == 2
+    assert matcher.student_ids == [11, 12]
+    assert matcher.names == names[:2]
+    results = matcher.best_matches(matcher.face_rois(probe_frame, BOXES))
+    assert [matcher.student_ids[idx] for idx, _ in results] == [11, 12]
+
+
+def test_centroid_fallback_applies_the_threshold():
+    class Centroids:
+        class store:
+            student_ids = [5, 6]
+
+        def nearest(self, probes):
+            return [[(5, 0.7)], [(6, 0.3)]]
+
+    matcher = LBPHMatcher(centroids=Centroids())
+    probes = [np.zeros(LBPH_FACE_SIZE[::-1], np.uint8)] * 2
+    assert matcher.best_matches(probes, threshold=0.4) == [(0, 0.7), (None, 0.0)]
+
+
+def test_concurrent_predictions_share_one_pool_and_close_is_safe(frame, recognizer):
+    matcher = LBPHMatcher(recognizer, {0: 11, 1: 12}, workers=2)
+    pool = matcher.pool
+    assert pool is not None
+    probes = matcher.face_rois(frame, BOXES)
+    with ThreadPoolExecutor(4) as callers:
+        results = list(callers.map(lambda _: matcher.best_matches(probes), range(8)))
+    assert matcher.pool is pool
+    assert all([idx for idx, _ in r] == [0, 1] for r in results)
+
+    matcher.close()
+    matcher.close()
+    assert matcher.pool is None
+    # Still usable after close, on the calling thread
+    assert [idx for idx, _ in matcher.best_matches(probes)] == [0, 1]
+
+
+def test_unreadable_centroids_fall_back_to_template_matching(monkeypatch, tmp_path, faces):
+    def mismatched():
+        raise ValueError("Centroid index does not match")
+
+    monkeypatch.setattr(lbph_backend, 'load_centroids', mismatched)
+    missing = str(tmp_path / 'missing')
+    assert load_lbph_matcher(model_path=missing, labels_path=missing) is None
+
+    monkeypatch.setattr(recognize_face, 'load_gallery', lambda *a, **k: (faces[:2], ['11', '12'], [11, 12]))
+    monkeypatch.setattr(recognize_face, 'load_lbph_matcher', lambda names_by_student: load_lbph_matcher(
+        names_by_student, model_path=missing, labels_path=missing))
+    system = recognize_face.RobustFaceRecognition(backend='lbph')
+    system.load_reference_faces()
+    assert isinstance(system.matcher, FaceMatcher)
@@ -0,0 +1,81 @@
+from datetime import datetime, time, timedelta
+
+import pytest
+
+from session_resolver import DAY_SESSIONS_QUERY, SessionResolver
+
+DAY = datetime(2024, 3, 4)
+
+
+def at(hour, minute=0, second=0, day=DAY):
+    return day.replace(hour=hour, minute=minute, second=second)
+
+
+class Database:
+    """Connection factory whose cursor returns today's (student, session, start, end) rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def get_connection(self):
+        return self
+
+    def cursor(self):
+        return self
+
+    def execute(self, query):
+        assert query == DAY_SESSIONS_QUERY
+        self.queries += 1
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def db():
+    # MySQL returns TIME columns as timedelta; datetime.time is accepted as well
+    return Database([
+        (1, 100, timedelta(hours=9), timedelta(hours=10)),
+        (1, 101, timedelta(hours=11), timedelta(hours=12)),
+        (2, 100, time(9, 0), time(10, 0)),
+    ])
+
+
+def test_students_resolve_to_the_session_in_progress(db):
+    resolver = SessionResolver(db.get_connection)
+    assert resolver.resolve_many([1, 2, 3], now=at(9, 30)) == {1: 100, 2: 100}
+    assert resolver.resolve(1, now=at(9, 30, 30)) == 100
+    assert resolver.resolve(3, now=at(9, 30, 40)) is None
+    assert db.queries == 1
+
+
+def test_crossing_a_session_boundary_reloads_the_map(db):
+    resolver = SessionResolver(db.get_connection, ttl_seconds=3600)
+    resolver.refresh(now=at(9, 50))
+    assert resolver.resolve_many([1], now=at(9, 55)) == {1: 100}
+    assert db.queries == 1
+
+    # A lecturer started an extra session; the 10:00 end boundary picks it up
+    db.rows = db.rows + [(3, 102, timedelta(hours=10), timedelta(hours=11))]
+    assert resolver.resolve_many([3], now=at(10, 0, 30)) == {3: 102}
+    assert db.queries == 2
+
+
+def test_map_is_reloaded_after_the_ttl(db):
+    resolver = SessionResolver(db.get_connection)
+    resolver.refresh(now=at(9, 10))
+    resolver.resolve_many([1], now=at(9, 10, 59))
+    assert db.queries == 1
+    resolver.resolve_many([1], now=at(9, 11))
+    assert db.queries == 2
+
+
+def test_a_new_day_reloads_the_map(db):
+    resolver = SessionResolver(db.get_connection, ttl_seconds=10 ** 6)
+    resolver.refresh(now=at(23, 0))
+    assert not resolver.needs_refresh(at(23, 30))
+    assert resolver.needs_refresh(at(8, 0, day=DAY + timedelta(days=1)))
@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+import attendance_writer
+import video_attendance
+from video_attendance import merge_sightings, process_chunk, split_chunks, write_attendance
+
+
+def test_chunks_cover_every_frame_once():
+    chunks = split_chunks(frame_count=1000, fps=25, chunk_seconds=10)
+    assert chunks[0] == (0, 250)
+    assert chunks[-1] == (750, 1000)
+    assert sum(end - start for start, end in chunks) == 1000
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+
+
+def test_last_chunk_is_shortened_and_tiny_chunks_are_one_frame():
+    assert split_chunks(frame_count=260, fps=25, chunk_seconds=10) == [(0, 250), (250, 260)]
+    assert split_chunks(frame_count=3, fps=25, chunk_seconds=0.001) == [(0, 1), (1, 2), (2, 3)]
+    assert split_chunks(frame_count=0, fps=25) == []
+
+
+def test_merge_keeps_earliest_sighting_best_similarity_and_total_count():
+    merged = merge_sightings([
+        {1: (120.0, 0.61, 2), 2: (30.0, 0.70, 1)},
+        {1: (60.0, 0.55, 3)},
+        {},
+    ])
+    assert merged == {1: (60.0, 0.61, 5), 2: (30.0, 0.70, 1)}
+
+
+def fake_writer(monkeypatch):
+    written = []
+
+    class FakeWriter:
+        def __init__(self, db_config, session_instance_id):
+            self.session_instance_id = session_instance_id
+
+        def write(self, events):
+            written.extend(events)
+            return events, []
+
+    monkeypatch.setattr(attendance_writer, 'AttendanceWriter', FakeWriter)
+    return written
+
+
+def test_only_students_seen_often_enough_are_written(monkeypatch):
+    written = fake_writer(monkeypatch)
+    start = datetime(2024, 3, 4, 9, 0, 0)
+    write_attendance({}, 12, {1: (90.0, 0.6, 3), 2: (10.0, 0.9, 1)}, start, min_sightings=2)
+    assert [(e.student_id, e.seen_at) for e in written] == [(1, datetime(2024, 3, 4, 9, 1, 30))]
+
+
+def test_gallery_rows_without_a_student_id_are_skipped(monkeypatch, tmp_path):
+    path = str(tmp_path / 'lecture.avi')
+    video = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+    for _ in range(4):
+        video.write(np.zeros((48, 64, 3), np.uint8))
+    video.release()
+
+    class Detector:
+        def detect(self, gray):
+            return [(0, 0, 20, 20), (30, 0, 20, 20)]
+
+    class Matcher:
+        def face_rois(self, gray, boxes):
+            return [gray] * len(boxes)
+
+        def best_matches(self, rois, threshold):
+            # Row 0 is a 'profile_<ts>.png' upload without a student ID
+            return [(0, 0.9), (1, 0.7)]
+
+    monkeypatch.setattr(video_attendance, '_worker',
+                        {'matcher': Matcher(), 'student_ids': [None, 5], 'detector': Detector()})
+    seen = process_chunk((path, 0, 4, 10.0, 1))
+    assert list(seen) == [5]
+
+    written = fake_writer(monkeypatch)
+    write_attendance({}, 12, merge_sightings([seen, {5: (0.0, 0.6, 1)}]), datetime(2024, 3, 4, 9), min_sightings=2)
+    assert [e.student_id for e in written] == [5]
@@ -1,67 +1,105 @@
+import argparse
 import os
 import json
+import time
 import cv2
 import numpy as np
+from centroid_store import CENTROIDS_INDEX_PATH, CENTROIDS_NPY_PATH, load_centroids, save_centroids
+from face_detector import detect_largest_face
+from face_gallery import student_id_from_filename
 
 ROOT = os.path.dirname(__file__)
 IMAGES_DIR = os.path.join(ROOT, 'uploads', 'profiles')
 MODEL_PATH = os.path.join(ROOT, 'lbph_model.yml')
 LABELS_PATH = os.path.join(ROOT, 'lbph_labels.json')
-CENTROIDS_PATH = os.path.join(ROOT, 'lbph_centroids.json')
+# Per-image record of what the current model was trained on (for --incremental)
+MANIFEST_PATH = os.path.join(ROOT, 'lbph_manifest.json')
+# Coalescing of concurrent training triggers
+LOCK_PATH = os.path.join(ROOT, 'lbph_train.lock')
+PENDING_PATH = os.path.join(ROOT, 'lbph_train.pending')
+LOCK_STALE_SECONDS = 3600
 
 def detect_face(gray):
-    cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-    face_cascade = cv2.CascadeClassifier(cascade_path)
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(80, 80))
-    if len(faces) == 0:
-        return None
-    x, y, w, h = max(faces, key=lambda f: f[2]*f[3])
-    return gray[y:y+h, x:x+w]
-
-def main():
-    images = []
-    labels = []
-    label_to_student = {}
-    next_label = 0
-
-    if not os.path.isdir(IMAGES_DIR):
-        print('No images directory found at', IMAGES_DIR)
-        return
+    return detect_largest_face(gray, 'training')
 
+def list_images():
+    """Return {filename: (path, mtime_ns, size)} for trainable profile images"""
+    found = {}
     for fname in os.listdir(IMAGES_DIR):
         if not fname.lower().endswith(('.png', '.jpg', '.jpeg')):
             continue
-        # Extract first number in filename as student_id
-        import re
-        m = re.findall(r"\d+", fname)
-        if not m:
+        if student_id_from_filename(fname) is None:
             continue
-        student_id = int(m[0])
         path = os.path.join(IMAGES_DIR, fname)
-        bgr = cv2.imread(path)
-        if bgr is None:
+        try:
+            st = os.stat(path)
+        except OSError:
             continue
-        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
-        # Normalize lighting
-        gray = cv2.equalizeHist(gray)
-        face = detect_face(gray)
-        if face is None:
+        found[fname] = (path, st.st_mtime_ns, st.st_size)
+    return found
+
+def face_samples(path):
+    """Detect the face in one profile image and return its augmented 200x200 samples, or None"""
+    bgr = cv2.imread(path)
+    if bgr is None:
+        return None
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    # Normalize lighting
+    gray = cv2.equalizeHist(gray)
+    face = detect_face(gray)
+    if face is None:
+        return None
+    face = cv2.resize(face, (200, 200))
+    # Augment: original + slight blur + horizontal flip
+    return [face,
+            cv2.GaussianBlur(face, (3,3), 0),
+            cv2.flip(face, 1)]
+
+def write_json_atomic(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def write_model_atomic(recognizer):
+    # OpenCV picks the storage format from the extension, so keep .yml on the temp file
+    tmp_path = os.path.splitext(MODEL_PATH)[0] + '.tmp.yml'
+    recognizer.write(tmp_path)
+    os.replace(tmp_path, MODEL_PATH)
+
+def write_outputs(recognizer, label_to_student, centroids, label_counts, manifest):
+    """Write model, labels, centroids and manifest, each replaced atomically"""
+    write_model_atomic(recognizer)
+    write_json_atomic(LABELS_PATH, label_to_student)
+    labels = sorted(centroids)
+    save_centroids(labels, [label_to_student[str(l)] for l in labels],
+                   np.stack([centroids[l] for l in labels]), [label_counts[l] for l in labels])
+    # Manifest last: if we die before this, the next incremental run falls back to a full retrain
+    write_json_atomic(MANIFEST_PATH, manifest)
+
+def train_full():
+    images = []
+    labels = []
+    label_to_student = {}
+    student_to_label = {}
+    files = {}
+
+    for fname, (path, mtime_ns, size) in list_images().items():
+        student_id = student_id_from_filename(fname)
+        samples = face_samples(path)
+        # Remember faceless images too so incremental runs don't re-detect them
+        files[fname] = {'mtime_ns': mtime_ns, 'size': size, 'label': None}
+        if samples is None:
             continue
-        face = cv2.resize(face, (200, 200))
-        # Augment: original + slight blur + horizontal flip
-        augments = [face,
-                    cv2.GaussianBlur(face, (3,3), 0),
-                    cv2.flip(face, 1)]
-
-        if student_id not in label_to_student.values():
-            label = next_label
+
+        if student_id not in student_to_label:
+            label = len(student_to_label)
+            student_to_label[student_id] = label
             label_to_student[str(label)] = student_id
-            next_label += 1
-        else:
-            # find existing label
-            label = int([k for k, v in label_to_student.items() if v == student_id][0])
+        label = student_to_label[student_id]
+        files[fname]['label'] = label
 
-        for aug in augments:
+        for aug in samples:
             images.append(aug)
             labels.append(label)
 
@@ -71,21 +109,150 @@ def main():
 
     recognizer = cv2.face.LBPHFaceRecognizer_create(radius=2, neighbors=16, grid_x=8, grid_y=8)
     recognizer.train(images, np.array(labels))
-    recognizer.write(MODEL_PATH)
-    with open(LABELS_PATH, 'w', encoding='utf-8') as f:
-        json.dump(label_to_student, f)
 
-    # Also compute simple per-student average face (centroid) for a JSON-only fallback matcher
+    # Also compute simple per-student average face (centroid) for the nearest-centroid fallback matcher
     by_label = {}
     for img, lab in zip(images, labels):
         by_label.setdefault(lab, []).append(img.astype('float32')/255.0)
-    centroids = {str(lab): (np.mean(stack, axis=0)).tolist() for lab, stack in ((lab, np.stack(arr)) for lab, arr in by_label.items())}
-    with open(CENTROIDS_PATH, 'w', encoding='utf-8') as f:
-        json.dump({ 'label_to_student': label_to_student, 'centroids': centroids }, f)
+    centroids = {lab: np.mean(np.stack(arr), axis=0) for lab, arr in by_label.items()}
+    label_counts = {lab: len(arr) for lab, arr in by_label.items()}
 
+    write_outputs(recognizer, label_to_student, centroids, label_counts, {'files': files})
     print('Trained LBPH model with', len(images), 'images for', len(set(labels)), 'students.')
 
-if __name__ == '__main__':
-    main()
+def load_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return None
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def train_incremental():
+    """Add only new profile images to the existing model via LBPHFaceRecognizer.update().
+
+    LBPH cannot forget samples, so a changed or deleted image (or missing
+    artifacts) falls back to a full retrain.
+    """
+    manifest = load_manifest()
+    if manifest is None or not all(os.path.exists(p) for p in (MODEL_PATH, LABELS_PATH, CENTROIDS_NPY_PATH, CENTROIDS_INDEX_PATH)):
+        print('No previous training manifest; running full training.')
+        return train_full()
 
+    files = manifest['files']
+    current = list_images()
+    for fname, entry in files.items():
+        seen = current.get(fname)
+        if seen is None or seen[1] != entry['mtime_ns'] or seen[2] != entry['size']:
+            print('Trained image changed or removed:', fname, '- running full training.')
+            return train_full()
 
+    new_files = sorted(fname for fname in current if fname not in files)
+    if not new_files:
+        print('LBPH model is up to date.')
+        return
+
+    with open(LABELS_PATH, 'r', encoding='utf-8') as f:
+        label_to_student = json.load(f)
+    store = load_centroids(mmap=False)
+    centroids = {label: store.centroid(row) for row, label in enumerate(store.labels)}
+    label_counts = dict(zip(store.labels, store.counts))
+    student_to_label = {v: int(k) for k, v in label_to_student.items()}
+    next_label = max((int(k) for k in label_to_student), default=-1) + 1
+
+    images = []
+    labels = []
+    for fname in new_files:
+        path, mtime_ns, size = current[fname]
+        student_id = student_id_from_filename(fname)
+        samples = face_samples(path)
+        files[fname] = {'mtime_ns': mtime_ns, 'size': size, 'label': None}
+        if samples is None:
+            continue
+
+        if student_id not in student_to_label:
+            student_to_label[student_id] = next_label
+            label_to_student[str(next_label)] = student_id
+            next_label += 1
+        label = student_to_label[student_id]
+        files[fname]['label'] = label
+
+        # Fold the new samples into the running per-label mean
+        n = label_counts.get(label, 0)
+        total = np.stack([img.astype('float32')/255.0 for img in samples]).sum(axis=0)
+        if n:
+            total += centroids[label] * n
+        centroids[label] = total / (n + len(samples))
+        label_counts[label] = n + len(samples)
+
+        for aug in samples:
+            images.append(aug)
+            labels.append(label)
+
+    recognizer = cv2.face.LBPHFaceRecognizer_create(radius=2, neighbors=16, grid_x=8, grid_y=8)
+    recognizer.read(MODEL_PATH)
+    if images:
+        recognizer.update(images, np.array(labels))
+
+    write_outputs(recognizer, label_to_student, centroids, label_counts, {'files': files})
+    print('Updated LBPH model with', len(images), 'images from', len(new_files), 'new files.')
+
+def acquire_lock():
+    """Take the training lock; returns False if another run holds it"""
+    try:
+        if time.time() - os.path.getmtime(LOCK_PATH) > LOCK_STALE_SECONDS:
+            os.remove(LOCK_PATH)
+    except OSError:
+        pass
+    try:
+        fd = os.open(LOCK_PATH, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w') as f:
+        f.write(str(os.getpid()))
+    return True
+
+def release_lock():
+    try:
+        os.remove(LOCK_PATH)
+    except OSError:
+        pass
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only train on new profile images (falls back to full training when needed)')
+    args = parser.parse_args()
+
+    if not os.path.isdir(IMAGES_DIR):
+        print('No images directory found at', IMAGES_DIR)
+        return
+
+    train = train_incremental if args.incremental else train_full
+
+    # Coalesce concurrent triggers: while a run holds the lock, later triggers just leave
+    # a pending marker and exit; the running process picks it up and trains once more.
+    if not acquire_lock():
+        open(PENDING_PATH, 'a').close()
+        # The holder may have released the lock between our two checks
+        if not acquire_lock():
+            print('Training already running; queued one pending run.')
+            return
+
+    while True:
+        try:
+            while True:
+                if os.path.exists(PENDING_PATH):
+                    os.remove(PENDING_PATH)
+                train()
+                if not os.path.exists(PENDING_PATH):
+                    break
+        finally:
+            release_lock()
+        # A trigger may have queued a run after our last check but before the release
+        if not os.path.exists(PENDING_PATH) or not acquire_lock():
+            break
+
+if __name__ == '__main__':
+    main()
@@ -52,11 +52,12 @@ $conn = $db->getConnection();
 $stmt = $conn->prepare('UPDATE users SET profile_image = :img, updated_at = CURRENT_TIMESTAMP WHERE id = :id AND user_type = "student"');
 $stmt->execute(['img' => $filename, 'id' => $student_id]);
 
-// Retrain LBPH model so recognition includes this new photo (best-effort)
+// Update LBPH model so recognition includes this new photo (best-effort).
+// --incremental only trains on new photos; overlapping triggers are coalesced by train_lbph.py.
 try {
     $venvPython = __DIR__ . DIRECTORY_SEPARATOR . '.venv' . DIRECTORY_SEPARATOR . 'Scripts' . DIRECTORY_SEPARATOR . 'python.exe';
     $python = file_exists($venvPython) ? $venvPython : 'python';
-    $cmd = escapeshellcmd($python) . ' ' . escapeshellarg(__DIR__ . '/train_lbph.py');
+    $cmd = escapeshellcmd($python) . ' ' . escapeshellarg(__DIR__ . '/train_lbph.py') . ' --incremental';
     // Run in background without blocking
     if (strncasecmp(PHP_OS, 'WIN', 3) === 0) {
         pclose(popen('start /B ' . $cmd, 'r'));
@@ -0,0 +1,226 @@
+"""
+Attendance from a recorded lecture video.
+
+The video is split into fixed-length time chunks that are decoded and
+scanned by a process pool; each worker seeks to its chunk, samples frames at
+--sample_fps, detects faces and matches them against the gallery. The
+per-chunk first-seen timestamps are merged per student and written for the
+given session_instance_id in one batch, so an hour of footage takes about
+duration / (workers x speed-up from sampling) instead of real time.
+
+    python video_attendance.py lecture.mp4 --session_instance_id 12 [--workers N]
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from datetime import datetime, timedelta
+import cv2
+from face_detector import FrameDetector, add_detection_arguments, detector_from_args
+from face_gallery import PHOTOS_DIR, load_gallery
+from face_matcher import FaceMatcher
+from gallery_partition import PartitionedMatcher, load_enrolled_student_ids
+
+
+MATCH_THRESHOLD = 0.4
+
+# Per-worker state, set by init_worker
+_worker = {}
+
+
+def video_info(path):
+    """(fps, frame_count) of a video file"""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open video {path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return fps, frame_count
+    finally:
+        cap.release()
+
+
+def split_chunks(frame_count, fps, chunk_seconds=60):
+    """[(start_frame, end_frame)) ranges of about chunk_seconds each"""
+    chunk_frames = max(1, int(round(chunk_seconds * fps)))
+    return [(start, min(start + chunk_frames, frame_count)) for start in range(0, frame_count, chunk_frames)]
+
+
+def init_worker(faces, names, student_ids, detector, enrolled=None, campus_fallback=False):
+    # One OpenCV thread per process; the pool provides the parallelism
+    cv2.setNumThreads(1)
+    matcher = FaceMatcher(faces, student_ids, names)
+    if enrolled:
+        matcher = PartitionedMatcher(matcher, enrolled, campus_fallback)
+    _worker['matcher'] = matcher
+    _worker['student_ids'] = student_ids
+    _worker['detector'] = detector
+
+
+def process_chunk(task):
+    """Scan one chunk; returns {student_id: (first_seen_seconds, best_similarity, sightings)}"""
+    path, start, end, fps, step = task
+    matcher = _worker['matcher']
+    student_ids = _worker['student_ids']
+    detector = _worker['detector']
+
+    seen = {}
+    cap = cv2.VideoCapture(path)
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for frame_no in range(start, end):
+            # grab() skips decoding work for frames that are not sampled
+            if not cap.grab():
+                break
+            if (frame_no - start) % step:
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                continue
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            faces = detector.detect(gray)
+            if not faces:
+                continue
+            face_rois = matcher.face_rois(gray, faces)
+            for idx, similarity in matcher.best_matches(face_rois, threshold=MATCH_THRESHOLD):
+                if idx is None:
+                    continue
+                sid = student_ids[idx]
+                # Photos whose name carries no student ID cannot be marked present
+                if sid is None:
+                    continue
+                first, best, count = seen.get(sid, (frame_no / fps, 0.0, 0))
+                seen[sid] = (first, max(best, float(similarity)), count + 1)
+    finally:
+        cap.release()
+    return seen
+
+
+def merge_sightings(chunk_results):
+    """Combine per-chunk results: earliest first-seen, best similarity, total sightings"""
+    merged = {}
+    for seen in chunk_results:
+        for sid, (first, best, count) in seen.items():
+            if sid in merged:
+                m_first, m_best, m_count = merged[sid]
+                merged[sid] = (min(first, m_first), max(best, m_best), m_count + count)
+            else:
+                merged[sid] = (first, best, count)
+    return merged
+
+
+def scan_video(path, detector=None, workers=None, chunk_seconds=60, sample_fps=2.0, photos_dir=PHOTOS_DIR,
+               enrolled=None, campus_fallback=False):
+    """Scan a video in parallel chunks; returns {student_id: (first_seen_seconds, best_similarity, sightings)}.
+
+    With enrolled (a set of student IDs) faces are matched against those students' references only.
+    """
+    fps, frame_count = video_info(path)
+    faces, names, student_ids = load_gallery(photos_dir, verbose=True)
+    if not len(faces):
+        raise ValueError("No reference faces loaded")
+
+    step = max(1, int(round(fps / sample_fps)))
+    chunks = split_chunks(frame_count, fps, chunk_seconds)
+    workers = workers or os.cpu_count() or 1
+    print(f"Scanning {frame_count / fps / 60:.1f} min of video in {len(chunks)} chunk(s) "
+          f"with {workers} worker(s), {fps / step:.1f} sampled frame(s)/s")
+
+    tasks = [(path, start, end, fps, step) for start, end in chunks]
+    results = []
+    start_time = time.time()
+    with multiprocessing.Pool(workers, initializer=init_worker,
+                              initargs=(faces, names, student_ids, detector or FrameDetector(),
+                                        enrolled, campus_fallback)) as pool:
+        for done, seen in enumerate(pool.imap_unordered(process_chunk, tasks), 1):
+            results.append(seen)
+            print(f"[{done}/{len(tasks)}] chunks done, {time.time() - start_time:.0f}s elapsed")
+    return merge_sightings(results)
+
+
+def recording_start_time(path, fps=None, frame_count=None):
+    """Best guess of when the recording started: file modification time minus its duration"""
+    if fps is None or frame_count is None:
+        fps, frame_count = video_info(path)
+    return datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=frame_count / fps)
+
+
+def write_attendance(db_config, session_instance_id, sightings, recording_start, min_sightings=2):
+    """Write one attendance record per student seen at least min_sightings times, in one batch"""
+    from attendance_writer import AttendanceEvent, AttendanceWriter
+    events = [AttendanceEvent(sid, best, recording_start + timedelta(seconds=first))
+              for sid, (first, best, count) in sorted(sightings.items()) if count >= min_sightings]
+    if not events:
+        print("No students recognized often enough to mark attendance.")
+        return [], []
+    writer = AttendanceWriter(db_config, session_instance_id)
+    written, unresolved = writer.write(events)
+    print(f"✓ Attendance written for {len(written)} student(s) in session {session_instance_id}")
+    return written, unresolved
+
+
+def session_enrollment(db_config, session_instance_id):
+    """Enrolled student IDs of the session's class, or None when they cannot be resolved"""
+    import mysql.connector
+    try:
+        conn = mysql.connector.connect(**db_config)
+        try:
+            enrolled = load_enrolled_student_ids(conn, session_instance_id)
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"Could not load enrolled students, matching against the whole gallery: {e}")
+        return None
+    if not enrolled:
+        print(f"No students enrolled for session {session_instance_id}, matching against the whole gallery")
+        return None
+    print(f"Matching against the {len(enrolled)} student(s) enrolled in session {session_instance_id}")
+    return enrolled
+
+
+def run_video_attendance(video_path, session_instance_id, detector=None, workers=None, chunk_seconds=60,
+                         sample_fps=2.0, min_sightings=2, recording_start=None, dry_run=False, campus_fallback=False):
+    from recognize_face import DB_CONFIG
+    enrolled = session_enrollment(DB_CONFIG, session_instance_id)
+    sightings = scan_video(video_path, detector, workers, chunk_seconds, sample_fps,
+                           enrolled=enrolled, campus_fallback=campus_fallback)
+    if recording_start is None:
+        recording_start = recording_start_time(video_path)
+    for sid, (first, best, count) in sorted(sightings.items(), key=lambda item: item[1][0]):
+        seen_at = recording_start + timedelta(seconds=first)
+        print(f"  Student {sid}: first seen {seen_at:%H:%M:%S} (+{first:.0f}s), "
+              f"best similarity {best:.2f}, {count} sighting(s)")
+    if dry_run:
+        return sightings
+
+    # Students found only by the campus-wide fallback are not part of this session
+    class_sightings = {sid: seen for sid, seen in sightings.items() if enrolled is None or sid in enrolled}
+    write_attendance(DB_CONFIG, session_instance_id, class_sightings, recording_start, min_sightings)
+    return sightings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mark attendance from a recorded lecture video')
+    parser.add_argument('video_path')
+    parser.add_argument('--session_instance_id', type=int, required=True)
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--chunk_seconds', type=float, default=60, help='Length of the time chunk per task')
+    parser.add_argument('--sample_fps', type=float, default=2.0, help='Frames per second of video to scan')
+    parser.add_argument('--min_sightings', type=int, default=2, help='Sampled frames a student must appear in')
+    parser.add_argument('--recording_start', default=None,
+                        help='Recording start as "YYYY-MM-DD HH:MM:SS" (default: file time minus duration)')
+    parser.add_argument('--dry_run', action='store_true', help='Only print who was seen')
+    parser.add_argument('--campus_fallback', action='store_true',
+                        help='Also match campus-wide when no confident match among the enrolled students exists')
+    add_detection_arguments(parser)
+    args = parser.parse_args()
+
+    recording_start = datetime.strptime(args.recording_start, '%Y-%m-%d %H:%M:%S') if args.recording_start else None
+    run_video_attendance(args.video_path, args.session_instance_id, detector_from_args(args), args.workers,
+                         args.chunk_seconds, args.sample_fps, args.min_sightings, recording_start, args.dry_run,
+                         args.campus_fallback)
+
+
+if __name__ == '__main__':
+    main()